@@ -1,4 +1,5 @@
 import os
+import click
 from flask import Flask
 from dotenv import load_dotenv
 
@@ -26,6 +27,22 @@ def create_app():
 
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+    # Pool sizes are per worker process: with gthread workers, keep
+    # DB_POOL_SIZE + DB_MAX_OVERFLOW at or above the thread count, and
+    # workers x that total under the server's connection limit.
+    app.config["DB_POOL_SIZE"] = int(os.getenv("DB_POOL_SIZE", 5))
+    app.config["DB_MAX_OVERFLOW"] = int(os.getenv("DB_MAX_OVERFLOW", 5))
+    app.config["DB_POOL_TIMEOUT"] = int(os.getenv("DB_POOL_TIMEOUT", 10))
+    app.config["DB_POOL_RECYCLE"] = int(os.getenv("DB_POOL_RECYCLE", 300))
+    app.config["DB_POOL_PRE_PING"] = os.getenv("DB_POOL_PRE_PING", "True") == "True"
+    # Postgres only; 0 turns the timeout off.
+    app.config["DB_STATEMENT_TIMEOUT_MS"] = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 30000))
+    app.config["SQLITE_BUSY_TIMEOUT_MS"] = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+    app.config["SQLITE_MMAP_SIZE"] = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+
+    from app.database import engine_options
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config)
+
     # --------------------
     # Mail
     # --------------------
@@ -36,37 +53,174 @@ def create_app():
     app.config["MAIL_PASSWORD"] = os.getenv("MAIL_PASSWORD")
     app.config["MAIL_DEFAULT_SENDER"] = os.getenv("MAIL_DEFAULT_SENDER")
 
+    # --------------------
+    # Google sign-in (optional)
+    # --------------------
+    # Left unset, the Google blueprint is never built and Flask-Dance is
+    # never imported.
+    app.config["GOOGLE_OAUTH_CLIENT_ID"] = os.getenv("GOOGLE_OAUTH_CLIENT_ID")
+    app.config["GOOGLE_OAUTH_CLIENT_SECRET"] = os.getenv("GOOGLE_OAUTH_CLIENT_SECRET")
+
+    # --------------------
+    # Live events
+    # --------------------
+    # "postgres" shares events between workers over LISTEN/NOTIFY.
+    app.config["EVENTS_BACKEND"] = os.getenv("EVENTS_BACKEND", "memory")
+    app.config["EVENTS_URL"] = os.getenv("EVENTS_URL", app.config["SQLALCHEMY_DATABASE_URI"])
+    # Each open stream holds a gunicorn thread (8 per worker, see gunicorn.conf.py).
+    # Past the cap clients are told to retry later, and every stream ends
+    # after a while so the slots change hands.
+    app.config["NOTIFICATION_STREAMS_PER_PROCESS"] = int(os.getenv("NOTIFICATION_STREAMS_PER_PROCESS", 4))
+    app.config["NOTIFICATION_STREAM_MAX_SECONDS"] = float(os.getenv("NOTIFICATION_STREAM_MAX_SECONDS", 300))
+
+    # --------------------
+    # Cache
+    # --------------------
+    # "memory" keeps entries per process; "redis" shares them between
+    # workers (any Redis-compatible server, e.g. a local redis-server).
+    app.config["CACHE_BACKEND"] = os.getenv("CACHE_BACKEND", "memory")
+    app.config["CACHE_URL"] = os.getenv("CACHE_URL", "redis://localhost:6379/0")
+    app.config["CACHE_DEFAULT_TTL"] = int(os.getenv("CACHE_DEFAULT_TTL", 60))
+    # Signed-in users' identities are always cached per process.
+    app.config["IDENTITY_CACHE_TTL"] = int(os.getenv("IDENTITY_CACHE_TTL", 30))
+    app.config["IDENTITY_CACHE_SIZE"] = int(os.getenv("IDENTITY_CACHE_SIZE", 1024))
+
+    # --------------------
+    # Login throttling
+    # --------------------
+    # Token buckets checked before a password is hashed. "memory" keeps
+    # them per process; "redis" shares them between workers.
+    app.config["LOGIN_LIMIT_BACKEND"] = os.getenv("LOGIN_LIMIT_BACKEND", "memory")
+    app.config["LOGIN_LIMIT_URL"] = os.getenv("LOGIN_LIMIT_URL", app.config["CACHE_URL"])
+    # A classroom behind one campus NAT shares an IP bucket, so it is
+    # the roomier of the two.
+    app.config["LOGIN_LIMIT_IP_BURST"] = int(os.getenv("LOGIN_LIMIT_IP_BURST", 50))
+    app.config["LOGIN_LIMIT_IP_PER_MINUTE"] = float(os.getenv("LOGIN_LIMIT_IP_PER_MINUTE", 30))
+    app.config["LOGIN_LIMIT_ACCOUNT_BURST"] = int(os.getenv("LOGIN_LIMIT_ACCOUNT_BURST", 5))
+    app.config["LOGIN_LIMIT_ACCOUNT_PER_MINUTE"] = float(os.getenv("LOGIN_LIMIT_ACCOUNT_PER_MINUTE", 2))
+    # Proxies in front of the app that append to X-Forwarded-For. Without
+    # it every client has the router's address, so on Heroku (DYNO is
+    # set) it defaults to the one router.
+    app.config["TRUSTED_PROXIES"] = int(os.getenv("TRUSTED_PROXIES", 1 if os.getenv("DYNO") else 0))
+    if app.config["TRUSTED_PROXIES"]:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config["TRUSTED_PROXIES"])
+
+    # --------------------
+    # Metrics
+    # --------------------
+    # When set, /metrics requires "Authorization: Bearer <token>". On
+    # Heroku (DYNO is set) the endpoint is not served at all without one.
+    app.config["METRICS_TOKEN"] = os.getenv("METRICS_TOKEN")
+    app.config["METRICS_REQUIRE_TOKEN"] = os.getenv(
+        "METRICS_REQUIRE_TOKEN", "True" if os.getenv("DYNO") else "False"
+    ) == "True"
+
+    # --------------------
+    # Query counting
+    # --------------------
+    # Unset follows debug mode. QUERY_BUDGET_STRICT makes an over-budget
+    # request or sweep raise instead of just logging.
+    query_count = os.getenv("QUERY_COUNT")
+    app.config["QUERY_COUNT"] = None if query_count is None else query_count == "True"
+    app.config["QUERY_BUDGET_STRICT"] = os.getenv("QUERY_BUDGET_STRICT", "False") == "True"
+
+    # --------------------
+    # Notification retention
+    # --------------------
+    # Read notifications older than this many days leave the inbox table
+    # (0 keeps them). They go to notification_archive, or are deleted
+    # outright when NOTIFICATION_ARCHIVE is off.
+    app.config["NOTIFICATION_RETENTION_DAYS"] = int(os.getenv("NOTIFICATION_RETENTION_DAYS", 180))
+    app.config["NOTIFICATION_ARCHIVE"] = os.getenv("NOTIFICATION_ARCHIVE", "True") == "True"
+    app.config["NOTIFICATION_RETENTION_BATCH_SIZE"] = int(os.getenv("NOTIFICATION_RETENTION_BATCH_SIZE", 1000))
+    # The worker retires at most this many batches per pass, between
+    # rounds of email delivery, and checks again after the interval.
+    app.config["NOTIFICATION_RETENTION_MAX_BATCHES"] = int(os.getenv("NOTIFICATION_RETENTION_MAX_BATCHES", 20))
+    app.config["NOTIFICATION_RETENTION_INTERVAL"] = int(os.getenv("NOTIFICATION_RETENTION_INTERVAL", 3600))
+
     # --------------------
     # Upload limits
     # --------------------
     app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16MB
+    app.config["UPLOAD_FOLDER"] = os.getenv(
+        "UPLOAD_FOLDER",
+        os.path.join(app.root_path, "static", "uploads", "profiles")
+    )
 
     # --------------------
     # Extensions
     # --------------------
-    from app.extensions import db, login_manager, mail
+    from app.extensions import db, login_manager, mail, events, cache, metrics, login_limiter
+    from app import database, identity, querycount
 
     db.init_app(app)
+    database.init_app(app, db)
     mail.init_app(app)
+    events.init_app(app)
+    cache.init_app(app)
+    metrics.init_app(app)
+    querycount.init_app(app)
 
     login_manager.init_app(app)
     login_manager.login_view = "routes.login"
-
-    @login_manager.user_loader
-    def load_user(user_id):
-        from app.models import User
-        return User.query.get(int(user_id))
+    login_limiter.init_app(app)
+    identity.init_app(app, login_manager)
 
     # --------------------
     # Blueprints
     # --------------------
     from app.routes import routes
+    from app.api import api
     app.register_blueprint(routes)
+    app.register_blueprint(api)
 
     # --------------------
-    # Create tables
+    # Create tables / migrate
     # --------------------
-    with app.app_context():
-        db.create_all()
+    # Nothing here touches the database, so web workers, the email worker
+    # and scheduler runs boot without a round trip. Run `flask init-db`
+    # (the Heroku release phase does) after deploying a schema change.
+    from app.migrations import init_schema, upgrade
+
+    @app.cli.command("init-db")
+    def init_db():
+        """Create missing tables, then apply pending schema migrations."""
+        with app.app_context():
+            ran = init_schema(db)
+        print(f"[MIGRATE] Tables ready, applied {len(ran)} migration(s)")
+
+    @app.cli.command("upgrade-db")
+    def upgrade_db():
+        """Apply pending schema migrations."""
+        with app.app_context():
+            ran = upgrade(db.engine)
+        print(f"[MIGRATE] Applied {len(ran)} migration(s)")
+
+    @app.cli.command("retire-notifications")
+    @click.option("--days", type=int, help="Override NOTIFICATION_RETENTION_DAYS.")
+    @click.option("--batch-size", type=int, help="Override NOTIFICATION_RETENTION_BATCH_SIZE.")
+    @click.option("--max-batches", type=int, help="Stop after this many batches.")
+    @click.option("--purge", is_flag=True, help="Delete instead of archiving.")
+    def retire_notifications_command(days, batch_size, max_batches, purge):
+        """Archive (or purge) read notifications past the retention period."""
+        from app.retention import retire_notifications
+
+        retired = retire_notifications(app, days, batch_size, max_batches, archive=False if purge else None)
+        print(f"[RETENTION] Done, {retired} notification(s) retired")
+
+    @app.cli.command("seed-campus")
+    @click.option("--students", default=50_000, show_default=True)
+    @click.option("--professors", default=2_000, show_default=True)
+    @click.option("--slots", default=500_000, show_default=True)
+    @click.option("--notifications", default=1_000_000, show_default=True)
+    @click.option("--seed", default=42, show_default=True, help="Random seed; the same seed gives the same data.")
+    def seed_campus_command(students, professors, slots, notifications, seed):
+        """Fill an empty database with a synthetic campus for benchmarking."""
+        from app.seed import seed_campus
+
+        with app.app_context():
+            init_schema(db)
+            seed_campus(students, professors, slots, notifications, seed=seed)
 
     return app
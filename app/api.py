@@ -0,0 +1,216 @@
+import hashlib
+import json
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import Blueprint, Response, request
+from flask_login import current_user
+from sqlalchemy import and_, func, or_, select
+
+from app.cache import CATALOGUE
+from app.extensions import cache, db
+from app.models import Availability, ChangeVersion, Meeting, Notification, CATALOGUE_SCOPE, user_scope
+from app.querycount import query_budget
+from app.routes import (
+    NOTIFICATIONS_PAGE_SIZE, decode_cursor, encode_cursor, open_slots_page, parse_date_arg, parse_time_arg
+)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - the stdlib encoder is a slower fallback
+    orjson = None
+
+api = Blueprint("api", __name__, url_prefix="/api/v1")
+
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":")).encode()
+
+
+def json_response(data, status=200):
+    return Response(dumps(data), status=status, mimetype="application/json")
+
+
+def iso(value):
+    if value is None:
+        return None
+    return value.replace(tzinfo=value.tzinfo or timezone.utc).isoformat()
+
+
+def api_login_required(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return json_response({"error": "authentication required"}, 401)
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def load_versions(scopes):
+    rows = db.session.execute(
+        select(ChangeVersion.scope, ChangeVersion.version, ChangeVersion.changed_at)
+        .where(ChangeVersion.scope.in_(scopes))
+    ).all()
+    found = {scope: (version, changed_at) for scope, version, changed_at in rows}
+    return [found.get(scope, (0, None)) for scope in sorted(scopes)]
+
+
+def conditional(scopes, build, extra="", versions=None):
+    """Serve `build()` as JSON unless the client's copy is still current.
+
+    The ETag covers the signed-in user, the request URL and the change
+    version of every scope the response reads from, so checking it costs
+    one primary-key lookup instead of running the queries behind the body.
+    """
+    versions = versions or load_versions(scopes)
+    changed = [changed_at for _, changed_at in versions if changed_at is not None]
+    last_modified = max(changed).replace(microsecond=0) if changed else None
+    if last_modified is not None and last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+
+    # Two users can see the same versions for different bodies, so an
+    # ETag sent by one must not match for the other.
+    fingerprint = f"{current_user.get_id()}|{request.full_path}|{[v for v, _ in versions]}|{extra}"
+    etag = hashlib.sha1(fingerprint.encode()).hexdigest()
+
+    not_modified = False
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    elif request.if_modified_since and last_modified is not None and user_scope(current_user.email) in scopes:
+        # A date says nothing about whose copy the client holds, so it is
+        # only trusted when the dates compared are the user's own.
+        not_modified = last_modified <= request.if_modified_since
+
+    response = Response(status=304) if not_modified else json_response(build())
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Responses depend on who is signed in, so shared caches must not
+    # keep them and browsers must revalidate each time.
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add("Cookie")
+    return response
+
+
+@api.route("/slots")
+@query_budget(6)
+@api_login_required
+def slots():
+    filters = {
+        "professor": request.args.get("professor", ""),
+        "date_from": parse_date_arg("date_from"),
+        "date_to": parse_date_arg("date_to"),
+        "time_from": parse_time_arg("time_from"),
+        "time_to": parse_time_arg("time_to"),
+    }
+    cursor = decode_cursor(request.args.get("cursor", ""))
+    now = datetime.now(timezone.utc)
+
+    # Slots also leave the catalogue when they start, which bumps no
+    # version; the next one to start is part of the ETag instead.
+    next_start = db.session.scalar(
+        select(func.min(Availability.starts_at))
+        .where(Availability.booked.is_(False), Availability.starts_at >= now)
+    )
+
+    versions = load_versions([CATALOGUE_SCOPE])
+
+    def build():
+        # Keyed on the catalogue version too, so a response with a new
+        # ETag never carries a page cached before the change.
+        page = cache.get_or_set(
+            CATALOGUE,
+            [filters, cursor, versions[0][0]],
+            lambda: open_slots_page(filters, cursor)
+        )
+        return {
+            "slots": [
+                {
+                    "id": slot["id"],
+                    "date": slot["date"],
+                    "time": slot["time"],
+                    "starts_at": iso(slot["starts_at"]),
+                    "professor": slot["professor_name"],
+                }
+                for slot in page["available"] if slot["starts_at"] >= now
+            ],
+            "next_cursor": page["next_cursor"],
+        }
+
+    return conditional([CATALOGUE_SCOPE], build, extra=iso(next_start), versions=versions)
+
+
+@api.route("/meetings")
+@query_budget(4)
+@api_login_required
+def meetings():
+    def build():
+        column = Meeting.professor_email if current_user.role == "professor" else Meeting.student_email
+        rows = Meeting.query.filter(column == current_user.email).order_by(
+            Meeting.starts_at.asc(), Meeting.id.asc()
+        ).all()
+        return {
+            "meetings": [
+                {
+                    "id": meeting.id,
+                    "student": meeting.student,
+                    "professor": meeting.professor,
+                    "date": meeting.date,
+                    "time": meeting.time,
+                    "starts_at": iso(meeting.starts_at),
+                    "notes": meeting.notes,
+                    **({"meeting_notes": meeting.meeting_notes} if current_user.role == "professor" else {}),
+                }
+                for meeting in rows
+            ]
+        }
+
+    return conditional([user_scope(current_user.email)], build)
+
+
+@api.route("/notifications")
+@query_budget(4)
+@api_login_required
+def notifications():
+    broadcast = f"all_{current_user.role}s"
+
+    def build():
+        query = Notification.query.filter(Notification.user_email.in_([current_user.email, broadcast]))
+        cursor = decode_cursor(request.args.get("cursor", ""))
+        if cursor:
+            created_at, notification_id = cursor
+            query = query.filter(or_(
+                Notification.created_at < created_at,
+                and_(Notification.created_at == created_at, Notification.id < notification_id)
+            ))
+
+        rows = query.order_by(
+            Notification.created_at.desc(),
+            Notification.id.desc()
+        ).limit(NOTIFICATIONS_PAGE_SIZE + 1).all()
+
+        next_cursor = None
+        if len(rows) > NOTIFICATIONS_PAGE_SIZE:
+            rows = rows[:NOTIFICATIONS_PAGE_SIZE]
+            next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+
+        return {
+            "notifications": [
+                {
+                    "id": n.id,
+                    "message": n.message,
+                    "type": n.type,
+                    "meeting_id": n.meeting_id,
+                    "is_read": bool(n.is_read),
+                    "created_at": iso(n.created_at),
+                }
+                for n in rows
+            ],
+            "unread": current_user.unread_count,
+            "next_cursor": next_cursor,
+        }
+
+    return conditional([user_scope(current_user.email), user_scope(broadcast)], build)
@@ -0,0 +1,205 @@
+import hashlib
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from app.cache import CATALOGUE, invalidate_on_commit
+from app.extensions import db
+from app.models import User
+
+CHUNK_SIZE = 64 * 1024
+MAX_PIXELS = 40_000_000
+ACCEPTED_FORMATS = {"JPEG", "PNG", "GIF"}
+
+# Square thumbnails at twice the largest CSS size each is shown at, so
+# they stay sharp on high-density screens.
+THUMBNAIL_SIZES = {
+    "sm": 64,
+    "md": 160,
+    "lg": 300,
+}
+THUMBNAIL_FORMAT = "webp"
+
+# Thumbnail names change whenever their content does, so browsers and
+# proxies may keep them for as long as they like.
+THUMBNAIL_MAX_AGE = 365 * 24 * 60 * 60
+
+CONTENT_HASH = re.compile(r"^[0-9a-f]{64}$")
+
+executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="avatars")
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def is_content_hash(picture):
+    return bool(picture and CONTENT_HASH.match(picture))
+
+
+def originals_dir(upload_folder):
+    return os.path.join(upload_folder, "originals")
+
+
+def thumbnails_dir(upload_folder):
+    return os.path.join(upload_folder, "thumbs")
+
+
+def thumbnail_name(digest, size):
+    return f"{digest}-{THUMBNAIL_SIZES[size]}.{THUMBNAIL_FORMAT}"
+
+
+def has_thumbnails(upload_folder, digest):
+    folder = thumbnails_dir(upload_folder)
+    return all(os.path.exists(os.path.join(folder, thumbnail_name(digest, size))) for size in THUMBNAIL_SIZES)
+
+
+def original_path(upload_folder, digest):
+    # Originals are saved as <digest>.<format>, so at most one stat per
+    # accepted format finds one, however many uploads there are.
+    folder = originals_dir(upload_folder)
+    for image_format in sorted(ACCEPTED_FORMATS):
+        path = os.path.join(folder, f"{digest}.{image_format.lower()}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def store_upload(file, upload_folder):
+    """Stream an uploaded file to disk under its SHA-256 name.
+
+    The upload is copied in CHUNK_SIZE pieces, hashing as it goes, and
+    only the image header is read back to check it. Identical uploads
+    end up in the same file. Returns the hex digest.
+    """
+    folder = originals_dir(upload_folder)
+    os.makedirs(folder, exist_ok=True)
+
+    sha = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = file.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                sha.update(chunk)
+                out.write(chunk)
+
+        try:
+            with Image.open(tmp_path) as image:
+                image_format = image.format
+                width, height = image.size
+        except (UnidentifiedImageError, Image.DecompressionBombError) as e:
+            raise InvalidImage("The file is not a readable image.") from e
+
+        if image_format not in ACCEPTED_FORMATS:
+            raise InvalidImage("Only JPG, PNG and GIF images are supported.")
+        if width * height > MAX_PIXELS:
+            raise InvalidImage("The image is too large.")
+
+        digest = sha.hexdigest()
+        final_path = os.path.join(folder, f"{digest}.{image_format.lower()}")
+        if os.path.exists(final_path):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, final_path)
+        return digest
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def make_thumbnails(upload_folder, digest):
+    """Decode the original once and write every thumbnail size.
+
+    Each file is written under a temporary name and renamed into place,
+    so a thumbnail URL never serves a half-written image.
+    """
+    folder = thumbnails_dir(upload_folder)
+    os.makedirs(folder, exist_ok=True)
+
+    with Image.open(original_path(upload_folder, digest)) as image:
+        largest = max(THUMBNAIL_SIZES.values())
+        # Lets the JPEG decoder skip detail we are about to throw away.
+        image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+
+        for size in THUMBNAIL_SIZES:
+            px = THUMBNAIL_SIZES[size]
+            thumb = ImageOps.fit(image, (px, px), Image.Resampling.LANCZOS)
+            path = os.path.join(folder, thumbnail_name(digest, size))
+            fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".part")
+            with os.fdopen(fd, "wb") as out:
+                thumb.save(out, THUMBNAIL_FORMAT.upper(), quality=80, method=4)
+            os.replace(tmp_path, path)
+
+
+def remove_picture(upload_folder, picture):
+    """Delete a picture's files once no user points at it any more."""
+    if not picture or picture == User.profile_picture.default.arg:
+        return
+    if User.query.filter_by(profile_picture=picture).first():
+        return
+
+    if is_content_hash(picture):
+        paths = [os.path.join(thumbnails_dir(upload_folder), thumbnail_name(picture, size)) for size in THUMBNAIL_SIZES]
+        paths.append(original_path(upload_folder, picture))
+    else:
+        paths = [os.path.join(upload_folder, picture)]
+
+    for path in paths:
+        try:
+            if path:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def set_picture(user, digest, upload_folder):
+    old = user.profile_picture
+    user.profile_picture = digest
+    if user.role == "professor":
+        invalidate_on_commit(db.session, CATALOGUE)
+    db.session.commit()
+    if old != digest:
+        remove_picture(upload_folder, old)
+
+
+def process_upload(app, user_id, digest):
+    with app.app_context():
+        upload_folder = app.config["UPLOAD_FOLDER"]
+        try:
+            if not has_thumbnails(upload_folder, digest):
+                make_thumbnails(upload_folder, digest)
+        except Exception as e:
+            print(f"[AVATARS] Failed to process {digest} for user {user_id}: {e}")
+            return
+
+        user = db.session.get(User, user_id)
+        if user:
+            set_picture(user, digest, upload_folder)
+
+
+def update_profile_picture(app, user, file):
+    """Store an upload and switch `user` to it.
+
+    Returns True if the picture is live already (its thumbnails exist
+    from an identical earlier upload), or False if they are being made
+    in the background and the user switches over when they are ready.
+    Raises InvalidImage for files that are not usable images.
+    """
+    upload_folder = app.config["UPLOAD_FOLDER"]
+    digest = store_upload(file, upload_folder)
+
+    if has_thumbnails(upload_folder, digest):
+        set_picture(user, digest, upload_folder)
+        return True
+
+    executor.submit(process_upload, app, user.id, digest)
+    return False
@@ -0,0 +1,209 @@
+import hashlib
+import json
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+CATALOGUE = "catalogue"
+
+
+def professor_namespace(email):
+    # Matches the professor's change-version scope (models.user_scope):
+    # namespaces double as ChangeVersion scopes, see Cache._version.
+    return f"user:{email}"
+
+
+class MemoryBackend:
+    """A per-process LRU cache whose entries also expire after a TTL."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        # Counters live outside the LRU: evicting a namespace version
+        # would bring entries from before an invalidation back to life.
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def counter(self, key):
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisBackend:
+    """Shares entries between processes through Redis.
+
+    Anything that speaks the Redis protocol works, so a local
+    `redis-server` stands in for the hosted one in development.
+    """
+
+    def __init__(self, url):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+    def get(self, key):
+        raw = self.client.get(key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl=None):
+        self.client.set(key, pickle.dumps(value), ex=ttl)
+
+    def counter(self, key):
+        return int(self.client.get(key) or 0)
+
+    def incr(self, key):
+        return self.client.incr(key)
+
+    def clear(self):
+        self.client.flushdb()
+
+
+class Cache:
+    """Caches query results under namespaces that writers invalidate.
+
+    Each namespace has a version number that is part of every key stored
+    under it. Invalidating bumps the version, so old entries are never
+    read again and age out of the backend on their own.
+
+    A shared backend keeps the versions itself. A per-process one cannot
+    see the bumps other processes make, so it reads the namespace's
+    ChangeVersion row instead, which every commit that invalidates bumps.
+    """
+
+    def __init__(self):
+        self.backend = None
+        self.default_ttl = 60
+        self.prefix = "collegia"
+        self.versions_from_db = False
+
+    def init_app(self, app):
+        backend = app.config.get("CACHE_BACKEND", "memory")
+        if backend == "redis":
+            self.backend = RedisBackend(app.config["CACHE_URL"])
+        elif backend == "memory":
+            self.backend = MemoryBackend(app.config.get("CACHE_MAX_ENTRIES", 1024))
+        elif backend == "none":
+            self.backend = None
+        else:
+            raise ValueError(f"Unknown CACHE_BACKEND: {backend}")
+        self.default_ttl = app.config.get("CACHE_DEFAULT_TTL", 60)
+        self.versions_from_db = backend == "memory"
+        app.extensions["cache"] = self
+
+    def _version(self, namespace):
+        if self.versions_from_db:
+            from app.models import change_version
+
+            return change_version(namespace)
+        return self.backend.counter(f"{self.prefix}:v:{namespace}")
+
+    def _key(self, namespace, key):
+        if not isinstance(key, str):
+            key = hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+        return f"{self.prefix}:{namespace}:{self._version(namespace)}:{key}"
+
+    def get_or_set(self, namespace, key, loader, ttl=None):
+        """Return the cached value for `key`, calling `loader` on a miss.
+
+        Falls back to `loader` if the backend is missing or unreachable,
+        so a cache outage only costs speed.
+        """
+        if self.backend is None:
+            return loader()
+
+        try:
+            full_key = self._key(namespace, key)
+            value = self.backend.get(full_key)
+        except Exception as e:
+            print(f"[CACHE] Read failed for {namespace}: {e}")
+            return loader()
+        if value is not None:
+            return value
+
+        value = loader()
+        try:
+            self.backend.set(full_key, value, ttl or self.default_ttl)
+        except Exception as e:
+            print(f"[CACHE] Write failed for {namespace}: {e}")
+        return value
+
+    def invalidate(self, *namespaces):
+        if self.backend is None or self.versions_from_db:
+            return
+        for namespace in namespaces:
+            try:
+                self.backend.incr(f"{self.prefix}:v:{namespace}")
+            except Exception as e:
+                print(f"[CACHE] Failed to invalidate {namespace}: {e}")
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+
+def invalidate_on_commit(session, *namespaces):
+    """Invalidate `namespaces` once `session` commits.
+
+    Invalidating before the commit would let a concurrent reader cache
+    the old rows again in between. Their change versions are bumped in
+    the committing transaction, so API ETags follow as well.
+    """
+    session.info.setdefault("cache_invalidations", set()).update(namespaces)
+
+
+@event.listens_for(Session, "before_commit")
+def bump_invalidated_versions(session):
+    from app.models import bump_versions
+
+    namespaces = session.info.get("cache_invalidations")
+    if namespaces:
+        bump_versions(session.connection(), namespaces)
+
+
+@event.listens_for(Session, "after_commit")
+def apply_cache_invalidations(session):
+    from app.extensions import cache
+
+    cache.invalidate(*session.info.pop("cache_invalidations", ()))
+
+
+@event.listens_for(Session, "after_rollback")
+def drop_cache_invalidations(session):
+    session.info.pop("cache_invalidations", None)
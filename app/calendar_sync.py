@@ -0,0 +1,195 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.extensions import db
+from app.metrics import google_call
+from app.models import CalendarJob, Meeting, User, slot_start, LOCAL_TIMEZONE
+
+EVENTS_URL = "https://www.googleapis.com/calendar/v3/calendars/primary/events"
+TOKEN_URL = "https://oauth2.googleapis.com/token"
+
+BATCH_SIZE = 20
+MAX_ATTEMPTS = 6
+BACKOFF_BASE_SECONDS = 30
+REQUEST_TIMEOUT_SECONDS = 10
+
+
+class CircuitBreaker:
+    """Stops calling an upstream after repeated failures.
+
+    After `failure_threshold` consecutive failures the breaker opens and
+    allow() returns False for `reset_timeout` seconds. Calls are then let
+    through again; a success closes the breaker, one more failure reopens it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            return time.monotonic() - self.opened_at >= self.reset_timeout
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+google_breaker = CircuitBreaker()
+
+
+def calendar_event_body(meeting):
+    starts_at = slot_start(meeting.date, meeting.time)
+    if starts_at is None:
+        return None
+
+    start = starts_at.astimezone(LOCAL_TIMEZONE).replace(tzinfo=None)
+    end = start + timedelta(hours=1)
+
+    return {
+        'summary': f'Advising Meeting: {meeting.student} & {meeting.professor}',
+        'description': f'Student Notes: {meeting.notes}',
+        'start': {
+            'dateTime': start.isoformat(),
+            'timeZone': str(LOCAL_TIMEZONE),
+        },
+        'end': {
+            'dateTime': end.isoformat(),
+            'timeZone': str(LOCAL_TIMEZONE),
+        },
+        'reminders': {
+            'useDefault': False,
+            'overrides': [
+                {'method': 'email', 'minutes': 24 * 60},
+                {'method': 'popup', 'minutes': 30},
+            ],
+        },
+    }
+
+
+def queue_calendar_event(user, meeting):
+    """Queue a calendar event for `meeting` in the caller's transaction.
+
+    `meeting` must already have an id (flush first). Returns None if the
+    meeting time cannot be parsed.
+    """
+    event = calendar_event_body(meeting)
+    if event is None:
+        return None
+
+    job = CalendarJob(
+        user_id=user.id,
+        meeting_id=meeting.id,
+        event=event,
+        status="pending",
+        attempts=0
+    )
+    db.session.add(job)
+    return job
+
+
+def google_session(user):
+    # Imported here so processes that never call Google skip loading requests.
+    from requests_oauthlib import OAuth2Session
+
+    def save_token(token):
+        user.google_token = token
+
+    return OAuth2Session(
+        os.getenv("GOOGLE_OAUTH_CLIENT_ID"),
+        token=user.google_token,
+        auto_refresh_url=TOKEN_URL,
+        auto_refresh_kwargs={
+            "client_id": os.getenv("GOOGLE_OAUTH_CLIENT_ID"),
+            "client_secret": os.getenv("GOOGLE_OAUTH_CLIENT_SECRET"),
+        },
+        token_updater=save_token
+    )
+
+
+def retry_later(job, error, now):
+    job.attempts += 1
+    job.last_error = str(error)[:500]
+    if job.attempts >= MAX_ATTEMPTS:
+        job.status = "failed"
+    else:
+        job.next_attempt_at = now + timedelta(seconds=BACKOFF_BASE_SECONDS * 2 ** (job.attempts - 1))
+
+
+def run_job(job, user, now):
+    if not user or not user.google_token:
+        job.status = "failed"
+        job.last_error = "no stored Google token"
+        return
+
+    try:
+        with google_call("calendar_insert") as call:
+            response = google_session(user).post(EVENTS_URL, json=job.event, timeout=REQUEST_TIMEOUT_SECONDS)
+            call.status = response.status_code
+    except Exception as e:
+        google_breaker.record_failure()
+        retry_later(job, e, now)
+        return
+
+    if response.ok:
+        google_breaker.record_success()
+        job.status = "done"
+        job.attempts += 1
+    elif response.status_code == 429 or response.status_code >= 500:
+        google_breaker.record_failure()
+        retry_later(job, f"HTTP {response.status_code}", now)
+    else:
+        # The request itself is bad (revoked token, invalid event);
+        # retrying will not help and says nothing about Google's health.
+        job.status = "failed"
+        job.attempts += 1
+        job.last_error = f"HTTP {response.status_code}: {response.text[:400]}"
+
+
+def sync_pending(app, limit=BATCH_SIZE):
+    """Push one batch of due calendar jobs to Google.
+
+    Returns the number of jobs processed. Jobs are left untouched while
+    the circuit breaker is open.
+    """
+    with app.app_context():
+        now = datetime.now(timezone.utc)
+        if not google_breaker.allow():
+            return 0
+
+        jobs = CalendarJob.query.filter(
+            CalendarJob.status == "pending",
+            CalendarJob.next_attempt_at <= now
+        ).order_by(CalendarJob.next_attempt_at.asc()).limit(limit).with_for_update(skip_locked=True).all()
+
+        users = {u.id: u for u in User.query.filter(User.id.in_({j.user_id for j in jobs}))}
+        live_meetings = set(db.session.scalars(
+            db.select(Meeting.id).where(Meeting.id.in_({j.meeting_id for j in jobs}))
+        ))
+
+        processed = 0
+        for job in jobs:
+            if job.meeting_id not in live_meetings:
+                job.status = "cancelled"
+            elif not google_breaker.allow():
+                break
+            else:
+                run_job(job, users.get(job.user_id), now)
+            processed += 1
+
+        db.session.commit()
+        return processed
@@ -0,0 +1,76 @@
+import os
+import weakref
+
+from sqlalchemy import event
+
+# Engines created in this process; a forked child disposes of all of them.
+_engines = weakref.WeakSet()
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured database.
+
+    Every engine pings connections before handing them out and recycles
+    them after DB_POOL_RECYCLE seconds, so a connection the server (or a
+    Heroku router) has dropped is replaced rather than failing a request.
+    Pool sizing and the statement timeout only apply to Postgres; SQLite
+    keeps SQLAlchemy's own pool for its URL and gets pragmas on connect.
+    """
+    options = {
+        "pool_pre_ping": config["DB_POOL_PRE_PING"],
+        "pool_recycle": config["DB_POOL_RECYCLE"],
+    }
+    if config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite"):
+        return options
+
+    options.update(
+        pool_size=config["DB_POOL_SIZE"],
+        max_overflow=config["DB_MAX_OVERFLOW"],
+        pool_timeout=config["DB_POOL_TIMEOUT"],
+    )
+    if config["DB_STATEMENT_TIMEOUT_MS"]:
+        options["connect_args"] = {"options": f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}"}
+    return options
+
+
+def sqlite_pragmas(config):
+    return [
+        # Readers no longer block the writer, or the writer readers.
+        "PRAGMA journal_mode=WAL",
+        # Wait for a competing writer instead of failing with "database is locked".
+        f"PRAGMA busy_timeout={config['SQLITE_BUSY_TIMEOUT_MS']}",
+        # Safe with WAL: a power cut can lose the last commits, never corrupt.
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA mmap_size={config['SQLITE_MMAP_SIZE']}",
+    ]
+
+
+def dispose_engines_after_fork():
+    # close=False leaves the parent's connections alone; the child only
+    # forgets them and opens its own.
+    for engine in list(_engines):
+        engine.dispose(close=False)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=dispose_engines_after_fork)
+
+
+def init_app(app, db):
+    """Apply SQLite pragmas on connect and track the app's engines for fork."""
+    with app.app_context():
+        engines = list(db.engines.values())
+
+    for engine in engines:
+        _engines.add(engine)
+        if engine.dialect.name != "sqlite":
+            continue
+
+        pragmas = sqlite_pragmas(app.config)
+
+        @event.listens_for(engine, "connect")
+        def set_pragmas(dbapi_connection, connection_record, pragmas=pragmas):
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
@@ -0,0 +1,207 @@
+import json
+import queue
+import select
+import threading
+import time
+from collections import defaultdict
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
+
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class Subscription:
+    def __init__(self, backend, channels):
+        self.backend = backend
+        self.channels = list(channels)
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def get(self, timeout):
+        """Return the next (channel, event), or None if nothing arrived in time."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.backend.unsubscribe(self)
+
+
+class MemoryBackend:
+    """Fans events out to subscribers in this process only."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, channels):
+        subscription = Subscription(self, channels)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers[channel].discard(subscription)
+                if not self._subscribers[channel]:
+                    del self._subscribers[channel]
+
+    def publish(self, events):
+        for channel, data in events:
+            self._deliver(channel, data)
+
+    def _deliver(self, channel, data):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait((channel, data))
+            except queue.Full:
+                # A stalled client loses events rather than stalling publishers.
+                pass
+
+
+class PostgresBackend(MemoryBackend):
+    """Shares events between processes with Postgres LISTEN/NOTIFY.
+
+    Each process holds one listening connection, whatever the number of
+    open streams, and fans incoming events out to its local subscribers.
+    """
+
+    CHANNEL = "collegia_events"
+
+    def __init__(self, url):
+        super().__init__()
+        self.engine = create_engine(url, pool_size=1, max_overflow=2, pool_pre_ping=True)
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    def subscribe(self, channels):
+        self._ensure_listener()
+        return super().subscribe(channels)
+
+    def publish(self, events):
+        with self.engine.begin() as connection:
+            connection.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                [
+                    {"channel": self.CHANNEL, "payload": json.dumps({"channel": channel, "data": data})}
+                    for channel, data in events
+                ]
+            )
+
+    def _ensure_listener(self):
+        with self._listener_lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen_forever, daemon=True)
+                self._listener.start()
+
+    def _listen_forever(self):
+        while True:
+            try:
+                self._listen()
+            except Exception as e:
+                print(f"[EVENTS] Listener dropped, reconnecting: {e}")
+                time.sleep(1)
+
+    def _listen(self):
+        raw = self.engine.raw_connection()
+        try:
+            connection = raw.driver_connection
+            connection.autocommit = True
+            connection.cursor().execute(f"LISTEN {self.CHANNEL}")
+
+            while True:
+                if select.select([connection], [], [], 30) == ([], [], []):
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    message = json.loads(connection.notifies.pop(0).payload)
+                    self._deliver(message["channel"], message["data"])
+        finally:
+            raw.invalidate()
+
+
+class EventBroker:
+    """Publishes committed notifications to live subscribers."""
+
+    def __init__(self):
+        self.backend = None
+        self.max_streams = None
+        self._streams = 0
+        self._streams_lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_streams = app.config.get("NOTIFICATION_STREAMS_PER_PROCESS")
+        backend = app.config.get("EVENTS_BACKEND", "memory")
+        if backend == "postgres":
+            self.backend = PostgresBackend(app.config["EVENTS_URL"])
+        elif backend == "memory":
+            self.backend = MemoryBackend()
+        else:
+            raise ValueError(f"Unknown EVENTS_BACKEND: {backend}")
+        app.extensions["events"] = self
+
+    def subscribe(self, channels):
+        return self.backend.subscribe(channels)
+
+    def claim_stream(self):
+        """Take one of this process's stream slots; False when none is free.
+
+        An open stream holds a worker thread for as long as it lasts, so
+        the cap keeps threads free for ordinary requests.
+        """
+        with self._streams_lock:
+            if self.max_streams is not None and self._streams >= self.max_streams:
+                return False
+            self._streams += 1
+            return True
+
+    def release_stream(self):
+        with self._streams_lock:
+            self._streams -= 1
+
+    def publish(self, events):
+        if self.backend is None or not events:
+            return
+        try:
+            self.backend.publish(events)
+        except Exception as e:
+            print(f"[EVENTS] Failed to publish {len(events)} event(s): {e}")
+
+
+def notification_event(user_email, message, type):
+    return user_email, {"message": message, "type": type}
+
+
+def queue_notification_events(session, rows):
+    """Publish events for bulk-inserted notification rows once `session` commits."""
+    session.info.setdefault("pending_events", []).extend(
+        notification_event(row["user_email"], row["message"], row["type"]) for row in rows
+    )
+
+
+@event.listens_for(Session, "before_flush")
+def collect_notification_events(session, flush_context, instances):
+    from app.models import Notification
+
+    new = [obj for obj in session.new if isinstance(obj, Notification)]
+    if new:
+        session.info.setdefault("pending_events", []).extend(
+            notification_event(n.user_email, n.message, n.type) for n in new
+        )
+
+
+@event.listens_for(Session, "after_commit")
+def publish_notification_events(session):
+    from app.extensions import events
+
+    events.publish(session.info.pop("pending_events", []))
+
+
+@event.listens_for(Session, "after_rollback")
+def drop_notification_events(session):
+    session.info.pop("pending_events", None)
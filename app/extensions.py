@@ -1,7 +1,15 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_mail import Mail
+from app.events import EventBroker
+from app.cache import Cache
+from app.metrics import Metrics
+from app.ratelimit import LoginLimiter
 
 db = SQLAlchemy()
 login_manager = LoginManager()
-mail = Mail()
\ No newline at end of file
+mail = Mail()
+events = EventBroker()
+cache = Cache()
+metrics = Metrics()
+login_limiter = LoginLimiter()
@@ -0,0 +1,158 @@
+from flask import current_app, has_app_context
+from flask_login import UserMixin
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.cache import MemoryBackend
+
+# What current_user needs on every page: the navbar shows the name, role
+# and unread badge, and most views filter by email or role.
+IDENTITY_FIELDS = ("id", "role", "name", "email", "profile_picture", "unread_count")
+
+
+class IdentityCache:
+    """A per-process LRU of signed-in users' identity fields.
+
+    Entries expire after IDENTITY_CACHE_TTL seconds (0 turns caching
+    off). That bounds how long another process's change, say the
+    scheduler raising unread counts, can go unseen here; changes made in
+    this process drop the entry as soon as they commit.
+    """
+
+    def __init__(self, max_entries=1024, ttl=30):
+        self.entries = MemoryBackend(max_entries)
+        self.ttl = ttl
+        self._ids_by_email = {}
+
+    def get(self, user_id):
+        return self.entries.get(user_id)
+
+    def set(self, identity):
+        if self.ttl <= 0:
+            return
+        self.entries.set(identity["id"], identity, self.ttl)
+        self._ids_by_email[identity["email"]] = identity["id"]
+
+    def forget(self, user_ids=(), emails=()):
+        user_ids = set(user_ids)
+        for email in emails:
+            user_id = self._ids_by_email.pop(email, None)
+            if user_id is not None:
+                user_ids.add(user_id)
+        for user_id in user_ids:
+            identity = self.entries.get(user_id)
+            if identity is not None:
+                # A CachedUser still holding it falls through to the row.
+                identity.clear()
+            self.entries.delete(user_id)
+
+    def clear(self):
+        self.entries.clear()
+        self._ids_by_email.clear()
+
+
+class CachedUser(UserMixin):
+    """current_user built from the identity cache.
+
+    Identity fields are read from the cache. Anything else, and every
+    write, goes to the User row, which is loaded on first use; from then
+    on, or once the identity is forgotten, the row is the source for all
+    fields.
+    """
+
+    def __init__(self, identity):
+        object.__setattr__(self, "_id", identity["id"])
+        object.__setattr__(self, "_identity", identity)
+        object.__setattr__(self, "_user", None)
+
+    def get_id(self):
+        return str(self._id)
+
+    @property
+    def user(self):
+        if self._user is None:
+            from app.extensions import db
+            from app.models import User
+
+            object.__setattr__(self, "_user", db.session.get(User, self._id))
+        return self._user
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if self._user is None and name in self._identity:
+            return self._identity[name]
+        return getattr(self.user, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.user, name, value)
+
+    def __repr__(self):
+        return f"<CachedUser {self._id}>"
+
+
+def load_user(user_id):
+    from app.extensions import db
+    from app.models import User
+
+    try:
+        user_id = int(user_id)
+    except ValueError:
+        return None
+
+    identities = current_app.extensions["identity"]
+    identity = identities.get(user_id)
+    if identity is None:
+        row = db.session.execute(
+            select(*(getattr(User, field) for field in IDENTITY_FIELDS)).where(User.id == user_id)
+        ).first()
+        if row is None:
+            return None
+        identity = dict(zip(IDENTITY_FIELDS, row))
+        identities.set(identity)
+    return CachedUser(identity)
+
+
+def forget_on_commit(session, user_ids=(), emails=()):
+    """Drop cached identities once `session` commits.
+
+    ORM changes to a User are caught on flush; statements that change
+    users in bulk (unread counts) call this themselves.
+    """
+    stale = session.info.setdefault("stale_identities", (set(), set()))
+    stale[0].update(user_ids)
+    stale[1].update(emails)
+
+
+@event.listens_for(Session, "before_flush")
+def track_user_changes(session, flush_context, instances):
+    from app.models import User
+
+    changed = [
+        obj for obj in session.dirty | session.deleted
+        if isinstance(obj, User) and (obj in session.deleted or session.is_modified(obj))
+    ]
+    if changed:
+        forget_on_commit(session, user_ids=[u.id for u in changed], emails=[u.email for u in changed])
+
+
+@event.listens_for(Session, "after_commit")
+def forget_committed_identities(session):
+    stale = session.info.pop("stale_identities", None)
+    if stale and has_app_context():
+        identities = current_app.extensions.get("identity")
+        if identities is not None:
+            identities.forget(*stale)
+
+
+@event.listens_for(Session, "after_rollback")
+def keep_identities(session):
+    session.info.pop("stale_identities", None)
+
+
+def init_app(app, login_manager):
+    app.extensions["identity"] = IdentityCache(
+        app.config.get("IDENTITY_CACHE_SIZE", 1024),
+        app.config.get("IDENTITY_CACHE_TTL", 30)
+    )
+    login_manager.user_loader(load_user)
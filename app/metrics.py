@@ -0,0 +1,184 @@
+import os
+import time
+from contextlib import contextmanager
+
+from flask import Response, abort, g, has_request_context, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, multiprocess
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Statements per request; anything past the top bucket is a query loop.
+SQL_STATEMENT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 250, 500)
+# Sweeps sort through every meeting in a window, so allow for slow ones.
+SWEEP_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+REQUEST_LATENCY = Histogram(
+    "collegia_request_duration_seconds",
+    "Time spent handling a request.",
+    ["endpoint", "method", "status"]
+)
+REQUEST_SQL_STATEMENTS = Histogram(
+    "collegia_request_sql_statements",
+    "SQL statements run while handling a request.",
+    ["endpoint"],
+    buckets=SQL_STATEMENT_BUCKETS
+)
+REQUEST_SQL_SECONDS = Histogram(
+    "collegia_request_sql_seconds",
+    "Time a request spent waiting on SQL statements.",
+    ["endpoint"]
+)
+SQL_STATEMENTS = Counter(
+    "collegia_sql_statements_total",
+    "SQL statements run, in requests and background jobs alike."
+)
+SQL_SECONDS = Histogram(
+    "collegia_sql_statement_duration_seconds",
+    "Time taken by a single SQL statement."
+)
+SMTP_SECONDS = Histogram(
+    "collegia_smtp_send_duration_seconds",
+    "Time taken to hand one email to the SMTP server.",
+    ["result"]
+)
+GOOGLE_SECONDS = Histogram(
+    "collegia_google_request_duration_seconds",
+    "Time taken by a call to a Google API.",
+    ["call", "status"]
+)
+SWEEP_SECONDS = Histogram(
+    "collegia_reminder_sweep_duration_seconds",
+    "Time taken by one run of the meeting reminder sweep.",
+    buckets=SWEEP_BUCKETS
+)
+LOGINS_THROTTLED = Counter(
+    "collegia_logins_throttled_total",
+    "Password logins refused with a 429 before the password was checked.",
+    ["bucket"]
+)
+NOTIFICATION_STREAMS_REFUSED = Counter(
+    "collegia_notification_streams_refused_total",
+    "Notification streams turned away because the process had none free."
+)
+NOTIFICATIONS_RETIRED = Counter(
+    "collegia_notifications_retired_total",
+    "Read notifications moved out of the inbox table by the retention job.",
+    ["action"]
+)
+REMINDERS_SENT = Counter(
+    "collegia_reminders_sent_total",
+    "Meeting reminders sent, one per recipient.",
+    ["window"]
+)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _end_statement(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("metrics_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+
+    SQL_STATEMENTS.inc()
+    SQL_SECONDS.observe(elapsed)
+    if has_request_context() and "metrics_request_started" in g:
+        g.metrics_sql_statements += 1
+        g.metrics_sql_seconds += elapsed
+
+
+@event.listens_for(Engine, "handle_error")
+def _failed_statement(context):
+    # after_cursor_execute does not run for a statement that raised.
+    started = context.connection.info.get("metrics_started") if context.connection else None
+    if started:
+        started.pop()
+
+
+class GoogleCall:
+    status = "error"
+
+
+@contextmanager
+def google_call(call):
+    """Time a Google API call.
+
+    The block sets `status` on the yielded object to the HTTP status it
+    got back; a call that raises is recorded as "error".
+    """
+    outcome = GoogleCall()
+    started = time.perf_counter()
+    try:
+        yield outcome
+    finally:
+        GOOGLE_SECONDS.labels(call=call, status=str(outcome.status)).observe(time.perf_counter() - started)
+
+
+def endpoint_label():
+    # Unmatched URLs share one label so scanners cannot grow the series.
+    return request.endpoint or "unmatched"
+
+
+def record_request(status):
+    started = g.pop("metrics_request_started", None)
+    if started is None:
+        return
+    endpoint = endpoint_label()
+    REQUEST_LATENCY.labels(endpoint=endpoint, method=request.method, status=str(status)).observe(
+        time.perf_counter() - started
+    )
+    REQUEST_SQL_STATEMENTS.labels(endpoint=endpoint).observe(g.metrics_sql_statements)
+    REQUEST_SQL_SECONDS.labels(endpoint=endpoint).observe(g.metrics_sql_seconds)
+
+
+def exposition():
+    """Render every metric in the Prometheus text format.
+
+    With PROMETHEUS_MULTIPROC_DIR set (e.g. several gunicorn workers)
+    the values are merged from every process writing to that directory.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+
+class Metrics:
+    """Request, SQL and outbound call metrics, served on /metrics."""
+
+    def init_app(self, app):
+        app.extensions["metrics"] = self
+
+        @app.before_request
+        def start_timer():
+            g.metrics_request_started = time.perf_counter()
+            g.metrics_sql_statements = 0
+            g.metrics_sql_seconds = 0.0
+
+        @app.after_request
+        def stop_timer(response):
+            record_request(response.status_code)
+            return response
+
+        @app.teardown_request
+        def record_failed_request(exc):
+            # Only still pending when the view raised and no response was made.
+            if exc is not None:
+                record_request(500)
+
+        @app.route("/metrics")
+        def metrics_endpoint():
+            token = app.config.get("METRICS_TOKEN")
+            if not token and app.config.get("METRICS_REQUIRE_TOKEN"):
+                abort(404)
+            if token and request.headers.get("Authorization") != f"Bearer {token}":
+                abort(401)
+            return Response(exposition(), content_type=CONTENT_TYPE_LATEST)
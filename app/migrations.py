@@ -0,0 +1,212 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import select, insert, update, bindparam, inspect, text
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db
+
+BACKFILL_BATCH_SIZE = 1000
+
+schema_migrations = db.Table(
+    "schema_migrations",
+    db.Column("version", db.Integer, primary_key=True),
+    db.Column("name", db.String(200), nullable=False),
+    db.Column("applied_at", db.DateTime(timezone=True), nullable=False)
+)
+
+
+def _invalid_index(connection, name):
+    return connection.execute(
+        text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND pg_table_is_visible(c.oid) AND NOT i.indisvalid"
+        ),
+        {"name": name}
+    ).first() is not None
+
+
+def _create_index(connection, name, table, *columns):
+    # Postgres builds the index without blocking writes; SQLite has no
+    # equivalent, but its CREATE INDEX is quick at our table sizes.
+    quote = connection.dialect.identifier_preparer.quote
+    concurrently = " CONCURRENTLY" if connection.dialect.name == "postgresql" else ""
+    # A CONCURRENTLY build that fails leaves an INVALID index behind,
+    # which IF NOT EXISTS would then keep; drop it and build again.
+    if connection.dialect.name == "postgresql" and _invalid_index(connection, name):
+        _drop_index(connection, name)
+    connection.exec_driver_sql(
+        f"CREATE INDEX{concurrently} IF NOT EXISTS {quote(name)} "
+        f"ON {quote(table)} ({', '.join(quote(c) for c in columns)})"
+    )
+
+
+def _drop_index(connection, name):
+    quote = connection.dialect.identifier_preparer.quote
+    concurrently = " CONCURRENTLY" if connection.dialect.name == "postgresql" else ""
+    connection.exec_driver_sql(f"DROP INDEX{concurrently} IF EXISTS {quote(name)}")
+
+
+def _add_hot_path_indexes(connection):
+    _create_index(connection, "ix_availability_professor_slot", "availability", "professor_email", "date", "time")
+    _create_index(connection, "ix_availability_open_slot", "availability", "booked", "date", "time")
+    _create_index(connection, "ix_meeting_professor_slot", "meeting", "professor_email", "date", "time")
+    _create_index(connection, "ix_meeting_student_slot", "meeting", "student_email", "date", "time")
+    _create_index(connection, "ix_meeting_slot", "meeting", "date", "time")
+    _create_index(connection, "ix_notification_inbox", "notification", "user_email", "created_at")
+    _create_index(connection, "ix_notification_meeting_type", "notification", "meeting_id", "type")
+
+
+def _add_starts_at(connection):
+    from app.models import slot_start
+
+    quote = connection.dialect.identifier_preparer.quote
+    column_type = "TIMESTAMP WITH TIME ZONE" if connection.dialect.name == "postgresql" else "DATETIME"
+
+    for table in ("meeting", "availability"):
+        columns = {c["name"] for c in inspect(connection).get_columns(table)}
+        if "starts_at" not in columns:
+            connection.exec_driver_sql(f"ALTER TABLE {quote(table)} ADD COLUMN starts_at {column_type}")
+
+        # Backfill in bounded batches so no single statement holds locks
+        # for long. Rows whose strings do not parse stay NULL and are
+        # skipped by every time-window query.
+        table_ref = db.table(
+            table,
+            db.column("id"),
+            db.column("date"),
+            db.column("time"),
+            db.column("starts_at", db.DateTime(timezone=True))
+        )
+        last_id = 0
+        while True:
+            rows = connection.execute(
+                select(table_ref.c.id, table_ref.c.date, table_ref.c.time)
+                .where(table_ref.c.starts_at.is_(None), table_ref.c.id > last_id)
+                .order_by(table_ref.c.id)
+                .limit(BACKFILL_BATCH_SIZE)
+            ).all()
+            if not rows:
+                break
+
+            updates = [
+                {"row_id": row.id, "starts_at": slot_start(row.date, row.time)}
+                for row in rows
+            ]
+            updates = [u for u in updates if u["starts_at"] is not None]
+            if updates:
+                connection.execute(
+                    update(table_ref)
+                    .where(table_ref.c.id == bindparam("row_id"))
+                    .values(starts_at=bindparam("starts_at")),
+                    updates
+                )
+            connection.commit()
+            last_id = rows[-1].id
+
+    _drop_index(connection, "ix_meeting_slot")
+    _drop_index(connection, "ix_availability_open_slot")
+    _create_index(connection, "ix_meeting_starts_at", "meeting", "starts_at")
+    _create_index(connection, "ix_availability_open_starts_at", "availability", "booked", "starts_at")
+
+
+def _add_unread_count(connection):
+    quote = connection.dialect.identifier_preparer.quote
+    columns = {c["name"] for c in inspect(connection).get_columns("user")}
+    if "unread_count" not in columns:
+        connection.exec_driver_sql(
+            f"ALTER TABLE {quote('user')} ADD COLUMN unread_count INTEGER NOT NULL DEFAULT 0"
+        )
+
+    false = "false" if connection.dialect.name == "postgresql" else "0"
+    connection.exec_driver_sql(
+        f"UPDATE {quote('user')} SET unread_count = ("
+        f"SELECT COUNT(*) FROM notification "
+        f"WHERE notification.user_email = {quote('user')}.email "
+        f"AND (notification.is_read IS NULL OR notification.is_read = {false}))"
+    )
+    connection.commit()
+
+
+def _add_google_token(connection):
+    quote = connection.dialect.identifier_preparer.quote
+    columns = {c["name"] for c in inspect(connection).get_columns("user")}
+    if "google_token" not in columns:
+        connection.exec_driver_sql(f"ALTER TABLE {quote('user')} ADD COLUMN google_token JSON")
+
+
+def _add_slot_duration(connection):
+    columns = {c["name"] for c in inspect(connection).get_columns("availability")}
+    if "duration_minutes" not in columns:
+        connection.exec_driver_sql(
+            "ALTER TABLE availability ADD COLUMN duration_minutes INTEGER NOT NULL DEFAULT 60"
+        )
+
+
+def _add_notification_created_at_index(connection):
+    # Lets the retention job find old rows without scanning the table;
+    # notification_archive itself is new, so create_all makes it.
+    _create_index(connection, "ix_notification_created_at", "notification", "created_at")
+
+
+# Append only. Every step must be safe to re-run: on Postgres it runs in
+# autocommit mode (CONCURRENTLY cannot run inside a transaction), so a
+# failure part-way through is retried from the start on the next upgrade
+# (_create_index rebuilds an index a failed run left INVALID).
+MIGRATIONS = [
+    (1, "add hot path indexes", _add_hot_path_indexes),
+    (2, "add starts_at timestamps", _add_starts_at),
+    (3, "add user unread_count", _add_unread_count),
+    (4, "add user google_token", _add_google_token),
+    (5, "add availability duration_minutes", _add_slot_duration),
+    (6, "add notification created_at index", _add_notification_created_at_index),
+]
+
+
+def applied_versions(engine):
+    schema_migrations.create(engine, checkfirst=True)
+    with engine.connect() as connection:
+        return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+
+def init_schema(db):
+    """Create missing tables, then run pending migrations; returns their versions."""
+    db.create_all()
+    return upgrade(db.engine)
+
+
+def upgrade(engine):
+    applied = applied_versions(engine)
+    ran = []
+
+    for version, name, step in MIGRATIONS:
+        if version in applied:
+            continue
+
+        with engine.connect() as connection:
+            if engine.dialect.name == "postgresql":
+                connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+                # DB_STATEMENT_TIMEOUT_MS is meant for requests; building an
+                # index on a large table takes longer. RESET goes back to
+                # the connection's own setting before it returns to the pool.
+                connection.exec_driver_sql("SET statement_timeout = 0")
+                try:
+                    step(connection)
+                finally:
+                    connection.exec_driver_sql("RESET statement_timeout")
+            else:
+                step(connection)
+
+            try:
+                connection.execute(insert(schema_migrations).values(
+                    version=version,
+                    name=name,
+                    applied_at=datetime.now(timezone.utc)
+                ))
+                connection.commit()
+            except IntegrityError:
+                # Another worker finished the same step first.
+                connection.rollback()
+
+        ran.append(version)
+
+    return ran
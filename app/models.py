@@ -1,6 +1,32 @@
+import os
 from app.extensions import db
+from app.identity import forget_on_commit
 from flask_login import UserMixin
+from collections import Counter
+from sqlalchemy import event, update, bindparam, select
+from sqlalchemy.orm import Session, foreign
 from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+# Slot dates and times are entered as campus wall-clock strings.
+LOCAL_TIMEZONE = ZoneInfo(os.getenv("COLLEGIA_TIMEZONE", "America/New_York"))
+SLOT_TIME_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M")
+
+
+def slot_start(date, time):
+    """Return the UTC instant for a local date/time string pair, or None."""
+    for fmt in SLOT_TIME_FORMATS:
+        try:
+            local = datetime.strptime(f"{date} {time}", fmt)
+        except (TypeError, ValueError):
+            continue
+        return local.replace(tzinfo=LOCAL_TIMEZONE).astimezone(timezone.utc)
+    return None
+
+
+def local_midnight_utc(day):
+    """Return the UTC instant at which the given local calendar day starts."""
+    return datetime(day.year, day.month, day.day, tzinfo=LOCAL_TIMEZONE).astimezone(timezone.utc)
 
 
 class User(db.Model, UserMixin):
@@ -19,6 +45,14 @@ class User(db.Model, UserMixin):
         default="logo.png"
     )
 
+    # Google OAuth token saved at booking time so background calendar
+    # sync can act for the user.
+    google_token = db.Column(db.JSON, nullable=True)
+
+    # Counter cache of unread personal notifications, kept in step with
+    # notification inserts, deletes and reads so the nav badge is free.
+    unread_count = db.Column(db.Integer, nullable=False, default=0)
+
     created_at = db.Column(
         db.DateTime(timezone=True),
         nullable=False,
@@ -27,6 +61,11 @@ class User(db.Model, UserMixin):
 
 
 class Availability(db.Model):
+    __table_args__ = (
+        db.Index("ix_availability_professor_slot", "professor_email", "date", "time"),
+        db.Index("ix_availability_open_starts_at", "booked", "starts_at"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
 
     professor_name = db.Column(db.String(120), nullable=False)
@@ -34,6 +73,8 @@ class Availability(db.Model):
 
     date = db.Column(db.String(50), nullable=False)
     time = db.Column(db.String(50), nullable=False)
+    starts_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    duration_minutes = db.Column(db.Integer, nullable=False, default=60, server_default="60")
 
     booked = db.Column(db.Boolean, default=False)
 
@@ -43,8 +84,21 @@ class Availability(db.Model):
         default=lambda: datetime.now(timezone.utc)
     )
 
+    professor_user = db.relationship(
+        User,
+        primaryjoin=lambda: foreign(Availability.professor_email) == User.email,
+        viewonly=True,
+        uselist=False
+    )
+
 
 class Meeting(db.Model):
+    __table_args__ = (
+        db.Index("ix_meeting_professor_slot", "professor_email", "date", "time"),
+        db.Index("ix_meeting_student_slot", "student_email", "date", "time"),
+        db.Index("ix_meeting_starts_at", "starts_at"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
 
     student = db.Column(db.String(120), nullable=False)
@@ -58,6 +112,7 @@ class Meeting(db.Model):
 
     date = db.Column(db.String(50), nullable=False)
     time = db.Column(db.String(50), nullable=False)
+    starts_at = db.Column(db.DateTime(timezone=True), nullable=True)
 
     notified = db.Column(db.Boolean, default=False)
 
@@ -67,8 +122,37 @@ class Meeting(db.Model):
         default=lambda: datetime.now(timezone.utc)
     )
 
+    student_user = db.relationship(
+        User,
+        primaryjoin=lambda: foreign(Meeting.student_email) == User.email,
+        viewonly=True,
+        uselist=False
+    )
+
+    professor_user = db.relationship(
+        User,
+        primaryjoin=lambda: foreign(Meeting.professor_email) == User.email,
+        viewonly=True,
+        uselist=False
+    )
+
+    @property
+    def key(self):
+        """Names this meeting for good, for outbox idempotency keys.
+
+        The id alone is not enough: SQLite gives a deleted meeting's id to
+        the next one created.
+        """
+        return f"{self.id}@{self.created_at:%Y%m%dT%H%M%S%f}"
+
 
 class Notification(db.Model):
+    __table_args__ = (
+        db.Index("ix_notification_inbox", "user_email", "created_at"),
+        db.Index("ix_notification_meeting_type", "meeting_id", "type"),
+        db.Index("ix_notification_created_at", "created_at"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
 
     user_email = db.Column(db.String(120), nullable=False)
@@ -84,3 +168,198 @@ class Notification(db.Model):
         nullable=False,
         default=lambda: datetime.now(timezone.utc)
     )
+
+
+class NotificationArchive(db.Model):
+    """Read notifications moved out of the inbox table by app.retention.
+
+    Rows keep their notification id; nothing in the app reads them back.
+    """
+    __tablename__ = "notification_archive"
+    __table_args__ = (
+        db.Index("ix_notification_archive_user", "user_email", "created_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+
+    user_email = db.Column(db.String(120), nullable=False)
+
+    message = db.Column(db.String(500), nullable=False)
+    type = db.Column(db.String(50), nullable=False)
+
+    is_read = db.Column(db.Boolean, default=True)
+    meeting_id = db.Column(db.Integer, nullable=True)
+
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    archived_at = db.Column(db.DateTime(timezone=True), nullable=False)
+
+
+class EmailOutbox(db.Model):
+    __table_args__ = (
+        db.Index("ix_email_outbox_due", "status", "next_attempt_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    idempotency_key = db.Column(db.String(200), unique=True, nullable=False)
+
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+
+    status = db.Column(db.String(20), nullable=False, default="pending")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.String(500))
+
+    next_attempt_at = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc)
+    )
+    sent_at = db.Column(db.DateTime(timezone=True), nullable=True)
+
+    created_at = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc)
+    )
+
+
+class CalendarJob(db.Model):
+    __table_args__ = (
+        db.Index("ix_calendar_job_due", "status", "next_attempt_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    user_id = db.Column(db.Integer, nullable=False)
+    meeting_id = db.Column(db.Integer, nullable=False)
+    event = db.Column(db.JSON, nullable=False)
+
+    status = db.Column(db.String(20), nullable=False, default="pending")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.String(500))
+
+    next_attempt_at = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc)
+    )
+
+    created_at = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc)
+    )
+
+
+class ReminderClaim(db.Model):
+    meeting_id = db.Column(db.Integer, primary_key=True)
+    window = db.Column(db.String(10), primary_key=True)
+
+    holder = db.Column(db.String(200), nullable=False)
+    expires_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    completed_at = db.Column(db.DateTime(timezone=True), nullable=True)
+
+
+class ChangeVersion(db.Model):
+    """A counter per scope, bumped in the transaction that changes it.
+
+    API clients revalidate against these instead of re-reading the data.
+    """
+    scope = db.Column(db.String(200), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    changed_at = db.Column(db.DateTime(timezone=True), nullable=False)
+
+
+CATALOGUE_SCOPE = "catalogue"
+
+
+def user_scope(email):
+    return f"user:{email}"
+
+
+def change_version(scope):
+    """The current version of `scope`, 0 if it never changed."""
+    return db.session.scalar(select(ChangeVersion.version).where(ChangeVersion.scope == scope)) or 0
+
+
+@event.listens_for(Availability, "before_insert")
+@event.listens_for(Availability, "before_update")
+@event.listens_for(Meeting, "before_insert")
+@event.listens_for(Meeting, "before_update")
+def sync_starts_at(mapper, connection, target):
+    target.starts_at = slot_start(target.date, target.time)
+
+
+def adjust_unread_counts(connection, deltas):
+    """Apply {email: delta} to User.unread_count in one executemany."""
+    params = [{"target_email": email, "delta": delta} for email, delta in deltas.items() if delta]
+    if not params:
+        return
+
+    users = User.__table__
+    connection.execute(
+        update(users)
+        .where(users.c.email == bindparam("target_email"))
+        .values(unread_count=users.c.unread_count + bindparam("delta")),
+        params
+    )
+
+
+def bump_versions(connection, scopes):
+    """Advance the change version of each scope in one upsert."""
+    scopes = sorted(set(scopes))
+    if not scopes:
+        return
+
+    if connection.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+
+    now = datetime.now(timezone.utc)
+    table = ChangeVersion.__table__
+    statement = dialect_insert(table)
+    connection.execute(
+        statement.on_conflict_do_update(
+            index_elements=[table.c.scope],
+            set_={"version": table.c.version + 1, "changed_at": statement.excluded.changed_at}
+        ),
+        [{"scope": scope, "version": 1, "changed_at": now} for scope in scopes]
+    )
+
+
+def changed_scopes(obj):
+    if isinstance(obj, Notification):
+        return [user_scope(obj.user_email)]
+    if isinstance(obj, Meeting):
+        return [user_scope(obj.student_email), user_scope(obj.professor_email)]
+    if isinstance(obj, Availability):
+        return [CATALOGUE_SCOPE, user_scope(obj.professor_email)]
+    return []
+
+
+@event.listens_for(Session, "before_flush")
+def track_changes(session, flush_context, instances):
+    # Bulk statements bypass this hook; their callers bump versions
+    # themselves.
+    scopes = set()
+    for obj in session.new | session.deleted:
+        scopes.update(changed_scopes(obj))
+    for obj in session.dirty:
+        if session.is_modified(obj):
+            scopes.update(changed_scopes(obj))
+    if scopes:
+        bump_versions(session.connection(), scopes)
+
+
+@event.listens_for(Session, "before_flush")
+def count_new_notifications(session, flush_context, instances):
+    deltas = Counter(
+        obj.user_email for obj in session.new
+        if isinstance(obj, Notification) and not obj.is_read
+    )
+    if deltas:
+        adjust_unread_counts(session.connection(), deltas)
+        forget_on_commit(session, emails=deltas)
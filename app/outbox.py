@@ -0,0 +1,197 @@
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from flask_mail import Message
+from sqlalchemy import insert
+
+from app.extensions import db, mail
+from app.metrics import SMTP_SECONDS
+from app.models import EmailOutbox
+
+BATCH_SIZE = 50
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 30
+SENDER_THREADS = int(os.getenv("MAIL_SENDER_THREADS", 4))
+
+
+def queue_email(to_email, subject, body, idempotency_key):
+    """Add an email to the outbox in the caller's transaction.
+
+    Nothing is sent until the surrounding commit succeeds and a worker
+    picks the row up. A key that is already queued is ignored.
+    """
+    entries = queue_emails([(to_email, subject, body, idempotency_key)])
+    return entries[0] if entries else None
+
+
+def queue_emails(emails, hold=None):
+    """Queue (to_email, subject, body, idempotency_key) tuples in one go.
+
+    Returns the newly added entries; keys already in the outbox are skipped.
+    With `hold`, the email worker leaves the rows alone for that long, so
+    a caller that sends them itself after committing is not raced.
+    """
+    keys = [key for _, _, _, key in emails]
+    if not keys:
+        return []
+
+    existing = set(db.session.scalars(
+        db.select(EmailOutbox.idempotency_key).where(EmailOutbox.idempotency_key.in_(keys))
+    ))
+
+    rows = []
+    for to_email, subject, body, key in emails:
+        if key in existing:
+            continue
+        existing.add(key)
+        rows.append({
+            "idempotency_key": key,
+            "recipient": to_email,
+            "subject": subject,
+            "body": body,
+            "status": "pending",
+            "attempts": 0,
+        })
+    if hold:
+        next_attempt_at = datetime.now(timezone.utc) + hold
+        for row in rows:
+            row["next_attempt_at"] = next_attempt_at
+    if not rows:
+        return []
+
+    # One multi-row INSERT ... RETURNING; adding objects to the session
+    # instead makes SQLite insert them one statement at a time.
+    return list(db.session.scalars(insert(EmailOutbox).returning(EmailOutbox), rows))
+
+
+def backoff_delay(attempts):
+    return timedelta(seconds=BACKOFF_BASE_SECONDS * 2 ** (attempts - 1))
+
+
+def build_message(entry):
+    msg = Message(subject=entry.subject, recipients=[entry.recipient], body=entry.body)
+    # A stable Message-ID lets receiving servers drop a resend that
+    # happens if we crash between sending and recording the send.
+    digest = hashlib.sha256(entry.idempotency_key.encode()).hexdigest()[:32]
+    msg.msgId = f"<{digest}@collegia>"
+    return msg
+
+
+def send_messages(app, messages, threads=SENDER_THREADS):
+    """Send (key, Message) pairs over at most `threads` SMTP connections.
+
+    Each sender thread opens one connection and reuses it for its share
+    of the batch. Returns {key: None} for sent messages and
+    {key: exception} for failed ones.
+    """
+    if not messages:
+        return {}
+
+    chunks = [messages[i::threads] for i in range(min(threads, len(messages)))]
+
+    def send_chunk(chunk):
+        results = {}
+        with app.app_context():
+            try:
+                with mail.connect() as connection:
+                    for key, msg in chunk:
+                        started = time.perf_counter()
+                        try:
+                            connection.send(msg)
+                            results[key] = None
+                        except Exception as e:
+                            results[key] = e
+                        SMTP_SECONDS.labels(result="failed" if results[key] else "sent").observe(
+                            time.perf_counter() - started
+                        )
+            except Exception as e:
+                # The connection itself failed: everything not yet tried fails too.
+                for key, _ in chunk:
+                    results.setdefault(key, e)
+        return results
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=len(chunks)) as pool:
+        for chunk_results in pool.map(send_chunk, chunks):
+            results.update(chunk_results)
+    return results
+
+
+def record_failure(entry, error, now):
+    entry.attempts += 1
+    entry.last_error = str(error)[:500]
+    if entry.attempts >= MAX_ATTEMPTS:
+        entry.status = "failed"
+    else:
+        entry.next_attempt_at = now + backoff_delay(entry.attempts)
+
+
+def deliver(entries, threads=SENDER_THREADS):
+    """Send outbox entries now and record each result on its row.
+
+    Failed rows stay pending with a backoff, so the email worker retries
+    them. The caller commits.
+    """
+    now = datetime.now(timezone.utc)
+    results = send_messages(
+        current_app._get_current_object(),
+        [(entry.idempotency_key, build_message(entry)) for entry in entries],
+        threads
+    )
+
+    for entry in entries:
+        error = results[entry.idempotency_key]
+        if error is None:
+            entry.status = "sent"
+            entry.sent_at = datetime.now(timezone.utc)
+            entry.attempts += 1
+        else:
+            record_failure(entry, error, now)
+
+
+def claim_due(now, limit):
+    # SKIP LOCKED lets several workers drain the outbox side by side on
+    # Postgres; SQLite ignores it and serialises writers instead.
+    return EmailOutbox.query.filter(
+        EmailOutbox.status == "pending",
+        EmailOutbox.next_attempt_at <= now
+    ).order_by(EmailOutbox.next_attempt_at.asc()).limit(limit).with_for_update(skip_locked=True).all()
+
+
+def deliver_committed(ids, threads=SENDER_THREADS):
+    """Send outbox rows the caller has already committed.
+
+    The send happens in a short transaction of its own, so it holds no
+    locks from the transaction that queued the rows. Rows that are no
+    longer pending, or that a worker holds locked, are skipped. Returns
+    the number of rows processed.
+    """
+    if not ids:
+        return 0
+
+    entries = EmailOutbox.query.filter(
+        EmailOutbox.id.in_(ids),
+        EmailOutbox.status == "pending"
+    ).with_for_update(skip_locked=True).all()
+    if entries:
+        deliver(entries, threads)
+    db.session.commit()
+    return len(entries)
+
+
+def deliver_pending(app, limit=BATCH_SIZE, threads=SENDER_THREADS):
+    """Send one batch of due outbox emails.
+
+    Returns the number of rows processed (sent or failed).
+    """
+    with app.app_context():
+        entries = claim_due(datetime.now(timezone.utc), limit)
+        if entries:
+            deliver(entries, threads)
+        db.session.commit()
+        return len(entries)
+
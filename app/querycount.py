@@ -0,0 +1,175 @@
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import current_app, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# A statement shape seen this many times in one request or sweep is
+# reported as a likely N+1.
+REPEAT_THRESHOLD = 3
+
+_IN_LIST = re.compile(r"\(\s*(?:\?|%s|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))*\s*\)")
+_VALUES_ROWS = re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def statement_shape(statement):
+    """Reduce a statement to its shape, so repeats with other values match.
+
+    Literals become "?" and a parameter list of any length "(...)",
+    which makes `IN (?, ?)` and `IN (?, ?, ?)` the same shape, as are
+    multi-row VALUES lists of any length.
+    """
+    shape = _STRING.sub("?", statement)
+    shape = _NUMBER.sub("?", shape)
+    shape = _IN_LIST.sub("(...)", shape)
+    shape = _VALUES_ROWS.sub("(...)", shape)
+    return _SPACE.sub(" ", shape).strip()
+
+
+def query_budget(limit):
+    """Declare the most SQL statements a view may issue per request."""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+class QueryLog:
+    """Statements issued on one thread while recording."""
+
+    def __init__(self):
+        self.statements = []
+
+    def __len__(self):
+        return len(self.statements)
+
+    def shapes(self):
+        return Counter(statement_shape(s) for s in self.statements)
+
+    def repeated(self, threshold=REPEAT_THRESHOLD):
+        """(shape, count) for shapes issued at least `threshold` times, most first."""
+        return [(shape, count) for shape, count in self.shapes().most_common() if count >= threshold]
+
+    def summary(self, label, budget=None, threshold=REPEAT_THRESHOLD):
+        lines = [f"{label}: {len(self)} statement(s)" + (f", budget {budget}" if budget is not None else "")]
+        for shape, count in self.repeated(threshold):
+            lines.append(f"  repeated {count}x: {shape[:200]}")
+        return "\n".join(lines)
+
+    def check_budget(self, budget, label="block"):
+        if len(self) > budget:
+            raise QueryBudgetExceeded(self.summary(label, budget))
+
+
+class _Recorders(threading.local):
+    def __init__(self):
+        self.active = []
+
+
+_recorders = _Recorders()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    for log in _recorders.active:
+        log.statements.append(statement)
+
+
+def start_recording():
+    log = QueryLog()
+    _recorders.active.append(log)
+    return log
+
+
+def stop_recording(log):
+    if log in _recorders.active:
+        _recorders.active.remove(log)
+    return log
+
+
+@contextmanager
+def record_queries():
+    """Record the statements this thread issues inside the block.
+
+    Recordings nest, so a test can count one call inside a request that
+    is itself being recorded.
+    """
+    log = start_recording()
+    try:
+        yield log
+    finally:
+        stop_recording(log)
+
+
+@contextmanager
+def watch_queries(app, label, budget=None):
+    """Record a background job's statements when query counting is on.
+
+    Logs the count and any repeated shapes; with QUERY_BUDGET_STRICT an
+    over-budget job raises QueryBudgetExceeded.
+    """
+    if not enabled(app):
+        yield None
+        return
+    with record_queries() as log:
+        yield log
+    report(app, log, label, budget)
+
+
+def report(app, log, label, budget=None):
+    threshold = app.config.get("QUERY_REPEAT_THRESHOLD", REPEAT_THRESHOLD)
+    over_budget = budget is not None and len(log) > budget
+    if over_budget or log.repeated(threshold):
+        print(f"[QUERIES] {log.summary(label, budget, threshold)}")
+    if over_budget and app.config.get("QUERY_BUDGET_STRICT"):
+        raise QueryBudgetExceeded(log.summary(label, budget, threshold))
+
+
+def view_budget():
+    view = current_app.view_functions.get(request.endpoint)
+    return getattr(view, "query_budget", None)
+
+
+def enabled(app):
+    setting = app.config.get("QUERY_COUNT")
+    return app.debug if setting is None else setting
+
+
+def init_app(app):
+    """Count each request's statements when query counting is on.
+
+    QUERY_COUNT turns it on or off; left unset, it follows debug mode.
+
+    Responses get an X-Query-Count header. Requests over their view's
+    @query_budget, or that repeat a statement shape, are logged.
+    """
+    @app.before_request
+    def start_counting():
+        if enabled(app):
+            g.query_log = start_recording()
+
+    @app.after_request
+    def stop_counting(response):
+        log = g.pop("query_log", None)
+        if log is None:
+            return response
+        stop_recording(log)
+        response.headers["X-Query-Count"] = str(len(log))
+        report(app, log, f"{request.method} {request.path} ({request.endpoint})", view_budget())
+        return response
+
+    @app.teardown_request
+    def stop_failed_request(exc):
+        log = g.pop("query_log", None)
+        if log is not None:
+            stop_recording(log)
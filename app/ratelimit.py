@@ -0,0 +1,155 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from flask import request
+
+from app.metrics import LOGINS_THROTTLED
+
+PREFIX = "collegia:login"
+
+
+class MemoryBuckets:
+    """Token buckets held in this process, least recently used dropped first.
+
+    A dropped bucket comes back full, which only ever lets a little more
+    through; keep max_entries well above the number of clients seen in a
+    refill period.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate):
+        """Take a token from `key`'s bucket.
+
+        Returns (allowed, seconds until a token is next available).
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        return allowed, 0 if allowed else (1 - tokens) / rate
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+# Refill and take in one round trip, so concurrent workers cannot both
+# spend the last token.
+TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call("HMGET", KEYS[1], "tokens", "updated")
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "updated", tostring(now))
+redis.call("EXPIRE", KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBuckets:
+    """Token buckets shared by every process through Redis.
+
+    Like the cache's RedisBackend, any server speaking the Redis protocol
+    works, so a local `redis-server` stands in during development.
+    """
+
+    def __init__(self, url):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.script = self.client.register_script(TAKE_SCRIPT)
+
+    def take(self, key, capacity, rate):
+        allowed, tokens = self.script(keys=[key], args=[capacity, rate, time.time()])
+        tokens = float(tokens)
+        return bool(allowed), 0 if allowed else (1 - tokens) / rate
+
+    def clear(self):
+        for key in self.client.scan_iter(f"{PREFIX}:*"):
+            self.client.delete(key)
+
+
+class LoginLimiter:
+    """Throttles password logins per client IP and per account.
+
+    Each attempt takes a token from both buckets before the password is
+    hashed. An empty bucket means a 429, so a flood of guesses costs a
+    dictionary lookup rather than a worker's worth of hashing. Buckets
+    refill at a steady rate up to a burst size.
+    """
+
+    def __init__(self):
+        self.backend = None
+        self.limits = {}
+
+    def init_app(self, app):
+        backend = app.config.get("LOGIN_LIMIT_BACKEND", "memory")
+        if backend == "redis":
+            self.backend = RedisBuckets(app.config["LOGIN_LIMIT_URL"])
+        elif backend == "memory":
+            self.backend = MemoryBuckets(app.config.get("LOGIN_LIMIT_MAX_ENTRIES", 10000))
+        elif backend == "none":
+            self.backend = None
+        else:
+            raise ValueError(f"Unknown LOGIN_LIMIT_BACKEND: {backend}")
+        # (burst, tokens per second) for each kind of bucket.
+        self.limits = {
+            "ip": (app.config["LOGIN_LIMIT_IP_BURST"], app.config["LOGIN_LIMIT_IP_PER_MINUTE"] / 60),
+            "account": (app.config["LOGIN_LIMIT_ACCOUNT_BURST"], app.config["LOGIN_LIMIT_ACCOUNT_PER_MINUTE"] / 60),
+        }
+        app.extensions["login_limiter"] = self
+
+    def _key(self, kind, value):
+        # Hashed so emails are not stored in plain text in a shared Redis.
+        return f"{PREFIX}:{kind}:{hashlib.sha1(value.encode()).hexdigest()}"
+
+    def _take(self, kind, value):
+        capacity, rate = self.limits[kind]
+        try:
+            return self.backend.take(self._key(kind, value), capacity, rate)
+        except Exception as e:
+            # An outage of the shared store must not lock everyone out.
+            print(f"[RATELIMIT] Bucket check failed, allowing login: {e}")
+            return True, 0
+
+    def check(self, email):
+        """Take a token for this request's IP, then for `email`.
+
+        Returns the seconds to wait when either bucket is empty, else None.
+        The account bucket is left alone once the IP is refused, so one
+        address cannot drain the buckets of every account it tries.
+        """
+        if self.backend is None:
+            return None
+
+        for kind, value in (("ip", request.remote_addr or "unknown"), ("account", email.strip().lower())):
+            allowed, retry_after = self._take(kind, value)
+            if not allowed:
+                LOGINS_THROTTLED.labels(bucket=kind).inc()
+                return retry_after
+        return None
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
@@ -0,0 +1,158 @@
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+
+from sqlalchemy import false, func, insert, select
+
+from app.cache import CATALOGUE, invalidate_on_commit, professor_namespace
+from app.extensions import db
+from app.models import Availability, LOCAL_TIMEZONE
+
+MAX_SLOTS_PER_PROFESSOR = 2000
+
+# What each new slot row carries; booked and created_at are set by the
+# statement itself.
+SLOT_COLUMNS = ("professor_name", "professor_email", "date", "time", "starts_at", "duration_minutes")
+
+
+def parse_dates(text):
+    """Parse a comma or newline separated list of YYYY-MM-DD dates."""
+    dates = set()
+    for part in (text or "").replace("\n", ",").split(","):
+        part = part.strip()
+        if part:
+            dates.add(datetime.strptime(part, "%Y-%m-%d").date())
+    return dates
+
+
+def expand(weekdays, start_time, end_time, slot_minutes, start_date, end_date, exclusions=()):
+    """Expand a recurrence into local (date, time) slot starts, in order.
+
+    Slots of `slot_minutes` are laid end to end from `start_time`; one
+    that would run past `end_time` is dropped. Days in `exclusions` are
+    skipped.
+    """
+    weekdays = set(weekdays)
+    step = timedelta(minutes=slot_minutes)
+    day = start_date
+    while day <= end_date:
+        if day.weekday() in weekdays and day not in exclusions:
+            start = datetime.combine(day, start_time)
+            end = datetime.combine(day, end_time)
+            while start + step <= end:
+                yield start
+                start += step
+        day += timedelta(days=1)
+
+
+def existing_intervals(emails, window_start, window_end):
+    """Return {email: (sorted starts, running max of ends)} for the window."""
+    # No slot is longer than a day, so looking a day back catches any
+    # that start before the window and run into it.
+    rows = db.session.execute(
+        select(Availability.professor_email, Availability.starts_at, Availability.duration_minutes)
+        .where(
+            Availability.professor_email.in_(emails),
+            Availability.starts_at >= window_start - timedelta(days=1),
+            Availability.starts_at < window_end
+        )
+    ).all()
+
+    intervals = {}
+    for email, starts_at, minutes in rows:
+        starts_at = starts_at.replace(tzinfo=starts_at.tzinfo or timezone.utc)
+        intervals.setdefault(email, []).append((starts_at, starts_at + timedelta(minutes=minutes or 60)))
+
+    for email, spans in intervals.items():
+        spans.sort()
+        intervals[email] = ([s for s, _ in spans], list(accumulate((e for _, e in spans), max)))
+    return intervals
+
+
+def insert_slots(connection, rows):
+    """Bulk INSERT `rows`, tuples of SLOT_COLUMNS, in one executemany.
+
+    SQLAlchemy's per-row parameter handling costs more than SQLite's own
+    insert, so on SQLite the rows go straight to the driver, with
+    starts_at formatted once per distinct slot rather than once per row.
+    Other databases keep SQLAlchemy's batched multi-row VALUES.
+    """
+    statement = insert(Availability.__table__).values(booked=false(), created_at=func.now())
+    dialect = connection.dialect
+
+    if dialect.name != "sqlite":
+        connection.execute(
+            statement.execution_options(insertmanyvalues_page_size=5000),
+            [dict(zip(SLOT_COLUMNS, row)) for row in rows]
+        )
+        return
+
+    compiled = statement.compile(dialect=dialect, column_keys=list(SLOT_COLUMNS))
+    order = [SLOT_COLUMNS.index(name) for name in compiled.positiontup]
+    process = Availability.__table__.c.starts_at.type.dialect_impl(dialect).bind_processor(dialect)
+    formatted = {}
+    params = []
+    for row in rows:
+        row = list(row)
+        starts_at = row[4]
+        if starts_at not in formatted:
+            formatted[starts_at] = process(starts_at) if process else starts_at
+        row[4] = formatted[starts_at]
+        params.append(tuple(row[i] for i in order))
+    connection.exec_driver_sql(compiled.string, params)
+
+
+def create_recurring_slots(professors, weekdays, start_time, end_time, slot_minutes,
+                           start_date, end_date, exclusions=()):
+    """Create the slots a recurrence describes for each (name, email) professor.
+
+    Existing slots are read in one query and the new ones written in one
+    bulk INSERT. A slot starting exactly when an existing one does is a
+    duplicate; one that otherwise overlaps an existing slot is an
+    overlap. Both are skipped. The caller commits.
+
+    Returns {"created": n, "duplicates": n, "overlaps": n}.
+    """
+    local_starts = list(expand(weekdays, start_time, end_time, slot_minutes, start_date, end_date, exclusions))
+    if len(local_starts) > MAX_SLOTS_PER_PROFESSOR:
+        raise ValueError(f"That recurrence makes {len(local_starts)} slots; the limit is {MAX_SLOTS_PER_PROFESSOR}.")
+
+    result = {"created": 0, "duplicates": 0, "overlaps": 0}
+    if not local_starts or not professors:
+        return result
+
+    length = timedelta(minutes=slot_minutes)
+    # Formatted once here rather than once per professor.
+    candidates = [
+        (local.strftime("%Y-%m-%d"), local.strftime("%H:%M:%S"), local.replace(tzinfo=LOCAL_TIMEZONE).astimezone(timezone.utc))
+        for local in local_starts
+    ]
+    existing = existing_intervals(
+        [email for _, email in professors],
+        candidates[0][2],
+        candidates[-1][2] + length
+    )
+
+    rows = []
+    for name, email in professors:
+        starts, max_ends = existing.get(email, ([], []))
+        taken = set(starts)
+        for slot_date, slot_time, starts_at in candidates:
+            if starts_at in taken:
+                result["duplicates"] += 1
+                continue
+            # Existing slots starting before this one ends overlap it if
+            # any of them is still running when it starts.
+            i = bisect_left(starts, starts_at + length)
+            if i and max_ends[i - 1] > starts_at:
+                result["overlaps"] += 1
+                continue
+            rows.append((name, email, slot_date, slot_time, starts_at, slot_minutes))
+
+    if rows:
+        # A Core insert skips the ORM's per-row bookkeeping; starts_at is
+        # filled in above since no mapper events run.
+        insert_slots(db.session.connection(), rows)
+        invalidate_on_commit(db.session, CATALOGUE, *(professor_namespace(email) for _, email in professors))
+    result["created"] = len(rows)
+    return result
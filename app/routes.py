@@ -1,93 +1,100 @@
 import os
-from flask import render_template, redirect, Blueprint, request, url_for, session, flash
+import base64
+import json
+import math
+import random
+import time
+from flask import (
+    render_template, redirect, Blueprint, request, url_for, session, flash, jsonify, Response, current_app,
+    send_from_directory, g
+)
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
-from flask_dance.contrib.google import make_google_blueprint, google
-from flask_mail import Message
-from app.extensions import db, login_manager, mail
-from app.models import User, Meeting, Availability, Notification
-from forms import LoginForm, RegisterForm, AvailabilityForm, BookingForm, SettingsForm, MeetingNotesForm
-from datetime import datetime, timedelta
+from werkzeug.local import LocalProxy
+from sqlalchemy import or_, and_, update, select, func, delete
+from sqlalchemy.orm import selectinload
+from app.extensions import db, events, cache, login_limiter
+from app.cache import CATALOGUE, professor_namespace, invalidate_on_commit
+from app.metrics import NOTIFICATION_STREAMS_REFUSED, google_call
+from app.identity import forget_on_commit
+from app.querycount import query_budget
+from app.models import (
+    User, Meeting, Availability, Notification, ReminderClaim, local_midnight_utc, adjust_unread_counts,
+    bump_versions, user_scope
+)
+from app.outbox import queue_email
+from app.calendar_sync import queue_calendar_event
+from app.recurrence import create_recurring_slots, parse_dates
+from app.avatars import (
+    InvalidImage, update_profile_picture, is_content_hash, thumbnail_name, thumbnails_dir, THUMBNAIL_MAX_AGE
+)
+from forms import (
+    LoginForm, RegisterForm, AvailabilityForm, RecurringAvailabilityForm, BookingForm, SettingsForm, MeetingNotesForm
+)
+from datetime import datetime, timedelta, timezone
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+SESSIONS_PAGE_SIZE = 20
+NOTIFICATIONS_PAGE_SIZE = 20
+# A stream whose client went away is only noticed on the next write, so
+# keepalives also bound how long it holds its slot.
+STREAM_KEEPALIVE_SECONDS = 5
+# How long a client turned away for lack of stream slots waits, spread
+# out so refused clients do not all come back at once.
+STREAM_BUSY_RETRY_MS = (30000, 90000)
 
 os.environ["OAUTHLIB_INSECURE_TRANSPORT"] = "1"
 
 routes = Blueprint("routes", __name__)
 
-google_bp = make_google_blueprint(
-    client_id=os.getenv("GOOGLE_OAUTH_CLIENT_ID"),
-    client_secret=os.getenv("GOOGLE_OAUTH_CLIENT_SECRET"),
-    scope=[
-        "openid",
-        "https://www.googleapis.com/auth/userinfo.email",
-        "https://www.googleapis.com/auth/userinfo.profile",
-        "https://www.googleapis.com/auth/calendar.events"
-    ],
-    redirect_to="routes.google_callback"
-)
+class GoogleNotConfigured:
+    authorized = False
+
+# Flask-Dance's `google` proxy, minus the import: the Google blueprint
+# puts its session on `g` before each request once it is registered.
+google = LocalProxy(lambda: g.get("flask_dance_google", GoogleNotConfigured()))
 
 @routes.record_once
 def on_load(state):
+    # Flask-Dance (and requests with it) is only imported for apps that
+    # have Google sign-in configured.
+    if not state.app.config.get("GOOGLE_OAUTH_CLIENT_ID"):
+        return
+
+    from flask_dance.contrib.google import make_google_blueprint
+
+    google_bp = make_google_blueprint(
+        scope=[
+            "openid",
+            "https://www.googleapis.com/auth/userinfo.email",
+            "https://www.googleapis.com/auth/userinfo.profile",
+            "https://www.googleapis.com/auth/calendar.events"
+        ],
+        offline=True,
+        redirect_to="routes.google_callback"
+    )
     state.app.register_blueprint(google_bp, url_prefix="/login")
 
-@login_manager.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
-
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def send_email_notification(to_email, subject, body):
-    try:
-        msg = Message(
-            subject=subject,
-            recipients=[to_email],
-            body=body
-        )
-        mail.send(msg)
-        print(f"[EMAIL] Sent to {to_email}: {subject}")
-    except Exception as e:
-        print(f"[EMAIL] Failed to send to {to_email}: {e}")
-
-def create_google_calendar_event(meeting):
-    try:
-        if not google.authorized:
-            return False
-        
-        meeting_datetime = datetime.strptime(f"{meeting.date} {meeting.time}", "%Y-%m-%d %H:%M:%S")
-        end_datetime = meeting_datetime + timedelta(hours=1)
-        
-        event = {
-            'summary': f'Advising Meeting: {meeting.student} & {meeting.professor}',
-            'description': f'Student Notes: {meeting.notes}',
-            'start': {
-                'dateTime': meeting_datetime.isoformat(),
-                'timeZone': 'America/New_York',
-            },
-            'end': {
-                'dateTime': end_datetime.isoformat(),
-                'timeZone': 'America/New_York',
-            },
-            'reminders': {
-                'useDefault': False,
-                'overrides': [
-                    {'method': 'email', 'minutes': 24 * 60},
-                    {'method': 'popup', 'minutes': 30},
-                ],
-            },
-        }
-        
-        response = google.post(
-            "https://www.googleapis.com/calendar/v3/calendars/primary/events",
-            json=event
-        )
-        
-        return response.ok
-    except Exception as e:
-        print(f"[CALENDAR] Error creating event: {e}")
-        return False
+@routes.app_template_global()
+def avatar_url(picture, size="sm"):
+    if is_content_hash(picture):
+        return url_for("routes.avatar", filename=thumbnail_name(picture, size))
+    # Pictures uploaded before thumbnails existed are served as they are.
+    return url_for("static", filename="uploads/profiles/" + picture)
+
+@routes.route("/avatars/<filename>")
+def avatar(filename):
+    response = send_from_directory(
+        thumbnails_dir(current_app.config["UPLOAD_FOLDER"]),
+        filename,
+        max_age=THUMBNAIL_MAX_AGE
+    )
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
 
 @routes.route("/", methods=["GET", "POST"])
 def login():
@@ -96,6 +103,11 @@ def login():
 
     form = LoginForm()
     if form.validate_on_submit():
+        retry_after = login_limiter.check(form.email.data)
+        if retry_after is not None:
+            flash('Too many login attempts. Please wait a moment and try again.', 'error')
+            return render_template("login.html", form=form), 429, {"Retry-After": str(math.ceil(retry_after))}
+
         user = User.query.filter_by(email=form.email.data).first()
         if user and check_password_hash(user.password, form.password.data):
             login_user(user)
@@ -105,10 +117,14 @@ def login():
 
 @routes.route("/google-callback")
 def google_callback():
+    if "google" not in current_app.blueprints:
+        return redirect("/")
     if not google.authorized:
         return redirect(url_for("google.login"))
 
-    resp = google.get("/oauth2/v2/userinfo")
+    with google_call("userinfo") as call:
+        resp = google.get("/oauth2/v2/userinfo")
+        call.status = resp.status_code
     data = resp.json()
 
     email = data["email"]
@@ -182,36 +198,74 @@ def logout():
     return redirect("/")
 
 @routes.route("/home")
+@query_budget(5)
 @login_required
 def home():
     if current_user.role == "professor":
-        meetings = Meeting.query.filter_by(professor_email=current_user.email).all()
-        slots = Availability.query.filter_by(professor_email=current_user.email).all()
+        meetings = Meeting.query.options(
+            selectinload(Meeting.student_user)
+        ).filter_by(professor_email=current_user.email).all()
+        slots = professor_slots(current_user.email)
         
         for meeting in meetings:
-            student = User.query.filter_by(email=meeting.student_email).first()
+            student = meeting.student_user
             meeting.student_picture = student.profile_picture if student else None
         
-        available_count = sum(1 for s in slots if not s.booked)
-        booked_count = sum(1 for s in slots if s.booked)
-        
         return render_template(
             "home_professor.html",
             meetings=meetings,
-            slots=slots,
-            available_count=available_count,
-            booked_count=booked_count
+            slots=slots["slots"],
+            available_count=slots["available_count"],
+            booked_count=slots["booked_count"]
         )
     else:
-        meetings = Meeting.query.filter_by(student=current_user.name).all()
+        meetings = Meeting.query.options(
+            selectinload(Meeting.professor_user)
+        ).filter_by(student=current_user.name).all()
         
         for meeting in meetings:
-            professor = User.query.filter_by(email=meeting.professor_email).first()
+            professor = meeting.professor_user
             meeting.professor_picture = professor.profile_picture if professor else None
         
         return render_template("home_student.html", meetings=meetings)
 
+def professor_slots(email):
+    """A professor's slots and counts, cached until one of them changes."""
+    def load():
+        slots = [
+            {"id": s.id, "date": s.date, "time": s.time, "booked": bool(s.booked)}
+            for s in Availability.query.filter_by(professor_email=email).all()
+        ]
+        return {
+            "slots": slots,
+            "available_count": sum(1 for s in slots if not s["booked"]),
+            "booked_count": sum(1 for s in slots if s["booked"]),
+        }
+
+    return cache.get_or_set(professor_namespace(email), "slots", load)
+
+def invalidate_slots(professor_email):
+    invalidate_on_commit(db.session, professor_namespace(professor_email), CATALOGUE)
+
+def delete_meeting(meeting):
+    """Delete `meeting` along with its notifications and reminder claims.
+
+    SQLite hands a deleted row's id to the next meeting, which would then
+    look already reminded if anything keyed on the old id were left.
+    """
+    unread = db.session.execute(
+        select(Notification.user_email, func.count())
+        .where(Notification.meeting_id == meeting.id, Notification.is_read.isnot(True))
+        .group_by(Notification.user_email)
+    ).all()
+    adjust_unread_counts(db.session.connection(), {email: -count for email, count in unread})
+    forget_on_commit(db.session, emails=[email for email, _ in unread])
+    Notification.query.filter_by(meeting_id=meeting.id).delete()
+    db.session.execute(delete(ReminderClaim).where(ReminderClaim.meeting_id == meeting.id))
+    db.session.delete(meeting)
+
 @routes.route("/manage-sessions", methods=["GET", "POST"])
+@query_budget(6)
 @login_required
 def manage_sessions():
     if current_user.role != "professor":
@@ -227,56 +281,221 @@ def manage_sessions():
             time=str(form.time.data)
         )
         db.session.add(slot)
+        invalidate_slots(current_user.email)
         db.session.commit()
         flash('Availability added successfully!', 'success')
         return redirect("/manage-sessions")
 
     # FIXED: Changed from professor_name to professor_email
-    meetings = Meeting.query.filter_by(professor_email=current_user.email).all()
-    slots = Availability.query.filter_by(professor_email=current_user.email).all()
+    meetings = Meeting.query.options(
+        selectinload(Meeting.student_user)
+    ).filter_by(professor_email=current_user.email).all()
+    slots = professor_slots(current_user.email)
     
     for meeting in meetings:
-        student = User.query.filter_by(email=meeting.student_email).first()
+        student = meeting.student_user
         meeting.student_picture = student.profile_picture if student else None
-    
-    available_count = sum(1 for s in slots if not s.booked)
-    booked_count = sum(1 for s in slots if s.booked)
 
     return render_template(
         "manage_sessions_professor.html", 
         form=form, 
+        recurring_form=RecurringAvailabilityForm(),
         meetings=meetings, 
-        slots=slots,
-        available_count=available_count,
-        booked_count=booked_count
+        slots=slots["slots"],
+        available_count=slots["available_count"],
+        booked_count=slots["booked_count"]
+    )
+
+@routes.route("/manage-sessions/recurring", methods=["POST"])
+@login_required
+def add_recurring_availability():
+    if current_user.role != "professor":
+        return redirect("/sessions")
+
+    form = RecurringAvailabilityForm()
+    if not form.validate_on_submit():
+        for errors in form.errors.values():
+            for error in errors:
+                flash(error, 'error')
+        return redirect("/manage-sessions")
+
+    try:
+        exclusions = parse_dates(form.exclusions.data)
+        result = create_recurring_slots(
+            [(current_user.name, current_user.email)],
+            form.weekdays.data,
+            form.start_time.data,
+            form.end_time.data,
+            form.slot_minutes.data,
+            form.start_date.data,
+            form.end_date.data,
+            exclusions
+        )
+    except ValueError as e:
+        flash(f'Could not add availability: {e}', 'error')
+        return redirect("/manage-sessions")
+
+    db.session.commit()
+
+    message = f"Added {result['created']} slot(s)."
+    if result["duplicates"]:
+        message += f" Skipped {result['duplicates']} you already had."
+    if result["overlaps"]:
+        message += f" Skipped {result['overlaps']} that overlap existing slots."
+    flash(message, 'success')
+    return redirect("/manage-sessions")
+
+def encode_cursor(timestamp, row_id):
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    raw = f"{timestamp.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        timestamp, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+def parse_date_arg(name):
+    try:
+        return datetime.strptime(request.args.get(name, ""), "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+def parse_time_arg(name):
+    try:
+        return datetime.strptime(request.args.get(name, ""), "%H:%M").strftime("%H:%M:%S")
+    except ValueError:
+        return None
+
+def open_slots_page(filters, cursor):
+    """One page of the open-slot catalogue as plain, cacheable data."""
+    query = Availability.query.options(
+        selectinload(Availability.professor_user)
+    ).filter(
+        Availability.booked.is_(False),
+        Availability.starts_at >= datetime.now(timezone.utc)
     )
 
+    if filters["professor"]:
+        query = query.filter(Availability.professor_email == filters["professor"])
+    if filters["date_from"]:
+        query = query.filter(Availability.starts_at >= local_midnight_utc(filters["date_from"]))
+    if filters["date_to"]:
+        query = query.filter(Availability.starts_at < local_midnight_utc(filters["date_to"] + timedelta(days=1)))
+    # Times are stored zero-padded, so string order is time order.
+    if filters["time_from"]:
+        query = query.filter(Availability.time >= filters["time_from"])
+    if filters["time_to"]:
+        query = query.filter(Availability.time <= filters["time_to"])
+
+    if cursor:
+        starts_at, slot_id = cursor
+        query = query.filter(or_(
+            Availability.starts_at > starts_at,
+            and_(Availability.starts_at == starts_at, Availability.id > slot_id)
+        ))
+
+    # Fetch one extra row to learn whether another page exists.
+    available = query.order_by(
+        Availability.starts_at.asc(),
+        Availability.id.asc()
+    ).limit(SESSIONS_PAGE_SIZE + 1).all()
+
+    next_cursor = None
+    if len(available) > SESSIONS_PAGE_SIZE:
+        available = available[:SESSIONS_PAGE_SIZE]
+        next_cursor = encode_cursor(available[-1].starts_at, available[-1].id)
+    
+    return {
+        "available": [
+            {
+                "id": slot.id,
+                "date": slot.date,
+                "time": slot.time,
+                "starts_at": slot.starts_at.replace(tzinfo=slot.starts_at.tzinfo or timezone.utc),
+                "professor_name": slot.professor_user.name if slot.professor_user else 'Professor',
+                "professor_picture": slot.professor_user.profile_picture if slot.professor_user else None,
+            }
+            for slot in available
+        ],
+        "next_cursor": next_cursor,
+    }
+
 @routes.route("/sessions")
+@query_budget(8)
 @login_required
 def sessions():
-    available = Availability.query.filter_by(booked=False).all()
-    
-    for slot in available:
-        professor = User.query.filter_by(email=slot.professor_email).first()
-        slot.professor_name = professor.name if professor else 'Professor'
-        slot.professor_picture = professor.profile_picture if professor else None
+    filters = {
+        "professor": request.args.get("professor", ""),
+        "date_from": parse_date_arg("date_from"),
+        "date_to": parse_date_arg("date_to"),
+        "time_from": parse_time_arg("time_from"),
+        "time_to": parse_time_arg("time_to"),
+    }
+
+    cursor = decode_cursor(request.args.get("cursor", ""))
+    page = cache.get_or_set(CATALOGUE, [filters, cursor], lambda: open_slots_page(filters, cursor))
+
+    # A cached page may be a little older than a slot's start time.
+    now = datetime.now(timezone.utc)
+    available = [slot for slot in page["available"] if slot["starts_at"] >= now]
+    next_cursor = page["next_cursor"]
     
-    booked = Meeting.query.filter_by(student_email=current_user.email).order_by(Meeting.date.asc(), Meeting.time.asc()).all()
+    booked = Meeting.query.options(
+        selectinload(Meeting.professor_user)
+    ).filter_by(student_email=current_user.email).order_by(Meeting.date.asc(), Meeting.time.asc()).all()
     
     for meeting in booked:
-        professor = User.query.filter_by(email=meeting.professor_email).first()
+        professor = meeting.professor_user
         meeting.professor_name = professor.name if professor else 'Professor'
         meeting.professor_picture = professor.profile_picture if professor else None
+
+    professors = db.session.query(User.name, User.email).filter_by(
+        role="professor"
+    ).order_by(User.name.asc()).all()
+
+    filter_args = {
+        "professor": filters["professor"],
+        "date_from": request.args.get("date_from", "") if filters["date_from"] else "",
+        "date_to": request.args.get("date_to", "") if filters["date_to"] else "",
+        "time_from": request.args.get("time_from", "") if filters["time_from"] else "",
+        "time_to": request.args.get("time_to", "") if filters["time_to"] else "",
+    }
     
-    return render_template("sessions.html", available=available, booked=booked)
+    return render_template(
+        "sessions.html",
+        available=available,
+        booked=booked,
+        professors=professors,
+        filters=filter_args,
+        next_cursor=next_cursor,
+        is_first_page=cursor is None
+    )
 
 @routes.route("/book/<int:slot_id>", methods=["GET", "POST"])
 @login_required
 def book(slot_id):
-    slot = Availability.query.get(slot_id)
+    slot = Availability.query.get_or_404(slot_id)
     form = BookingForm()
 
     if form.validate_on_submit():
+        # Claim the slot with a conditional UPDATE so that, of many
+        # concurrent bookings, exactly one sees a matched row.
+        claimed = db.session.execute(
+            update(Availability)
+            .where(Availability.id == slot.id, Availability.booked.isnot(True))
+            .values(booked=True)
+        ).rowcount
+        if not claimed:
+            db.session.rollback()
+            flash('Sorry, this slot was just booked by someone else.', 'error')
+            return redirect("/sessions")
+        invalidate_slots(slot.professor_email)
+
         meeting = Meeting(
             student=current_user.name,
             student_email=current_user.email,
@@ -286,7 +505,6 @@ def book(slot_id):
             date=slot.date,
             time=slot.time
         )
-        slot.booked = True
         db.session.add(meeting)
         
         professor = User.query.filter_by(email=slot.professor_email).first()
@@ -298,11 +516,18 @@ def book(slot_id):
             )
             db.session.add(notification)
         
+        # The worker creates the calendar event later with the stored
+        # token, so booking never waits on Google.
+        calendar_queued = False
+        if google.authorized:
+            current_user.google_token = google.token
+            db.session.flush()
+            calendar_queued = queue_calendar_event(current_user, meeting) is not None
+        
         db.session.commit()
         
-        calendar_created = create_google_calendar_event(meeting)
-        if calendar_created:
-            flash('Meeting booked and added to your Google Calendar!', 'success')
+        if calendar_queued:
+            flash('Meeting booked! It will appear in your Google Calendar shortly.', 'success')
         else:
             flash('Meeting booked successfully!', 'success')
         
@@ -350,6 +575,7 @@ def delete_slot(slot_id):
         return redirect(url_for('routes.manage_sessions'))
     
     db.session.delete(slot)
+    invalidate_slots(slot.professor_email)
     db.session.commit()
     
     flash(f'Availability slot for {slot.date} at {slot.time} has been deleted.', 'success')
@@ -382,11 +608,9 @@ def cancel_meeting(meeting_id):
     
     if availability_slot:
         availability_slot.booked = False
+        invalidate_slots(availability_slot.professor_email)
     
-    Notification.query.filter_by(meeting_id=meeting_id).delete()
-    
-    db.session.delete(meeting)
-    db.session.commit()
+    delete_meeting(meeting)
     
     if student:
         cancellation_notification = Notification(
@@ -396,13 +620,14 @@ def cancel_meeting(meeting_id):
         )
         db.session.add(cancellation_notification)
         
-        send_email_notification(
+        queue_email(
             student.email,
             "Meeting Cancelled - Collegia",
-            f"Hi {student.name},\n\nYour meeting on {meeting_date} at {meeting_time} with {meeting.professor} has been cancelled.\n\nPlease book another slot if needed.\n\n- Collegia Team"
+            f"Hi {student.name},\n\nYour meeting on {meeting_date} at {meeting_time} with {meeting.professor} has been cancelled.\n\nPlease book another slot if needed.\n\n- Collegia Team",
+            idempotency_key=f"meeting_cancelled:{meeting.key}:{student.email}"
         )
-        
-        db.session.commit()
+    
+    db.session.commit()
     
     flash(f'Meeting with {student_name} on {meeting_date} at {meeting_time} has been cancelled. Student notified.', 'success')
     return redirect(url_for('routes.manage_sessions'))
@@ -435,9 +660,9 @@ def request_cancellation(meeting_id):
         
         if availability_slot:
             availability_slot.booked = False
+            invalidate_slots(availability_slot.professor_email)
         
-        db.session.delete(meeting)
-        db.session.commit()
+        delete_meeting(meeting)
         
         if professor:
             cancellation_notification = Notification(
@@ -447,13 +672,14 @@ def request_cancellation(meeting_id):
             )
             db.session.add(cancellation_notification)
             
-            send_email_notification(
+            queue_email(
                 professor.email,
                 "Student Meeting Cancellation - Collegia",
-                f"Hi {professor.name},\n\n{current_user.name} has cancelled their meeting on {meeting_date} at {meeting_time}.\n\nReason: {reason}\n\nThe time slot is now available for other students.\n\n- Collegia Team"
+                f"Hi {professor.name},\n\n{current_user.name} has cancelled their meeting on {meeting_date} at {meeting_time}.\n\nReason: {reason}\n\nThe time slot is now available for other students.\n\n- Collegia Team",
+                idempotency_key=f"meeting_cancelled:{meeting.key}:{professor.email}"
             )
-            
-            db.session.commit()
+        
+        db.session.commit()
         
         flash('Meeting cancelled successfully. Professor has been notified.', 'success')
         return redirect(url_for('routes.sessions'))
@@ -461,63 +687,143 @@ def request_cancellation(meeting_id):
     return render_template('request_cancellation.html', meeting=meeting)
 
 @routes.route("/notifications")
+@query_budget(8)
 @login_required
 def notifications():
-    user_notifications = Notification.query.filter(
-        (Notification.user_email == current_user.email) |
-        (Notification.user_email == f"all_{current_user.role}s")
-    ).order_by(Notification.created_at.desc()).all()
-    
-    for notif in user_notifications:
-        notif.is_read = True
-    db.session.commit()
+    query = Notification.query.filter(
+        Notification.user_email.in_([current_user.email, f"all_{current_user.role}s"])
+    )
+
+    cursor = decode_cursor(request.args.get("cursor", ""))
+    if cursor:
+        created_at, notification_id = cursor
+        query = query.filter(or_(
+            Notification.created_at < created_at,
+            and_(Notification.created_at == created_at, Notification.id < notification_id)
+        ))
+
+    user_notifications = query.order_by(
+        Notification.created_at.desc(),
+        Notification.id.desc()
+    ).limit(NOTIFICATIONS_PAGE_SIZE + 1).all()
+
+    next_cursor = None
+    if len(user_notifications) > NOTIFICATIONS_PAGE_SIZE:
+        user_notifications = user_notifications[:NOTIFICATIONS_PAGE_SIZE]
+        next_cursor = encode_cursor(user_notifications[-1].created_at, user_notifications[-1].id)
+
+    # Broadcast rows are shared by every user in the role, so only the
+    # user's own rows carry read state.
+    unread_ids = [
+        n.id for n in user_notifications
+        if not n.is_read and n.user_email == current_user.email
+    ]
+    if unread_ids:
+        # Another load of the same page may have marked some of these read
+        # since they were selected; count only the rows this one changed.
+        marked = db.session.execute(
+            update(Notification)
+            .where(Notification.id.in_(unread_ids), Notification.is_read.isnot(True))
+            .values(is_read=True)
+        ).rowcount
+        if marked:
+            adjust_unread_counts(db.session.connection(), {current_user.email: -marked})
+            forget_on_commit(db.session, emails=[current_user.email])
+            bump_versions(db.session.connection(), [user_scope(current_user.email)])
+        # Committing expires every loaded row, and rendering would then
+        # reload the page one notification at a time.
+        for notification in user_notifications:
+            db.session.expunge(notification)
+        db.session.commit()
     
-    return render_template("notifications.html", notifications=user_notifications)
+    return render_template(
+        "notifications.html",
+        notifications=user_notifications,
+        next_cursor=next_cursor,
+        is_first_page=cursor is None
+    )
+
+@routes.route("/notifications/unread-count")
+@query_budget(2)
+@login_required
+def unread_count():
+    return jsonify(unread=current_user.unread_count)
+
+@routes.route("/notifications/stream")
+@login_required
+def notification_stream():
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    # EventSource reconnects by itself after a stream ends, waiting for the
+    # last retry it was sent, so a refused client simply comes back later.
+    if not events.claim_stream():
+        NOTIFICATION_STREAMS_REFUSED.inc()
+        return Response(f"retry: {random.randint(*STREAM_BUSY_RETRY_MS)}\n\n",
+                        mimetype="text/event-stream", headers=headers)
+
+    email = current_user.email
+    try:
+        subscription = events.subscribe([email, f"all_{current_user.role}s"])
+    except Exception:
+        events.release_stream()
+        raise
+    # Hand the DB connection back before the response starts streaming;
+    # an open stream needs none.
+    db.session.remove()
+    ends_at = time.monotonic() + current_app.config["NOTIFICATION_STREAM_MAX_SECONDS"]
+
+    def generate():
+        yield "retry: 5000\n\n"
+        while True:
+            remaining = ends_at - time.monotonic()
+            if remaining <= 0:
+                return
+            item = subscription.get(timeout=min(STREAM_KEEPALIVE_SECONDS, remaining))
+            if item is None:
+                yield ": keepalive\n\n"
+                continue
+            channel, event = item
+            # Role-wide announcements carry no read state, so the badge only
+            # counts "notification" events.
+            name = "notification" if channel == email else "announcement"
+            yield f"event: {name}\ndata: {json.dumps(event)}\n\n"
+
+    response = Response(generate(), mimetype="text/event-stream", headers=headers)
+    # Runs even if the client goes away before the first chunk is sent.
+    response.call_on_close(subscription.close)
+    response.call_on_close(events.release_stream)
+    return response
 
 @routes.route("/settings", methods=["GET", "POST"])
+@query_budget(4)
 @login_required
 def settings():
-    from flask import current_app
-    
     form = SettingsForm()
     
     if form.validate_on_submit():
         if form.name.data:
             current_user.name = form.name.data
+            if current_user.role == "professor":
+                invalidate_on_commit(db.session, CATALOGUE)
         
         if form.new_password.data:
             current_user.password = generate_password_hash(form.new_password.data)
         
+        picture_pending = False
         if form.profile_picture.data:
             file = form.profile_picture.data
             if file and allowed_file(file.filename):
-                upload_folder = os.path.join(
-                    current_app.root_path,
-                    "static",
-                    "uploads",
-                    "profiles"
-                )
-                
-                if current_user.profile_picture:
-                    old_filepath = os.path.join(upload_folder, current_user.profile_picture)
-                    if os.path.exists(old_filepath):
-                        try:
-                            os.remove(old_filepath)
-                        except:
-                            pass
-                
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                file_extension = file.filename.rsplit('.', 1)[1].lower()
-                filename = f"{current_user.id}_{timestamp}.{file_extension}"
-                
-                os.makedirs(upload_folder, exist_ok=True)
-                filepath = os.path.join(upload_folder, filename)
-                
-                file.save(filepath)
-                current_user.profile_picture = filename
+                try:
+                    picture_pending = not update_profile_picture(current_app._get_current_object(), current_user, file)
+                except InvalidImage as e:
+                    db.session.rollback()
+                    flash(str(e), 'error')
+                    return redirect("/settings")
         
         db.session.commit()
-        flash('Settings updated successfully!', 'success')
+        if picture_pending:
+            flash('Settings updated! Your new picture will appear in a moment.', 'success')
+        else:
+            flash('Settings updated successfully!', 'success')
         return redirect("/settings")
     
     form.name.data = current_user.name
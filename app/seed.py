@@ -0,0 +1,149 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, insert, select, update
+from werkzeug.security import generate_password_hash
+
+from app.extensions import db
+from app.models import Availability, Meeting, Notification, User, LOCAL_TIMEZONE
+
+BATCH_SIZE = 10_000
+SEED_PASSWORD = "password123"
+
+# Office hours run 08:00-17:30 in 30 minute steps.
+SLOT_TIMES = [f"{hour:02d}:{minute:02d}:00" for hour in range(8, 18) for minute in (0, 30)]
+NOTIFICATION_TYPES = ["booking_confirmation", "meeting_reminder_24hr", "meeting_reminder_12hr", "meeting_cancelled"]
+
+
+def insert_batches(model, rows):
+    """Insert an iterable of row dicts BATCH_SIZE at a time."""
+    table = model.__table__
+    batch = []
+    count = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            db.session.execute(insert(table), batch)
+            db.session.commit()
+            count += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(table), batch)
+        db.session.commit()
+        count += len(batch)
+    return count
+
+
+def user_rows(role, count, password):
+    for i in range(count):
+        yield {
+            "role": role,
+            "name": f"{role.title()} {i}",
+            "email": f"{role}{i}@campus.test",
+            "password": password,
+            "profile_picture": "logo.png",
+            "unread_count": 0,
+        }
+
+
+def slot_rows(professors, count, days, booked_ratio, rng, now):
+    """Spread `count` slots over the professors, from a week ago to `days` ahead.
+
+    Each professor fills consecutive (day, time) positions, so slots
+    never collide.
+    """
+    today = now.astimezone(LOCAL_TIMEZONE).date()
+    first_day = today - timedelta(days=7)
+    per_day = len(SLOT_TIMES)
+    capacity = (days + 7) * per_day
+
+    for i in range(count):
+        name, email = professors[i % len(professors)]
+        position = (i // len(professors)) % capacity
+        day = first_day + timedelta(days=position // per_day)
+        time = SLOT_TIMES[position % per_day]
+        local = datetime.strptime(f"{day} {time}", "%Y-%m-%d %H:%M:%S").replace(tzinfo=LOCAL_TIMEZONE)
+        booked = rng.random() < booked_ratio
+        yield {
+            "professor_name": name,
+            "professor_email": email,
+            "date": day.isoformat(),
+            "time": time,
+            "starts_at": local.astimezone(timezone.utc),
+            "duration_minutes": 30,
+            "booked": booked,
+            "created_at": now,
+        }
+
+
+def seed_campus(students=50_000, professors=2_000, slots=500_000, notifications=1_000_000,
+                days=120, booked_ratio=0.2, read_ratio=0.7, seed=42, log=print):
+    """Fill the database with a synthetic campus.
+
+    Meant for an empty database: users get predictable emails such as
+    student17@campus.test and all share SEED_PASSWORD. A fixed `seed`
+    produces the same data on every run. Booked slots get a meeting
+    with a random student. Returns the number of rows written per table.
+    """
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    # Hashing is deliberately slow, so every seeded user shares one hash.
+    password = generate_password_hash(SEED_PASSWORD)
+    counts = {}
+
+    counts["students"] = insert_batches(User, user_rows("student", students, password))
+    counts["professors"] = insert_batches(User, user_rows("professor", professors, password))
+    log(f"[SEED] {counts['students']} students, {counts['professors']} professors")
+
+    professor_list = [(f"Professor {i}", f"professor{i}@campus.test") for i in range(professors)]
+    meetings = []
+
+    def slots_and_meetings():
+        for row in slot_rows(professor_list, slots, days, booked_ratio, rng, now):
+            if row["booked"]:
+                s = rng.randrange(students)
+                meetings.append({
+                    "student": f"Student {s}",
+                    "student_email": f"student{s}@campus.test",
+                    "professor": row["professor_name"],
+                    "professor_email": row["professor_email"],
+                    "notes": "Synthetic meeting",
+                    "date": row["date"],
+                    "time": row["time"],
+                    "starts_at": row["starts_at"],
+                    "created_at": now,
+                })
+            yield row
+
+    counts["slots"] = insert_batches(Availability, slots_and_meetings()) if professors and students else 0
+    counts["meetings"] = insert_batches(Meeting, meetings)
+    log(f"[SEED] {counts['slots']} slots, {counts['meetings']} meetings")
+
+    def notification_rows():
+        for _ in range(notifications):
+            if rng.random() < 0.8 and students:
+                email = f"student{rng.randrange(students)}@campus.test"
+            else:
+                email = f"professor{rng.randrange(max(professors, 1))}@campus.test"
+            yield {
+                "user_email": email,
+                "message": "Synthetic notification",
+                "type": rng.choice(NOTIFICATION_TYPES),
+                "is_read": rng.random() < read_ratio,
+                "created_at": now - timedelta(seconds=rng.randrange(180 * 24 * 3600)),
+            }
+
+    counts["notifications"] = insert_batches(Notification, notification_rows())
+
+    # Recount in one statement rather than tracking counts per batch.
+    unread = (
+        select(func.count())
+        .select_from(Notification)
+        .where(Notification.user_email == User.email, Notification.is_read.is_(False))
+        .scalar_subquery()
+    )
+    db.session.execute(update(User).values(unread_count=unread))
+    db.session.commit()
+    log(f"[SEED] {counts['notifications']} notifications")
+
+    return counts
@@ -177,4 +177,29 @@ document.addEventListener('DOMContentLoaded', function () {
 
         typeQuote();
     }
+
+    // Live unread badge
+    const notificationsLink = document.getElementById('notifications-link');
+
+    if (notificationsLink && notificationsLink.dataset.streamUrl && window.EventSource) {
+        const stream = new EventSource(notificationsLink.dataset.streamUrl);
+
+        // Free the server's stream slot as soon as the page goes away.
+        window.addEventListener('pagehide', function () {
+            stream.close();
+        });
+
+        // Only the user's own notifications are unread; role-wide ones
+        // arrive as "announcement" events and leave the badge alone.
+        stream.addEventListener('notification', function () {
+            let badge = notificationsLink.querySelector('.nav-badge');
+            if (!badge) {
+                badge = document.createElement('span');
+                badge.className = 'nav-badge';
+                badge.textContent = '0';
+                notificationsLink.appendChild(badge);
+            }
+            badge.textContent = parseInt(badge.textContent, 10) + 1;
+        });
+    }
 });
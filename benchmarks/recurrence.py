@@ -0,0 +1,94 @@
+"""Time creating a semester of recurring slots for a whole department.
+
+    python -m benchmarks.recurrence
+    python -m benchmarks.recurrence --professors 40 --runs 10 --budget-ms 1000
+    python -m benchmarks.recurrence --database-url postgresql://localhost/collegia_bench
+
+Each run gives --professors professors weekday office hours from 9:00 to
+17:00 in 30 minute slots over 15 weeks (48,000 slots for the default 40)
+and commits. The slots are deleted again, untimed, before the next run.
+The exit status is 1 when the median is over --budget-ms, so CI can hold
+the line. Without --database-url a throwaway SQLite file is used.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date, time as clock
+
+from benchmarks.run import percentile
+
+DEFAULT_BUDGET_MS = 1000
+WEEKDAYS = [0, 1, 2, 3, 4]
+# Mon 2099-01-05 to Fri 2099-04-17: 15 weeks.
+SEMESTER = (date(2099, 1, 5), date(2099, 4, 17))
+
+
+def professors(count):
+    return [(f"Bench Prof {i}", f"recurrence-bench-{i}@example.com") for i in range(count)]
+
+
+def run_once(app, department):
+    from app.extensions import db
+    from app.models import Availability
+    from app.recurrence import create_recurring_slots
+
+    with app.app_context():
+        started = time.perf_counter()
+        result = create_recurring_slots(department, WEEKDAYS, clock(9, 0), clock(17, 0), 30, *SEMESTER)
+        db.session.commit()
+        elapsed = time.perf_counter() - started
+
+        Availability.query.filter(
+            Availability.professor_email.in_([email for _, email in department])
+        ).delete(synchronize_session=False)
+        db.session.commit()
+    return elapsed * 1000, result["created"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="defaults to a throwaway SQLite file")
+    parser.add_argument("--professors", type=int, default=40)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="fail when the median is over this")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as folder:
+        os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(folder, 'recurrence.db')}"
+        from app import create_app
+        from app.extensions import db
+        from app.migrations import init_schema
+
+        app = create_app()
+        with app.app_context():
+            init_schema(db)
+
+        department = professors(args.professors)
+        # The first run warms up the connection and is not counted.
+        run_once(app, department)
+        runs = [run_once(app, department) for _ in range(args.runs)]
+        with app.app_context():
+            db.engine.dispose()
+
+    timings = [ms for ms, _ in runs]
+    median = percentile(timings, 50)
+    within = median <= args.budget_ms
+    print(f"[BENCH] {runs[0][1]} slots for {args.professors} professors: "
+          f"p50 {median:.0f} ms, max {max(timings):.0f} ms, budget {args.budget_ms:.0f} ms: "
+          f"{'ok' if within else 'OVER BUDGET'}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"budget_ms": args.budget_ms, "slots": runs[0][1], "p50_ms": median,
+                       "max_ms": max(timings)}, f, indent=2)
+
+    return 0 if within else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+"""Time the main pages and the reminder sweep against a large campus.
+
+    python -m benchmarks.run --database-url sqlite:///bench.db --scale 0.05
+    python -m benchmarks.run --database-url postgresql://localhost/collegia_bench
+
+An empty database is seeded first (see `flask seed-campus`); a seeded
+one is reused, so runs against the same database are comparable. Each
+scenario reports latency percentiles and SQL statements per call. Save
+a run with --json and pass it to a later run as --baseline to see what
+moved.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+
+from sqlalchemy import event, func, select
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+FULL_CAMPUS = {
+    "students": 50_000,
+    "professors": 2_000,
+    "slots": 500_000,
+    "notifications": 1_000_000,
+}
+SAMPLE_USERS = 500
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = math.ceil(pct / 100 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+def login(client, user_id):
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(user_id)
+        sess["_fresh"] = True
+
+
+def page(path):
+    def run(app, client, users, rng):
+        response = client.get(path(users, rng) if callable(path) else path)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET returned {response.status_code}")
+    return run
+
+
+def sweep(app, client, users, rng):
+    from notifications_scheduler import check_upcoming_meetings
+
+    check_upcoming_meetings(app)
+
+
+def forget_reminders(app):
+    """Undo the previous sweep so the next one has the same work to do."""
+    from app.extensions import db
+    from app.models import EmailOutbox, Notification, ReminderClaim
+
+    with app.app_context():
+        db.session.execute(ReminderClaim.__table__.delete())
+        db.session.execute(Notification.__table__.delete().where(
+            Notification.type.like("meeting_reminder_%"),
+            Notification.meeting_id.isnot(None)
+        ))
+        db.session.execute(EmailOutbox.__table__.delete().where(
+            EmailOutbox.idempotency_key.like("meeting_reminder_%")
+        ))
+        db.session.commit()
+
+
+# (name, role to sign in as, call, untimed reset before each call)
+SCENARIOS = [
+    ("home (student)", "student", page("/home"), None),
+    ("home (professor)", "professor", page("/home"), None),
+    ("sessions", "student", page("/sessions"), None),
+    ("sessions?professor=", "student", page(
+        lambda users, rng: f"/sessions?professor={rng.choice(users['professor_emails'])}"
+    ), None),
+    ("manage_sessions", "professor", page("/manage-sessions"), None),
+    ("notifications", "student", page("/notifications"), None),
+    ("check_upcoming_meetings", None, sweep, forget_reminders),
+    ("check_upcoming_meetings (idle)", None, sweep, None),
+]
+
+
+def sample_users(db, User):
+    users = {}
+    for role in ("student", "professor"):
+        rows = db.session.execute(
+            select(User.id, User.email).where(User.role == role).order_by(User.id).limit(SAMPLE_USERS)
+        ).all()
+        if not rows:
+            raise SystemExit(f"No {role}s in the database; seed it first.")
+        users[role] = [row.id for row in rows]
+        users[f"{role}_emails"] = [row.email for row in rows]
+    return users
+
+
+def run_scenario(app, counter, users, name, role, call, reset, iterations, warmup, rng):
+    client = app.test_client()
+    timings, queries = [], []
+
+    for i in range(warmup + iterations):
+        if reset:
+            reset(app)
+        if role:
+            login(client, rng.choice(users[role]))
+        with app.app_context():
+            before = counter.count
+            started = time.perf_counter()
+            call(app, client, users, rng)
+            elapsed = time.perf_counter() - started
+            if i >= warmup:
+                timings.append(elapsed * 1000)
+                queries.append(counter.count - before)
+
+    return {
+        "name": name,
+        "iterations": iterations,
+        "p50_ms": percentile(timings, 50),
+        "p95_ms": percentile(timings, 95),
+        "p99_ms": percentile(timings, 99),
+        "max_ms": max(timings),
+        "queries_mean": sum(queries) / len(queries),
+        "queries_max": max(queries),
+    }
+
+
+def change(current, previous):
+    if not previous:
+        return ""
+    return f" ({(current - previous) / previous * 100:+.0f}%)"
+
+
+def report(results, baseline, out):
+    previous = {r["name"]: r for r in baseline.get("results", [])} if baseline else {}
+    out.write(f"{'scenario':<32}{'p50 ms':>8}{'':8}{'p95 ms':>8}{'':8}{'p99 ms':>10}{'max ms':>10}{'queries':>8}\n")
+    for r in results:
+        old = previous.get(r["name"], {})
+        out.write(
+            f"{r['name']:<32}"
+            f"{r['p50_ms']:>8.1f}{change(r['p50_ms'], old.get('p50_ms')):>8}"
+            f"{r['p95_ms']:>8.1f}{change(r['p95_ms'], old.get('p95_ms')):>8}"
+            f"{r['p99_ms']:>10.1f}{r['max_ms']:>10.1f}"
+            f"{r['queries_mean']:>8.1f}{change(r['queries_mean'], old.get('queries_mean')):>8}\n"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", "sqlite:///bench.db"))
+    parser.add_argument("--scale", type=float, default=1.0, help="fraction of the full campus to seed")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--only", action="append", help="run only scenarios whose name starts with this")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="compare against results saved with --json")
+    args = parser.parse_args(argv)
+
+    os.environ["DATABASE_URL"] = args.database_url
+    from app import create_app
+    from app.extensions import db
+    from app.migrations import init_schema
+    from app.models import User
+    from app.seed import seed_campus
+
+    app = create_app()
+    # The sweep queues and sends reminder emails; keep them local.
+    app.extensions["mail"].suppress = True
+
+    with app.app_context():
+        init_schema(db)
+        if not db.session.scalar(select(func.count()).select_from(User)):
+            volumes = {key: max(1, int(value * args.scale)) for key, value in FULL_CAMPUS.items()}
+            started = time.perf_counter()
+            seed_campus(**volumes, seed=args.seed)
+            print(f"[BENCH] Seeded in {time.perf_counter() - started:.1f}s")
+        users = sample_users(db, User)
+        counter = QueryCounter(db.engine)
+        database = db.engine.url.render_as_string(hide_password=True)
+        dialect = db.engine.dialect.name
+
+    rng = random.Random(args.seed)
+    results = []
+    for name, role, call, reset in SCENARIOS:
+        if args.only and not any(name.startswith(prefix) for prefix in args.only):
+            continue
+        results.append(run_scenario(
+            app, counter, users, name, role, call, reset, args.iterations, args.warmup, rng
+        ))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    print(f"[BENCH] {database}, cache={app.config['CACHE_BACKEND']}")
+    report(results, baseline, sys.stdout)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"database": dialect, "results": results}, f, indent=2)
+
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Time how long a fresh process takes to serve its first request.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 20 --budget-ms 800 --top-imports 15
+
+Each run is a new interpreter. Three phases are timed:
+- importing the app package;
+- create_app();
+- the first request, a GET of the login page.
+Web workers, the email worker and scheduler dynos all pay this cost
+every time they start. The exit status is 1 when the median total is
+over --budget-ms, so CI can hold the line.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.run import PROJECT_ROOT, percentile
+
+DEFAULT_BUDGET_MS = 1000
+
+# Runs in the child interpreter; prints one JSON line of timings.
+PROBE = """
+import json, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+response = app.test_client().get("/")
+served = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "create_app_ms": (created - imported) * 1000,
+    "first_request_ms": (served - created) * 1000,
+    "total_ms": (served - started) * 1000,
+}))
+"""
+
+PHASES = ["import_ms", "create_app_ms", "first_request_ms", "total_ms"]
+
+
+def probe_env(database_url):
+    env = dict(os.environ, DATABASE_URL=database_url, PYTHONDONTWRITEBYTECODE="")
+    env.pop("PYTHONPROFILEIMPORTTIME", None)
+    return env
+
+
+def run_probe(env, importtime=False):
+    args = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", PROBE]
+    result = subprocess.run(args, cwd=PROJECT_ROOT, env=env, capture_output=True, text=True, check=True)
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    return timings, result.stderr
+
+
+def top_imports(importtime_output, count):
+    """The `count` slowest top-level imports as (cumulative ms, module)."""
+    found = []
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue
+        # Nested imports are indented two spaces per level.
+        if len(name) - len(name.lstrip()) == 1:
+            found.append((int(cumulative) / 1000, name.strip()))
+    return sorted(found, reverse=True)[:count]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="fail when the median total is over this")
+    parser.add_argument("--top-imports", type=int, default=0, help="list the slowest top-level imports")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as folder:
+        env = probe_env(f"sqlite:///{os.path.join(folder, 'startup.db')}")
+        # The first run warms the bytecode cache and is not counted.
+        run_probe(env)
+        runs = [run_probe(env)[0] for _ in range(args.runs)]
+        imports = top_imports(run_probe(env, importtime=True)[1], args.top_imports) if args.top_imports else []
+
+    results = {
+        phase: {"p50": percentile([r[phase] for r in runs], 50), "max": max(r[phase] for r in runs)}
+        for phase in PHASES
+    }
+
+    print(f"{'phase':<20}{'p50 ms':>10}{'max ms':>10}")
+    for phase in PHASES:
+        print(f"{phase[:-3]:<20}{results[phase]['p50']:>10.1f}{results[phase]['max']:>10.1f}")
+    for ms, module in imports:
+        print(f"  import {module:<40}{ms:>8.1f} ms")
+
+    total = results["total_ms"]["p50"]
+    within = total <= args.budget_ms
+    print(f"[BENCH] Startup {total:.0f} ms, budget {args.budget_ms:.0f} ms: {'ok' if within else 'OVER BUDGET'}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"budget_ms": args.budget_ms, "runs": args.runs, "results": results}, f, indent=2)
+
+    return 0 if within else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
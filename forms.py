@@ -1,7 +1,10 @@
 from flask_wtf import FlaskForm
 from flask_wtf.file import FileField, FileAllowed
-from wtforms import StringField, PasswordField, SelectField, SubmitField, TextAreaField, DateField, TimeField
-from wtforms.validators import DataRequired, Email, Optional, EqualTo
+from wtforms import (
+    StringField, PasswordField, SelectField, SelectMultipleField, SubmitField, TextAreaField, DateField, TimeField
+)
+from wtforms.validators import DataRequired, Email, Optional, EqualTo, ValidationError
+from wtforms.widgets import ListWidget, CheckboxInput
 
 class LoginForm(FlaskForm):
     email = StringField(validators=[DataRequired(), Email()])
@@ -20,6 +23,36 @@ class AvailabilityForm(FlaskForm):
     time = TimeField(validators=[DataRequired()])
     submit = SubmitField("Add Availability")
 
+class RecurringAvailabilityForm(FlaskForm):
+    weekdays = SelectMultipleField(
+        'Days',
+        choices=[(0, "Mon"), (1, "Tue"), (2, "Wed"), (3, "Thu"), (4, "Fri"), (5, "Sat"), (6, "Sun")],
+        coerce=int,
+        option_widget=CheckboxInput(),
+        widget=ListWidget(prefix_label=False),
+        validators=[DataRequired(message='Pick at least one day')]
+    )
+    start_time = TimeField('From', validators=[DataRequired()])
+    end_time = TimeField('Until', validators=[DataRequired()])
+    slot_minutes = SelectField(
+        'Slot length',
+        choices=[(15, "15 minutes"), (20, "20 minutes"), (30, "30 minutes"), (45, "45 minutes"), (60, "1 hour")],
+        coerce=int,
+        default=60
+    )
+    start_date = DateField('First day', validators=[DataRequired()])
+    end_date = DateField('Last day', validators=[DataRequired()])
+    exclusions = TextAreaField('Skip dates', validators=[Optional()])
+    submit = SubmitField("Add Recurring Availability")
+
+    def validate_end_time(self, field):
+        if self.start_time.data and field.data and field.data <= self.start_time.data:
+            raise ValidationError('End time must be after the start time')
+
+    def validate_end_date(self, field):
+        if self.start_date.data and field.data and field.data < self.start_date.data:
+            raise ValidationError('Last day must not be before the first day')
+
 class BookingForm(FlaskForm):
     notes = TextAreaField(validators=[DataRequired()])
     submit = SubmitField("Book Meeting")
@@ -0,0 +1,25 @@
+"""gunicorn settings for the web dyno (see Procfile)."""
+import os
+import shutil
+import tempfile
+
+worker_class = "gthread"
+threads = 8
+
+# Each worker writes its metrics to files here, and /metrics sums them
+# (see app.metrics.exposition). Set in the master, so every worker
+# imports prometheus_client with it already in place.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "collegia-metrics"))
+
+
+def on_starting(server):
+    # Files left by an earlier run would be added to this one's counts.
+    folder = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(folder, ignore_errors=True)
+    os.makedirs(folder)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
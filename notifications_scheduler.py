@@ -1,112 +1,233 @@
 from apscheduler.schedulers.background import BackgroundScheduler
-from flask_mail import Message
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import os
+import socket
+from collections import Counter
+
+from sqlalchemy import exists, insert, select, update, or_
+
+from app.extensions import db
+from app.events import queue_notification_events
+from app.identity import forget_on_commit
+from app.metrics import REMINDERS_SENT, SWEEP_SECONDS
+from app.querycount import watch_queries
+from app.outbox import deliver_committed, queue_emails
+from app.models import (
+    Meeting, Notification, ReminderClaim, User, LOCAL_TIMEZONE, local_midnight_utc, adjust_unread_counts,
+    bump_versions, user_scope
+)
+
+CLAIM_TTL = timedelta(minutes=5)
+# How long the email worker leaves a sweep's freshly queued reminders to
+# the sweep itself; after that it sends whatever the sweep did not.
+DELIVERY_HOLD = timedelta(minutes=5)
+# Statements per sweep, however many meetings are due.
+SWEEP_QUERY_BUDGET = 20
+
+
+def node_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def check_upcoming_meetings(app, holder=None):
+    holder = holder or node_id()
+
+    with (
+        app.app_context(),
+        SWEEP_SECONDS.time(),
+        watch_queries(app, "check_upcoming_meetings", SWEEP_QUERY_BUDGET)
+    ):
+        now = datetime.now(timezone.utc)
+
+        today = now.astimezone(LOCAL_TIMEZONE).date()
+        tomorrow_start = local_midnight_utc(today + timedelta(days=1))
+        tomorrow_end = local_midnight_utc(today + timedelta(days=2))
+
+        send_window_reminders(
+            "24hr", holder, now,
+            Meeting.starts_at >= tomorrow_start,
+            Meeting.starts_at < tomorrow_end
+        )
+
+        # Meetings later today that are 10-14 hours away.
+        send_window_reminders(
+            "12hr", holder, now,
+            Meeting.starts_at >= now + timedelta(hours=10),
+            Meeting.starts_at <= now + timedelta(hours=14),
+            Meeting.starts_at < tomorrow_start
+        )
+
+
+def send_window_reminders(window, holder, now, *conditions):
+    meetings = meetings_needing_reminder(window, now, *conditions)
+    meetings = claim_reminders(meetings, window, holder, now)
+
+    outbox_ids = [entry.id for entry in notify_users(meetings, window)]
+    complete_claims(meetings, window, holder)
+    db.session.commit()
+
+    # SMTP only starts once the notifications, outbox rows and finished
+    # claims are committed: no write locks are held while sending, and a
+    # slow send cannot outlive the claims and be repeated by another node.
+    deliver_committed(outbox_ids)
+
+
+def meetings_needing_reminder(window, now, *conditions):
+    already_sent = exists().where(
+        Notification.meeting_id == Meeting.id,
+        Notification.type == f"meeting_reminder_{window}"
+    )
+    # Finished claims, and live claims held by another node, are skipped
+    # up front; expired ones fall through and can be taken over.
+    claimed = exists().where(
+        ReminderClaim.meeting_id == Meeting.id,
+        ReminderClaim.window == window,
+        or_(ReminderClaim.completed_at.is_not(None), ReminderClaim.expires_at > now)
+    )
+    return Meeting.query.filter(*conditions, ~already_sent, ~claimed).all()
+
 
-from app.extensions import mail, db
-from app.models import Meeting, Notification, User
+def insert_ignoring_conflicts(model):
+    if db.engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert(model).on_conflict_do_nothing()
 
 
-def check_upcoming_meetings(app):
-    with app.app_context():
-        now = datetime.now()
+def claim_reminders(meetings, window, holder, now):
+    """Claim the reminder for each meeting and return the ones this node won.
 
-        tomorrow = (now + timedelta(days=1)).strftime("%Y-%m-%d")
-        meetings_24hr = Meeting.query.filter_by(date=tomorrow).all()
+    Claims are committed straight away so other nodes see them. A claim
+    whose holder died before finishing expires after CLAIM_TTL and is
+    taken over by the next sweep.
+    """
+    if not meetings:
+        return []
 
-        for meeting in meetings_24hr:
-            already_sent = Notification.query.filter_by(
-                meeting_id=meeting.id,
-                type="meeting_reminder_24hr"
-            ).first()
-            if already_sent:
-                continue
+    ids = [m.id for m in meetings]
+    expires_at = now + CLAIM_TTL
 
-            notify_users(meeting, "24hr")
+    db.session.execute(
+        insert_ignoring_conflicts(ReminderClaim),
+        [{"meeting_id": i, "window": window, "holder": holder, "expires_at": expires_at} for i in ids]
+    )
+    db.session.execute(
+        update(ReminderClaim)
+        .where(
+            ReminderClaim.meeting_id.in_(ids),
+            ReminderClaim.window == window,
+            ReminderClaim.completed_at.is_(None),
+            ReminderClaim.expires_at <= now
+        )
+        .values(holder=holder, expires_at=expires_at)
+    )
+    won = set(db.session.scalars(
+        select(ReminderClaim.meeting_id).where(
+            ReminderClaim.meeting_id.in_(ids),
+            ReminderClaim.window == window,
+            ReminderClaim.holder == holder,
+            ReminderClaim.completed_at.is_(None)
+        )
+    ))
+    db.session.commit()
 
-        today = now.strftime("%Y-%m-%d")
-        meetings_today = Meeting.query.filter_by(date=today).all()
+    # The commit expired the meetings; reload the winners together rather
+    # than letting each one reload itself when it is next read.
+    if won:
+        Meeting.query.filter(Meeting.id.in_(won)).all()
+    return [m for m, i in zip(meetings, ids) if i in won]
 
-        for meeting in meetings_today:
-            try:
-                meeting_time = datetime.strptime(
-                    f"{meeting.date} {meeting.time}",
-                    "%Y-%m-%d %H:%M:%S"
-                )
-                hours_until = (meeting_time - now).total_seconds() / 3600
 
-                if 10 <= hours_until <= 14:
-                    already_sent = Notification.query.filter_by(
-                        meeting_id=meeting.id,
-                        type="meeting_reminder_12hr"
-                    ).first()
-                    if already_sent:
-                        continue
+def complete_claims(meetings, window, holder):
+    if not meetings:
+        return
 
-                    notify_users(meeting, "12hr")
+    db.session.execute(
+        update(ReminderClaim)
+        .where(
+            ReminderClaim.meeting_id.in_([m.id for m in meetings]),
+            ReminderClaim.window == window,
+            ReminderClaim.holder == holder
+        )
+        .values(completed_at=datetime.now(timezone.utc))
+    )
 
-            except Exception as e:
-                pass
 
-        db.session.commit()
+def notify_users(meetings, window):
+    """Save reminder notifications and queue their emails for `meetings`.
 
+    Returns the queued outbox entries; the caller commits, then sends them.
+    """
+    if not meetings:
+        return []
 
-def notify_users(meeting, window):
-    student = User.query.filter_by(email=meeting.student_email).first()
-    professor = User.query.filter_by(email=meeting.professor_email).first()
+    participants = {m.student_email for m in meetings} | {m.professor_email for m in meetings}
+    known = set(db.session.scalars(select(User.email).where(User.email.in_(participants))))
 
     if window == "24hr":
         subject = "Meeting Tomorrow Reminder"
     else:
         subject = "Meeting in 12 Hours"
 
-    body = (
-        f"Meeting Details:\n\n"
-        f"Date: {meeting.date}\n"
-        f"Time: {meeting.time}\n"
-        f"Professor: {meeting.professor}\n"
-        f"Student: {meeting.student}\n\n"
-        f"- Collegia Team"
-    )
+    rows = []
+    emails = []
+    for meeting in meetings:
+        body = (
+            f"Meeting Details:\n\n"
+            f"Date: {meeting.date}\n"
+            f"Time: {meeting.time}\n"
+            f"Professor: {meeting.professor}\n"
+            f"Student: {meeting.student}\n\n"
+            f"- Collegia Team"
+        )
 
-    if student:
-        send_email(student.email, subject, body)
-        save_notification(student.email, meeting, window)
+        for email in (meeting.student_email, meeting.professor_email):
+            if email in known:
+                emails.append((email, subject, body, f"meeting_reminder_{window}:{meeting.key}:{email}"))
+                rows.append(reminder_notification(email, meeting, window))
 
-    if professor:
-        send_email(professor.email, subject, body)
-        save_notification(professor.email, meeting, window)
+    save_notifications(rows)
+    # Rows that fail to send stay in the outbox for the email worker to retry.
+    entries = queue_emails(emails, hold=DELIVERY_HOLD)
+    REMINDERS_SENT.labels(window=window).inc(len(rows))
+    return entries
 
 
-def send_email(to_email, subject, body):
-    try:
-        msg = Message(subject=subject, recipients=[to_email], body=body)
-        mail.send(msg)
-    except Exception as e:
-        pass
+def reminder_notification(email, meeting, window):
+    return {
+        "user_email": email,
+        "message": f"Reminder: meeting at {meeting.time}",
+        "type": f"meeting_reminder_{window}",
+        "meeting_id": meeting.id,
+    }
 
 
-def save_notification(email, meeting, window):
-    n = Notification(
-        user_email=email,
-        message=f"Reminder: meeting at {meeting.time}",
-        type=f"meeting_reminder_{window}",
-        meeting_id=meeting.id
-    )
-    db.session.add(n)
+def save_notifications(rows):
+    if rows:
+        db.session.execute(insert(Notification), rows)
+        adjust_unread_counts(db.session.connection(), Counter(r["user_email"] for r in rows))
+        forget_on_commit(db.session, emails=[r["user_email"] for r in rows])
+        bump_versions(db.session.connection(), [user_scope(r["user_email"]) for r in rows])
+        queue_notification_events(db.session, rows)
 
 
 def start_scheduler(app):
-    if os.getenv("DYNO"):
+    # "cluster" runs the sweep in every process, web dynos included;
+    # reminder claims make sure each reminder still goes out once.
+    cluster = os.getenv("SCHEDULER_MODE") == "cluster"
+
+    if os.getenv("DYNO") and not cluster:
         return
     
-    if os.getenv("WERKZEUG_RUN_MAIN") == "true":
+    if cluster or os.getenv("WERKZEUG_RUN_MAIN") == "true":
         scheduler = BackgroundScheduler()
         
         scheduler.add_job(
             func=lambda: check_upcoming_meetings(app),
             trigger="interval",
             minutes=2,
+            jitter=30 if cluster else None,
             id="meeting_notifications"
         )
         
@@ -117,4 +238,7 @@ def start_scheduler(app):
         )
         
         scheduler.start()
-        print("[SCHEDULER] Running locally (every 2 minutes)")
\ No newline at end of file
+        if cluster:
+            print(f"[SCHEDULER] Running in cluster mode as {node_id()} (every 2 minutes)")
+        else:
+            print("[SCHEDULER] Running locally (every 2 minutes)")
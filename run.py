@@ -9,8 +9,8 @@ from notifications_scheduler import start_scheduler
 
 app = create_app()
 
-# Scheduler runs ONLY locally
-if not os.getenv("DYNO"):
+# Scheduler runs locally, or in every process with SCHEDULER_MODE=cluster
+if not os.getenv("DYNO") or os.getenv("SCHEDULER_MODE") == "cluster":
     start_scheduler(app)
 
 if __name__ == "__main__":
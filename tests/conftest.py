@@ -3,6 +3,7 @@
 import os
 import sys
 import pytest
+from flask import g
 from werkzeug.security import generate_password_hash
 
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -10,7 +11,9 @@ if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
 from app.extensions import db
+from app.migrations import init_schema
 from app.models import User, Meeting
+from app.querycount import record_queries
 
 
 @pytest.fixture(autouse=True)
@@ -22,20 +25,31 @@ def reset_env():
 
 
 @pytest.fixture
-def app():
+def app(tmp_path, monkeypatch):
+    # The engine is bound inside create_app(), so the database has to be
+    # chosen before it runs; the tracked instance database is never used.
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'test.db'}")
     from app import create_app
     app = create_app()
     app.config.update(
         TESTING=True,
-        SQLALCHEMY_DATABASE_URI="sqlite:///:memory:",
         WTF_CSRF_ENABLED=False,
         SECRET_KEY="test-secret-key",
+        QUERY_COUNT=True,
+        QUERY_BUDGET_STRICT=True,
     )
+
+    # One app context, and so one g, stays open for the whole test; give
+    # each request its own current_user as in production.
+    @app.before_request
+    def forget_current_user():
+        g.pop("_login_user", None)
+
     with app.app_context():
-        db.create_all()
+        init_schema(db)
         yield app
         db.session.remove()
-        db.drop_all()
+        db.engine.dispose()
 
 
 @pytest.fixture
@@ -43,6 +57,68 @@ def client(app):
     return app.test_client()
 
 
+def log_in(client, user_id):
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(user_id)
+        sess["_fresh"] = True
+
+
+@pytest.fixture
+def force_login():
+    """Sign a test client in as a user, skipping the login form.
+
+    force_login(client, user_id)
+    """
+    return log_in
+
+
+@pytest.fixture
+def postgres_engine():
+    """An engine on a local Postgres, for the shared backends' tests.
+
+    Uses TEST_POSTGRES_URL (default postgresql://localhost/collegia_test)
+    and skips the test when no server answers there.
+    """
+    from sqlalchemy import create_engine
+
+    engine = create_engine(os.getenv("TEST_POSTGRES_URL", "postgresql://localhost/collegia_test"))
+    try:
+        engine.connect().close()
+    except Exception as e:
+        pytest.skip(f"no local Postgres: {e}")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def redis_url():
+    """A local Redis-compatible server's URL; skips when none is running.
+
+    Uses TEST_REDIS_URL (default redis://localhost:6379/15). The database
+    is flushed before and after the test.
+    """
+    redis = pytest.importorskip("redis")
+    url = os.getenv("TEST_REDIS_URL", "redis://localhost:6379/15")
+    client = redis.Redis.from_url(url, socket_connect_timeout=0.5)
+    try:
+        client.flushdb()
+    except redis.exceptions.ConnectionError as e:
+        pytest.skip(f"no local Redis: {e}")
+    yield url
+    client.flushdb()
+
+
+@pytest.fixture
+def query_log():
+    """Every SQL statement the test issues; see app.querycount.QueryLog.
+
+    Requests made with `client` are checked against their view's
+    @query_budget as well, and fail the test when they go over.
+    """
+    with record_queries() as log:
+        yield log
+
+
 @pytest.fixture
 def student_user_id(app):
     with app.app_context():
@@ -0,0 +1,143 @@
+from app.extensions import db
+from app.models import Availability, Notification
+
+
+def add_slot(day="2099-01-01", time="09:00:00"):
+    slot = Availability(professor_name="Professor Smith", professor_email="prof@example.com", date=day, time=time)
+    db.session.add(slot)
+    db.session.commit()
+    return slot.id
+
+
+def test_requires_login(client):
+    # when
+    r = client.get("/api/v1/meetings")
+
+    # then
+    assert r.status_code == 401
+    assert r.json == {"error": "authentication required"}
+
+
+def test_slots_revalidate_until_catalogue_changes(client, student_user_id, professor_user_id, force_login):
+    # given
+    force_login(client, student_user_id)
+    with client.application.app_context():
+        add_slot()
+    first = client.get("/api/v1/slots")
+
+    # when
+    unchanged = client.get("/api/v1/slots", headers={"If-None-Match": first.headers["ETag"]})
+    with client.application.app_context():
+        add_slot(time="10:00:00")
+    changed = client.get("/api/v1/slots", headers={"If-None-Match": first.headers["ETag"]})
+
+    # then
+    assert first.status_code == 200
+    assert [s["time"] for s in first.json["slots"]] == ["09:00:00"]
+    assert unchanged.status_code == 304
+    assert unchanged.data == b""
+    assert changed.status_code == 200
+    assert [s["time"] for s in changed.json["slots"]] == ["09:00:00", "10:00:00"]
+
+
+def test_booking_changes_catalogue_etag(client, student_user_id, professor_user_id, force_login):
+    # given
+    force_login(client, student_user_id)
+    with client.application.app_context():
+        slot_id = add_slot()
+    etag = client.get("/api/v1/slots").headers["ETag"]
+
+    # when
+    client.post(f"/book/{slot_id}", data={"notes": "x"})
+    r = client.get("/api/v1/slots", headers={"If-None-Match": etag})
+    meetings = client.get("/api/v1/meetings")
+
+    # then
+    assert r.status_code == 200
+    assert r.json["slots"] == []
+    assert [m["date"] for m in meetings.json["meetings"]] == ["2099-01-01"]
+    assert "meeting_notes" not in meetings.json["meetings"][0]
+
+
+def test_meetings_last_modified(client, meeting_id, student_user_id, force_login):
+    # given
+    force_login(client, student_user_id)
+    first = client.get("/api/v1/meetings")
+    last_modified = first.headers["Last-Modified"]
+
+    # when
+    unchanged = client.get("/api/v1/meetings", headers={"If-Modified-Since": last_modified})
+
+    # then
+    assert first.json["meetings"][0]["id"] == meeting_id
+    assert unchanged.status_code == 304
+
+
+def test_etag_from_another_user_is_not_matched(client, meeting_id, student_user_id, professor_user_id,
+                                               force_login):
+    # given: both users see version 1 of their own scope
+    force_login(client, student_user_id)
+    student_etag = client.get("/api/v1/meetings").headers["ETag"]
+
+    # when
+    force_login(client, professor_user_id)
+    r = client.get("/api/v1/meetings", headers={"If-None-Match": student_etag})
+
+    # then
+    assert r.status_code == 200
+    assert r.headers["ETag"] != student_etag
+    assert "meeting_notes" in r.json["meetings"][0]
+
+
+def test_slots_ignore_if_modified_since(client, student_user_id, professor_user_id, force_login):
+    # given
+    force_login(client, professor_user_id)
+    with client.application.app_context():
+        add_slot()
+    last_modified = client.get("/api/v1/slots").headers["Last-Modified"]
+
+    # when
+    force_login(client, student_user_id)
+    r = client.get("/api/v1/slots", headers={"If-Modified-Since": last_modified})
+
+    # then
+    assert r.status_code == 200
+
+
+def test_notifications_version_follows_reads_and_broadcasts(client, student_user_id, force_login):
+    # given
+    force_login(client, student_user_id)
+    with client.application.app_context():
+        db.session.add(Notification(user_email="student@example.com", message="hi", type="booking_confirmation"))
+        db.session.commit()
+    first = client.get("/api/v1/notifications")
+    etag = first.headers["ETag"]
+
+    # when
+    client.get("/notifications")
+    after_read = client.get("/api/v1/notifications", headers={"If-None-Match": etag})
+    with client.application.app_context():
+        db.session.add(Notification(user_email="all_students", message="news", type="announcement"))
+        db.session.commit()
+    after_broadcast = client.get("/api/v1/notifications", headers={"If-None-Match": after_read.headers["ETag"]})
+
+    # then
+    assert first.json["unread"] == 1
+    assert first.json["notifications"][0]["is_read"] is False
+    assert after_read.status_code == 200
+    assert after_read.json["unread"] == 0
+    assert after_broadcast.status_code == 200
+    assert [n["message"] for n in after_broadcast.json["notifications"]] == ["news", "hi"]
+
+
+def test_responses_are_private(client, student_user_id, force_login):
+    # given
+    force_login(client, student_user_id)
+
+    # when
+    r = client.get("/api/v1/meetings")
+
+    # then
+    assert "private" in r.headers["Cache-Control"]
+    assert "no-cache" in r.headers["Cache-Control"]
+    assert "Cookie" in r.headers["Vary"]
@@ -0,0 +1,137 @@
+import io
+import os
+from concurrent.futures import Future
+
+import pytest
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+from app import avatars
+from app.avatars import (
+    InvalidImage,
+    THUMBNAIL_SIZES,
+    has_thumbnails,
+    original_path,
+    store_upload,
+    thumbnail_name,
+    thumbnails_dir,
+    update_profile_picture,
+)
+from app.extensions import db
+from app.models import User
+
+
+class InlineExecutor:
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+@pytest.fixture
+def upload_folder(app, tmp_path, monkeypatch):
+    app.config["UPLOAD_FOLDER"] = str(tmp_path)
+    monkeypatch.setattr(avatars, "executor", InlineExecutor())
+    return str(tmp_path)
+
+
+def image_upload(color="red", size=(1200, 800), image_format="PNG", filename="me.png"):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, image_format)
+    buffer.seek(0)
+    return FileStorage(stream=buffer, filename=filename)
+
+
+def test_store_upload_names_file_by_content(upload_folder):
+    # when
+    first = store_upload(image_upload(), upload_folder)
+    second = store_upload(image_upload(), upload_folder)
+    other = store_upload(image_upload(color="blue"), upload_folder)
+
+    # then
+    assert first == second
+    assert first != other
+    assert sorted(os.listdir(os.path.join(upload_folder, "originals"))) == sorted([f"{first}.png", f"{other}.png"])
+
+
+def test_original_path_looks_up_known_formats_only(upload_folder, monkeypatch):
+    # given
+    jpeg = store_upload(image_upload(image_format="JPEG", filename="me.jpg"), upload_folder)
+    monkeypatch.setattr("app.avatars.os.listdir", lambda folder: pytest.fail("listed the originals folder"))
+
+    # when
+    found = original_path(upload_folder, jpeg)
+    missing = original_path(upload_folder, "0" * 64)
+
+    # then
+    assert found == os.path.join(upload_folder, "originals", f"{jpeg}.jpeg")
+    assert missing is None
+
+
+def test_store_upload_rejects_non_images(upload_folder):
+    # given
+    upload = FileStorage(stream=io.BytesIO(b"not an image"), filename="me.png")
+
+    # when / then
+    with pytest.raises(InvalidImage):
+        store_upload(upload, upload_folder)
+    assert os.listdir(os.path.join(upload_folder, "originals")) == []
+
+
+def test_update_profile_picture_makes_square_thumbnails(app, upload_folder, student_user_id):
+    # given
+    user = db.session.get(User, student_user_id)
+
+    # when
+    update_profile_picture(app, user, image_upload())
+
+    # then
+    db.session.expire_all()
+    digest = db.session.get(User, student_user_id).profile_picture
+    assert has_thumbnails(upload_folder, digest)
+    for size, px in THUMBNAIL_SIZES.items():
+        with Image.open(os.path.join(thumbnails_dir(upload_folder), thumbnail_name(digest, size))) as thumb:
+            assert thumb.size == (px, px)
+
+
+def test_identical_upload_is_live_immediately(app, upload_folder, student_user_id, professor_user_id):
+    # given
+    update_profile_picture(app, db.session.get(User, student_user_id), image_upload())
+
+    # when
+    live = update_profile_picture(app, db.session.get(User, professor_user_id), image_upload())
+
+    # then
+    db.session.expire_all()
+    assert live is True
+    assert db.session.get(User, professor_user_id).profile_picture == db.session.get(User, student_user_id).profile_picture
+
+
+def test_replaced_picture_is_removed_when_unused(app, upload_folder, student_user_id):
+    # given
+    update_profile_picture(app, db.session.get(User, student_user_id), image_upload())
+    db.session.expire_all()
+    old = db.session.get(User, student_user_id).profile_picture
+
+    # when
+    update_profile_picture(app, db.session.get(User, student_user_id), image_upload(color="blue"))
+
+    # then
+    assert not has_thumbnails(upload_folder, old)
+    assert len(os.listdir(os.path.join(upload_folder, "originals"))) == 1
+
+
+def test_thumbnails_served_immutable(app, client, upload_folder, student_user_id):
+    # given
+    update_profile_picture(app, db.session.get(User, student_user_id), image_upload())
+    db.session.expire_all()
+    digest = db.session.get(User, student_user_id).profile_picture
+
+    # when
+    r = client.get(f"/avatars/{thumbnail_name(digest, 'sm')}")
+
+    # then
+    assert r.status_code == 200
+    assert r.mimetype == "image/webp"
+    assert "immutable" in r.headers["Cache-Control"]
+    assert "max-age=31536000" in r.headers["Cache-Control"]
@@ -0,0 +1,60 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app.extensions import db
+from app.migrations import init_schema
+from app.models import Availability, Meeting, User
+
+STUDENTS = 200
+
+
+@pytest.fixture
+def file_app(tmp_path, monkeypatch):
+    # Concurrent requests need a database every thread can see.
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'booking.db'}")
+    from app import create_app
+    app = create_app()
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    with app.app_context():
+        init_schema(db)
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.mark.slow
+def test_parallel_bookings_create_exactly_one_meeting(file_app):
+    # given
+    hashed = generate_password_hash("x")
+    db.session.add(Availability(
+        professor_name="P", professor_email="p@test.com", date="2099-01-01", time="10:00:00"
+    ))
+    db.session.add_all([
+        User(name=f"S{i}", email=f"s{i}@test.com", password=hashed, role="student")
+        for i in range(STUDENTS)
+    ])
+    db.session.commit()
+    slot_id = Availability.query.one().id
+    user_ids = [u.id for u in User.query.all()]
+
+    def book(user_id):
+        client = file_app.test_client()
+        with client.session_transaction() as sess:
+            sess["_user_id"] = str(user_id)
+            sess["_fresh"] = True
+        return client.post(f"/book/{slot_id}", data={"notes": "hi"}).headers.get("Location")
+
+    # when
+    with patch("app.routes.google", type("G", (), {"authorized": False})()):
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            locations = list(pool.map(book, user_ids))
+
+    # then
+    db.session.expire_all()
+    assert Meeting.query.count() == 1
+    assert locations.count("/home") == 1
+    assert locations.count("/sessions") == STUDENTS - 1
+    assert Availability.query.get(slot_id).booked is True
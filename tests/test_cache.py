@@ -0,0 +1,195 @@
+import time
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import insert
+
+from app.cache import CATALOGUE, Cache, MemoryBackend, RedisBackend, invalidate_on_commit, professor_namespace
+from app.extensions import cache, db
+from app.models import Availability, CATALOGUE_SCOPE, bump_versions, user_scope
+
+
+def test_memory_backend_evicts_least_recently_used():
+    # given
+    backend = MemoryBackend(max_entries=2)
+    backend.set("a", 1)
+    backend.set("b", 2)
+    backend.get("a")
+
+    # when
+    backend.set("c", 3)
+
+    # then
+    assert backend.get("a") == 1
+    assert backend.get("b") is None
+    assert backend.get("c") == 3
+
+
+def test_memory_backend_expires_entries(monkeypatch):
+    # given
+    backend = MemoryBackend()
+    now = time.monotonic()
+    monkeypatch.setattr("app.cache.time.monotonic", lambda: now)
+    backend.set("a", 1, ttl=30)
+
+    # when
+    fresh = backend.get("a")
+    monkeypatch.setattr("app.cache.time.monotonic", lambda: now + 31)
+    stale = backend.get("a")
+
+    # then
+    assert fresh == 1
+    assert stale is None
+
+
+def test_invalidate_bumps_only_its_namespace():
+    # given
+    c = Cache()
+    c.backend = MemoryBackend()
+    calls = []
+
+    def loader(value):
+        calls.append(value)
+        return value
+
+    c.get_or_set("professor:a", "slots", lambda: loader("a1"))
+    c.get_or_set("professor:b", "slots", lambda: loader("b1"))
+
+    # when
+    c.invalidate("professor:a")
+    a = c.get_or_set("professor:a", "slots", lambda: loader("a2"))
+    b = c.get_or_set("professor:b", "slots", lambda: loader("b2"))
+
+    # then
+    assert (a, b) == ("a2", "b1")
+    assert calls == ["a1", "b1", "a2"]
+
+
+def test_redis_backend_shares_entries_and_invalidations(redis_url):
+    # given: two processes' caches on one Redis
+    first, second = Cache(), Cache()
+    first.backend, second.backend = RedisBackend(redis_url), RedisBackend(redis_url)
+    calls = []
+
+    def loader(value):
+        calls.append(value)
+        return {"slots": [value]}
+
+    cached = first.get_or_set("professor:a", "slots", lambda: loader("a1"), ttl=60)
+
+    # when
+    shared = second.get_or_set("professor:a", "slots", lambda: loader("unused"))
+    second.invalidate("professor:a")
+    reloaded = first.get_or_set("professor:a", "slots", lambda: loader("a2"))
+
+    # then
+    assert cached == shared == {"slots": ["a1"]}
+    assert reloaded == {"slots": ["a2"]}
+    assert calls == ["a1", "a2"]
+    assert first.backend.counter("collegia:v:professor:a") == 1
+    assert first.backend.counter("collegia:v:professor:b") == 0
+    assert 0 < first.backend.client.ttl(first._key("professor:a", "slots")) <= 60
+
+
+def test_unreachable_backend_falls_back_to_loader():
+    # given
+    class Down:
+        def counter(self, key):
+            raise ConnectionError("refused")
+
+    c = Cache()
+    c.backend = Down()
+
+    # when
+    value = c.get_or_set("catalogue", "page", lambda: "fresh")
+
+    # then
+    assert value == "fresh"
+
+
+def test_invalidation_waits_for_commit(app):
+    # given
+    cache.get_or_set("catalogue", "page", lambda: "old")
+
+    # when
+    invalidate_on_commit(db.session, "catalogue")
+    before_commit = cache.get_or_set("catalogue", "page", lambda: "new")
+    db.session.rollback()
+    after_rollback = cache.get_or_set("catalogue", "page", lambda: "new")
+    invalidate_on_commit(db.session, "catalogue")
+    db.session.commit()
+    after_commit = cache.get_or_set("catalogue", "page", lambda: "new")
+
+    # then
+    assert (before_commit, after_rollback, after_commit) == ("old", "old", "new")
+
+
+def test_memory_cache_sees_invalidations_from_other_processes(app):
+    # given
+    namespace = professor_namespace("prof@example.com")
+    cache.get_or_set(namespace, "slots", lambda: "old")
+
+    # when: another worker commits a change to the professor's slots
+    with db.engine.begin() as other_worker:
+        bump_versions(other_worker, [user_scope("prof@example.com")])
+    value = cache.get_or_set(namespace, "slots", lambda: "new")
+
+    # then
+    assert value == "new"
+    assert namespace == user_scope("prof@example.com") and CATALOGUE == CATALOGUE_SCOPE
+
+
+@pytest.fixture
+def professor_client(client, professor_user_id):
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(professor_user_id)
+        sess["_fresh"] = True
+    return client
+
+
+def test_professor_slots_cached_until_written(professor_client):
+    # given
+    professor_client.get("/manage-sessions")
+    with professor_client.application.app_context():
+        # A Core insert bumps no version, so the cache cannot know of it.
+        db.session.execute(insert(Availability.__table__).values(
+            professor_name="Professor Smith", professor_email="prof@example.com",
+            date="2099-01-01", time="09:00:00", booked=False, created_at=datetime.now(timezone.utc)
+        ))
+        db.session.commit()
+
+    # when
+    cached = professor_client.get("/manage-sessions").get_data(as_text=True)
+    professor_client.post(
+        "/manage-sessions",
+        data={"date": "2099-01-02", "time": "10:00"},
+    )
+    refreshed = professor_client.get("/manage-sessions").get_data(as_text=True)
+
+    # then
+    assert "2099-01-01" not in cached
+    assert "2099-01-01" in refreshed and "2099-01-02" in refreshed
+
+
+def test_booking_invalidates_catalogue(client, student_user_id, professor_user_id):
+    # given
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(student_user_id)
+        sess["_fresh"] = True
+    with client.application.app_context():
+        slot = Availability(
+            professor_name="Professor Smith", professor_email="prof@example.com",
+            date="2099-01-01", time="09:00:00"
+        )
+        db.session.add(slot)
+        db.session.commit()
+        slot_id = slot.id
+    before = client.get("/sessions").get_data(as_text=True)
+
+    # when
+    client.post(f"/book/{slot_id}", data={"notes": "x"})
+    after = client.get("/sessions").get_data(as_text=True)
+
+    # then
+    assert f"/book/{slot_id}" in before
+    assert f"/book/{slot_id}" not in after
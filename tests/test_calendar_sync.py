@@ -0,0 +1,120 @@
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import pytest
+
+from app import calendar_sync
+from app.calendar_sync import CircuitBreaker, queue_calendar_event, sync_pending
+from app.extensions import db
+from app.models import CalendarJob, Meeting, User
+
+
+class Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.ok = 200 <= status_code < 300
+        self.text = ""
+
+
+class FakeGoogle:
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def post(self, url, json, timeout):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return Response(outcome)
+
+
+@pytest.fixture(autouse=True)
+def fresh_breaker(monkeypatch):
+    monkeypatch.setattr(calendar_sync, "google_breaker", CircuitBreaker(failure_threshold=2, reset_timeout=60))
+
+
+@pytest.fixture
+def job_id(app, meeting_id, student_user_id):
+    student = User.query.get(student_user_id)
+    student.google_token = {"access_token": "a", "token_type": "Bearer"}
+    job = queue_calendar_event(student, Meeting.query.get(meeting_id))
+    db.session.commit()
+    return job.id
+
+
+def run_with(app, google):
+    with patch("app.calendar_sync.google_session", return_value=google):
+        processed = sync_pending(app)
+    db.session.expire_all()
+    return processed
+
+
+def make_due(job_id):
+    CalendarJob.query.filter_by(id=job_id).update(
+        {"next_attempt_at": datetime(2000, 1, 1, tzinfo=timezone.utc)}
+    )
+    db.session.commit()
+
+
+def test_queue_calendar_event_uses_local_time(app, job_id):
+    # given
+    job = CalendarJob.query.get(job_id)
+
+    # then
+    assert job.event["start"] == {"dateTime": "2025-12-15T10:00:00", "timeZone": "America/New_York"}
+    assert job.event["end"]["dateTime"] == "2025-12-15T11:00:00"
+
+
+def test_sync_marks_job_done(app, job_id):
+    # when
+    processed = run_with(app, FakeGoogle(200))
+
+    # then
+    assert processed == 1
+    assert CalendarJob.query.get(job_id).status == "done"
+
+
+def test_server_errors_back_off_and_open_the_breaker(app, job_id):
+    # given
+    google = FakeGoogle(503, ConnectionError("down"), 200)
+
+    # when
+    run_with(app, google)
+    backed_off = run_with(app, google)
+    make_due(job_id)
+    run_with(app, google)
+    make_due(job_id)
+    while_open = run_with(app, google)
+
+    # then
+    job = CalendarJob.query.get(job_id)
+    assert backed_off == 0
+    assert while_open == 0
+    assert google.calls == 2
+    assert job.status == "pending"
+    assert job.attempts == 2
+
+
+def test_client_errors_fail_without_retry(app, job_id):
+    # when
+    run_with(app, FakeGoogle(401))
+
+    # then
+    job = CalendarJob.query.get(job_id)
+    assert job.status == "failed"
+    assert "401" in job.last_error
+
+
+def test_cancelled_meeting_skips_google(app, job_id, meeting_id):
+    # given
+    db.session.delete(Meeting.query.get(meeting_id))
+    db.session.commit()
+    google = FakeGoogle()
+
+    # when
+    run_with(app, google)
+
+    # then
+    assert google.calls == 0
+    assert CalendarJob.query.get(job_id).status == "cancelled"
@@ -0,0 +1,100 @@
+from sqlalchemy import text
+
+from app import create_app
+from app.database import dispose_engines_after_fork, engine_options
+from app.extensions import db
+
+CONFIG = {
+    "DB_POOL_SIZE": 4,
+    "DB_MAX_OVERFLOW": 6,
+    "DB_POOL_TIMEOUT": 10,
+    "DB_POOL_RECYCLE": 300,
+    "DB_POOL_PRE_PING": True,
+    "DB_STATEMENT_TIMEOUT_MS": 15000,
+}
+
+
+def test_postgres_gets_pool_sizes_and_statement_timeout():
+    # when
+    options = engine_options({**CONFIG, "SQLALCHEMY_DATABASE_URI": "postgresql://localhost/collegia"})
+
+    # then
+    assert options == {
+        "pool_pre_ping": True,
+        "pool_recycle": 300,
+        "pool_size": 4,
+        "max_overflow": 6,
+        "pool_timeout": 10,
+        "connect_args": {"options": "-c statement_timeout=15000"},
+    }
+
+
+def test_statement_timeout_can_be_turned_off():
+    # when
+    options = engine_options({
+        **CONFIG, "DB_STATEMENT_TIMEOUT_MS": 0, "SQLALCHEMY_DATABASE_URI": "postgresql://localhost/collegia"
+    })
+
+    # then
+    assert "connect_args" not in options
+
+
+def test_sqlite_keeps_its_own_pool():
+    # when
+    options = engine_options({**CONFIG, "SQLALCHEMY_DATABASE_URI": "sqlite:///collegia.db"})
+
+    # then
+    assert options == {"pool_pre_ping": True, "pool_recycle": 300}
+
+
+def test_pool_settings_come_from_the_environment(monkeypatch, tmp_path):
+    # given
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'env.db'}")
+    monkeypatch.setenv("DB_POOL_RECYCLE", "60")
+    monkeypatch.setenv("DB_POOL_PRE_PING", "False")
+
+    # when
+    app = create_app()
+
+    # then
+    assert app.config["SQLALCHEMY_ENGINE_OPTIONS"] == {"pool_pre_ping": False, "pool_recycle": 60}
+    with app.app_context():
+        assert db.engine.pool._recycle == 60
+
+
+def test_sqlite_connections_get_pragmas(monkeypatch, tmp_path):
+    # given
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'pragmas.db'}")
+    monkeypatch.setenv("SQLITE_BUSY_TIMEOUT_MS", "2500")
+    app = create_app()
+
+    # when
+    with app.app_context():
+        journal_mode = db.session.scalar(text("PRAGMA journal_mode"))
+        busy_timeout = db.session.scalar(text("PRAGMA busy_timeout"))
+        synchronous = db.session.scalar(text("PRAGMA synchronous"))
+        mmap_size = db.session.scalar(text("PRAGMA mmap_size"))
+
+    # then
+    assert journal_mode == "wal"
+    assert busy_timeout == 2500
+    assert synchronous == 1  # NORMAL
+    assert mmap_size == 256 * 1024 * 1024
+
+
+def test_forked_child_drops_inherited_connections(monkeypatch, tmp_path):
+    # given
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'fork.db'}")
+    app = create_app()
+    with app.app_context():
+        db.session.execute(text("SELECT 1"))
+        db.session.remove()
+        inherited = db.engine.pool
+
+    # when
+    dispose_engines_after_fork()
+
+    # then
+    with app.app_context():
+        assert db.engine.pool is not inherited
+        assert db.engine.pool.checkedin() == 0
@@ -0,0 +1,166 @@
+import time
+
+from app.events import MemoryBackend, PostgresBackend, queue_notification_events
+from app.extensions import db, events
+from app.models import Notification
+
+
+def test_memory_backend_routes_by_channel():
+    # given
+    backend = MemoryBackend()
+    mine = backend.subscribe(["a@test.com", "all_students"])
+    other = backend.subscribe(["b@test.com"])
+
+    # when
+    backend.publish([("a@test.com", {"n": 1}), ("all_students", {"n": 2})])
+
+    # then
+    assert mine.get(timeout=0.1) == ("a@test.com", {"n": 1})
+    assert mine.get(timeout=0.1) == ("all_students", {"n": 2})
+    assert other.get(timeout=0.01) is None
+
+
+def test_closed_subscription_stops_receiving():
+    # given
+    backend = MemoryBackend()
+    subscription = backend.subscribe(["a@test.com"])
+
+    # when
+    subscription.close()
+    backend.publish([("a@test.com", {"n": 1})])
+
+    # then
+    assert subscription.get(timeout=0.01) is None
+
+
+def test_postgres_backend_delivers_notify_to_other_processes(postgres_engine):
+    # given: a listening process and a publishing one on one database
+    url = postgres_engine.url.render_as_string(hide_password=False)
+    listener, publisher = PostgresBackend(url), PostgresBackend(url)
+    ready = listener.subscribe(["ready"])
+    mine = listener.subscribe(["a@test.com"])
+    other = listener.subscribe(["b@test.com"])
+    # LISTEN runs on the listener's own thread; wait until it hears.
+    deadline = time.monotonic() + 5
+    while ready.get(timeout=0.1) is None:
+        assert time.monotonic() < deadline, "listener never started"
+        publisher.publish([("ready", {})])
+
+    # when
+    publisher.publish([("a@test.com", {"message": "hello", "type": "t"})])
+
+    # then
+    assert mine.get(timeout=2) == ("a@test.com", {"message": "hello", "type": "t"})
+    assert other.get(timeout=0.1) is None
+    for subscription in (ready, mine, other):
+        subscription.close()
+    publisher.engine.dispose()
+
+
+def test_notifications_publish_only_after_commit(app):
+    # given
+    subscription = events.subscribe(["a@test.com"])
+
+    # when
+    db.session.add(Notification(user_email="a@test.com", message="rolled back", type="t"))
+    db.session.flush()
+    db.session.rollback()
+    db.session.add(Notification(user_email="a@test.com", message="kept", type="t"))
+    queue_notification_events(db.session, [{"user_email": "a@test.com", "message": "bulk", "type": "t"}])
+    db.session.commit()
+
+    # then
+    received = [subscription.get(timeout=0.1), subscription.get(timeout=0.1)]
+    assert sorted(event["message"] for _, event in received) == ["bulk", "kept"]
+    assert subscription.get(timeout=0.01) is None
+    subscription.close()
+
+
+def test_notification_stream_sends_events(client, student_user_id, force_login):
+    # given
+    force_login(client, student_user_id)
+
+    # when
+    response = client.get("/notifications/stream")
+    chunks = iter(response.response)
+    first = next(chunks)
+    events.publish([("student@example.com", {"message": "hello", "type": "t"})])
+    second = next(chunks)
+    response.close()
+
+    # then
+    assert response.mimetype == "text/event-stream"
+    assert first.startswith(b"retry:")
+    assert b"event: notification" in second and b"hello" in second
+
+
+def test_broadcasts_stream_as_announcements(client, student_user_id, force_login):
+    # given
+    force_login(client, student_user_id)
+    response = client.get("/notifications/stream")
+    chunks = iter(response.response)
+    next(chunks)
+
+    # when
+    events.publish([("all_students", {"message": "campus closed", "type": "t"})])
+    chunk = next(chunks)
+    response.close()
+
+    # then
+    assert b"event: announcement" in chunk and b"campus closed" in chunk
+
+
+def test_streams_past_the_cap_are_told_to_retry_later(app, client, student_user_id, force_login):
+    # given
+    app.config["NOTIFICATION_STREAMS_PER_PROCESS"] = 1
+    events.init_app(app)
+    force_login(client, student_user_id)
+    first = client.get("/notifications/stream")
+    next(iter(first.response))
+
+    # when
+    refused = client.get("/notifications/stream")
+    first.close()
+    after_close = client.get("/notifications/stream")
+
+    # then
+    assert refused.mimetype == "text/event-stream"
+    retry = refused.get_data(as_text=True)
+    assert retry.startswith("retry: ") and "event:" not in retry
+    assert 30000 <= int(retry.split()[1]) <= 90000
+    assert next(iter(after_close.response)).startswith(b"retry: 5000")
+    after_close.close()
+
+
+def test_stream_ends_after_its_lifetime(app, client, student_user_id, force_login):
+    # given
+    app.config.update(NOTIFICATION_STREAMS_PER_PROCESS=1, NOTIFICATION_STREAM_MAX_SECONDS=0.2)
+    events.init_app(app)
+    force_login(client, student_user_id)
+
+    # when
+    started = time.monotonic()
+    response = client.get("/notifications/stream")
+    body = response.get_data()
+    elapsed = time.monotonic() - started
+    response.close()
+
+    # then
+    assert body.startswith(b"retry: 5000")
+    assert elapsed < 2
+    assert events.claim_stream()
+    events.release_stream()
+
+
+def test_only_the_inbox_opens_a_stream(client, student_user_id, force_login):
+    # given
+    force_login(client, student_user_id)
+
+    # when
+    inbox = client.get("/notifications").get_data(as_text=True)
+    settings = client.get("/settings").get_data(as_text=True)
+
+    # then
+    assert 'id="notifications-link"' in inbox and 'id="notifications-link"' in settings
+    assert "data-stream-url" in inbox
+    assert "data-stream-url" not in settings
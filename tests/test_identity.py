@@ -0,0 +1,119 @@
+from app.extensions import db
+from app.identity import CachedUser
+from app.models import Notification, User
+from app.querycount import record_queries
+
+
+def user_lookups(log):
+    return [s for s in log.statements if "FROM user" in s]
+
+
+def test_second_request_skips_the_user_lookup(app, client, student_user_id, force_login):
+    # given
+    force_login(client, student_user_id)
+
+    # when
+    with record_queries() as first:
+        client.get("/notifications/unread-count")
+    with record_queries() as second:
+        response = client.get("/notifications/unread-count")
+
+    # then
+    assert response.get_json() == {"unread": 0}
+    assert len(user_lookups(first)) == 1
+    assert user_lookups(second) == []
+
+
+def test_settings_change_is_shown_on_the_next_page(app, client, student_user_id, force_login):
+    # given
+    force_login(client, student_user_id)
+    client.get("/settings")
+
+    # when
+    client.post("/settings", data={"name": "Renamed Student"})
+    page = client.get("/settings")
+
+    # then
+    assert b"Renamed Student" in page.data
+    assert app.extensions["identity"].get(student_user_id)["name"] == "Renamed Student"
+
+
+def test_google_role_change_drops_the_cached_identity(app, client, student_user_id, force_login):
+    # given
+    force_login(client, student_user_id)
+    client.get("/settings")
+    with client.session_transaction() as sess:
+        sess["google_user"] = {"email": "student@example.com", "name": "Student John"}
+
+    # when
+    client.post("/google-role", data={"role": "professor"})
+
+    # then
+    assert app.extensions["identity"].get(student_user_id) is None
+    client.get("/settings")
+    assert app.extensions["identity"].get(student_user_id)["role"] == "professor"
+
+
+def test_unread_badge_follows_reads(app, client, student_user_id, force_login):
+    # given
+    force_login(client, student_user_id)
+    client.get("/settings")
+    db.session.add_all([
+        Notification(user_email="student@example.com", message=f"Message {i}", type="booking_confirmation")
+        for i in range(2)
+    ])
+    db.session.commit()
+
+    # when
+    before = client.get("/notifications/unread-count").get_json()
+    client.get("/notifications")
+    after = client.get("/notifications/unread-count").get_json()
+
+    # then
+    assert before == {"unread": 2}
+    assert after == {"unread": 0}
+
+
+def test_zero_ttl_turns_caching_off(app, client, student_user_id, force_login):
+    # given
+    app.extensions["identity"].ttl = 0
+    force_login(client, student_user_id)
+
+    # when
+    client.get("/notifications/unread-count")
+    with record_queries() as second:
+        client.get("/notifications/unread-count")
+
+    # then
+    assert app.extensions["identity"].get(student_user_id) is None
+    assert len(user_lookups(second)) == 1
+
+
+def test_deleted_user_is_signed_out(app, client, student_user_id, force_login):
+    # given
+    force_login(client, student_user_id)
+    client.get("/settings")
+
+    # when
+    db.session.delete(db.session.get(User, student_user_id))
+    db.session.commit()
+    response = client.get("/settings")
+
+    # then
+    assert response.status_code == 302
+
+
+def test_cached_user_loads_the_row_for_other_fields(app, student_user_id):
+    # given
+    identity = app.login_manager._user_callback(str(student_user_id))
+
+    # when
+    with record_queries() as log:
+        name = identity.name
+        password = identity.password
+
+    # then
+    assert isinstance(identity, CachedUser)
+    assert name == "Student John"
+    assert password.startswith("scrypt:")
+    assert len(log) == 1
@@ -70,4 +70,36 @@ def test_app_mail_tls_boolean():
     os.environ['MAIL_USE_TLS'] = 'False'
     app = create_app()
     assert app.config['MAIL_USE_TLS'] is False
-    del os.environ['MAIL_USE_TLS']
\ No newline at end of file
+    del os.environ['MAIL_USE_TLS']
+
+def test_create_app_does_not_touch_the_database(tmp_path, monkeypatch):
+    db_path = tmp_path / "untouched.db"
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{db_path}')
+
+    create_app()
+
+    assert not db_path.exists()
+
+
+def test_init_db_command_creates_tables(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "fresh.db"}')
+    app = create_app()
+
+    result = app.test_cli_runner().invoke(args=['init-db'])
+
+    assert '[MIGRATE] Tables ready' in result.output
+    with app.app_context():
+        tables = set(db.inspect(db.engine).get_table_names())
+    assert {'user', 'meeting', 'availability', 'schema_migrations'} <= tables
+
+
+def test_google_blueprint_only_when_configured(monkeypatch):
+    monkeypatch.delenv('GOOGLE_OAUTH_CLIENT_ID', raising=False)
+    without = create_app()
+    monkeypatch.setenv('GOOGLE_OAUTH_CLIENT_ID', 'client-id')
+    with_google = create_app()
+
+    assert 'google' not in without.blueprints
+    assert 'Continue with Google' not in without.test_client().get('/').get_data(as_text=True)
+    assert 'google' in with_google.blueprints
+    assert 'Continue with Google' in with_google.test_client().get('/').get_data(as_text=True)
@@ -0,0 +1,194 @@
+import os
+import runpy
+from datetime import datetime, timedelta
+
+import pytest
+from flask_mail import Message
+from prometheus_client import REGISTRY
+
+from app.extensions import db
+from app.metrics import google_call
+from app.models import Meeting, User
+from app.outbox import send_messages
+from notifications_scheduler import check_upcoming_meetings
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class FakeSMTP:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def send(self, msg):
+        if msg.recipients[0] == "bad@example.com":
+            raise OSError("mailbox unavailable")
+
+
+def test_request_latency_and_sql_are_recorded_per_endpoint(client):
+    # given
+    gets_before = sample("collegia_request_duration_seconds_count", endpoint="routes.login", method="GET", status="200")
+    posts_before = sample("collegia_request_duration_seconds_count", endpoint="routes.login", method="POST", status="200")
+    sql_before = sample("collegia_request_sql_statements_sum", endpoint="routes.login")
+    statements_before = sample("collegia_sql_statements_total")
+
+    # when
+    client.get("/")
+    client.post("/", data={"email": "nobody@example.com", "password": "wrong"})
+
+    # then
+    assert sample(
+        "collegia_request_duration_seconds_count", endpoint="routes.login", method="GET", status="200"
+    ) == gets_before + 1
+    assert sample(
+        "collegia_request_duration_seconds_count", endpoint="routes.login", method="POST", status="200"
+    ) == posts_before + 1
+    # The failed sign-in looked the user up.
+    assert sample("collegia_request_sql_statements_sum", endpoint="routes.login") >= sql_before + 1
+    assert sample("collegia_sql_statements_total") >= statements_before + 1
+
+
+def test_unknown_urls_share_one_label(client):
+    # given
+    before = sample("collegia_request_duration_seconds_count", endpoint="unmatched", method="GET", status="404")
+
+    # when
+    client.get("/no-such-page")
+    client.get("/another/missing/page")
+
+    # then
+    assert sample(
+        "collegia_request_duration_seconds_count", endpoint="unmatched", method="GET", status="404"
+    ) == before + 2
+
+
+def test_metrics_endpoint_serves_prometheus_text(client):
+    # given
+    client.get("/")
+
+    # when
+    r = client.get("/metrics")
+
+    # then
+    assert r.status_code == 200
+    assert r.content_type.startswith("text/plain; version=")
+    body = r.get_data(as_text=True)
+    assert "# TYPE collegia_request_duration_seconds histogram" in body
+    assert 'collegia_request_duration_seconds_count{endpoint="routes.login",method="GET",status="200"}' in body
+    assert "collegia_reminder_sweep_duration_seconds" in body
+
+
+def test_metrics_endpoint_checks_token_when_configured(client, app):
+    # given
+    app.config["METRICS_TOKEN"] = "s3cret"
+
+    # when
+    missing = client.get("/metrics")
+    wrong = client.get("/metrics", headers={"Authorization": "Bearer nope"})
+    right = client.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+
+    # then
+    assert missing.status_code == 401
+    assert wrong.status_code == 401
+    assert right.status_code == 200
+
+
+@pytest.fixture
+def on_heroku(monkeypatch):
+    # Requested before app, so create_app() sees it.
+    monkeypatch.setenv("DYNO", "web.1")
+    monkeypatch.delenv("METRICS_TOKEN", raising=False)
+    monkeypatch.delenv("METRICS_REQUIRE_TOKEN", raising=False)
+
+
+def test_metrics_endpoint_is_not_served_on_heroku_without_token(on_heroku, app, client):
+    # when
+    without_token = client.get("/metrics")
+    app.config["METRICS_TOKEN"] = "s3cret"
+    with_token = client.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+
+    # then
+    assert app.config["METRICS_REQUIRE_TOKEN"] is True
+    assert without_token.status_code == 404
+    assert with_token.status_code == 200
+
+
+def test_gunicorn_config_resets_the_shared_metrics_folder(tmp_path, monkeypatch):
+    # given
+    folder = tmp_path / "metrics"
+    folder.mkdir()
+    (folder / "counter_123.db").write_bytes(b"left over")
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(folder))
+    settings = runpy.run_path(os.path.join(os.path.dirname(__file__), "..", "gunicorn.conf.py"))
+
+    # when
+    settings["on_starting"](None)
+
+    # then
+    assert settings["threads"] == 8
+    assert folder.is_dir()
+    assert list(folder.iterdir()) == []
+
+
+def test_smtp_sends_are_timed_by_result(app, monkeypatch):
+    # given
+    monkeypatch.setattr("app.outbox.mail.connect", FakeSMTP)
+    sent_before = sample("collegia_smtp_send_duration_seconds_count", result="sent")
+    failed_before = sample("collegia_smtp_send_duration_seconds_count", result="failed")
+    messages = [
+        ("a", Message(subject="Hi", recipients=["good@example.com"], body="x", sender="noreply@example.com")),
+        ("b", Message(subject="Hi", recipients=["bad@example.com"], body="x", sender="noreply@example.com")),
+    ]
+
+    # when
+    send_messages(app, messages, threads=1)
+
+    # then
+    assert sample("collegia_smtp_send_duration_seconds_count", result="sent") == sent_before + 1
+    assert sample("collegia_smtp_send_duration_seconds_count", result="failed") == failed_before + 1
+
+
+def test_google_call_records_status_or_error():
+    # given
+    ok_before = sample("collegia_google_request_duration_seconds_count", call="test", status="200")
+    error_before = sample("collegia_google_request_duration_seconds_count", call="test", status="error")
+
+    # when
+    with google_call("test") as call:
+        call.status = 200
+    with pytest.raises(ConnectionError):
+        with google_call("test"):
+            raise ConnectionError("timed out")
+
+    # then
+    assert sample("collegia_google_request_duration_seconds_count", call="test", status="200") == ok_before + 1
+    assert sample("collegia_google_request_duration_seconds_count", call="test", status="error") == error_before + 1
+
+
+def test_sweep_records_duration_and_reminders(app, monkeypatch):
+    # given
+    monkeypatch.setattr("notifications_scheduler.deliver_committed", lambda ids: 0)
+    db.session.add_all([
+        User(name="Student", email="student@test.com", password="x", role="student"),
+        User(name="Professor", email="prof@test.com", password="x", role="professor"),
+    ])
+    db.session.add(Meeting(
+        student="Student", student_email="student@test.com",
+        professor="Professor", professor_email="prof@test.com",
+        notes="Test", date=(datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d"), time="10:00:00"
+    ))
+    db.session.commit()
+    sweeps_before = sample("collegia_reminder_sweep_duration_seconds_count")
+    reminders_before = sample("collegia_reminders_sent_total", window="24hr")
+
+    # when
+    check_upcoming_meetings(app)
+    check_upcoming_meetings(app)
+
+    # then
+    assert sample("collegia_reminder_sweep_duration_seconds_count") == sweeps_before + 2
+    assert sample("collegia_reminders_sent_total", window="24hr") == reminders_before + 2
@@ -0,0 +1,146 @@
+import pytest
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.exc import IntegrityError
+
+import app.models  # noqa: F401 - registers the indexed tables
+from app.migrations import MIGRATIONS, schema_migrations, _create_index, _invalid_index, applied_versions, upgrade
+
+
+LEGACY_SCHEMA = [
+    "CREATE TABLE user (id INTEGER PRIMARY KEY, email VARCHAR(120))",
+    "CREATE TABLE availability (id INTEGER PRIMARY KEY, professor_email VARCHAR(120), "
+    "date VARCHAR(50), time VARCHAR(50), booked BOOLEAN)",
+    "CREATE TABLE meeting (id INTEGER PRIMARY KEY, student_email VARCHAR(120), "
+    "professor_email VARCHAR(120), date VARCHAR(50), time VARCHAR(50))",
+    "CREATE TABLE notification (id INTEGER PRIMARY KEY, user_email VARCHAR(120), "
+    "type VARCHAR(50), meeting_id INTEGER, is_read BOOLEAN, created_at DATETIME)",
+]
+
+
+def legacy_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as connection:
+        for ddl in LEGACY_SCHEMA:
+            connection.exec_driver_sql(ddl)
+    return engine
+
+
+def index_names(engine, table):
+    return {ix["name"] for ix in inspect(engine).get_indexes(table)}
+
+
+def test_upgrade_adds_indexes_to_legacy_database(tmp_path):
+    # given
+    engine = legacy_engine(tmp_path)
+
+    # when
+    ran = upgrade(engine)
+
+    # then
+    assert ran == [version for version, _, _ in MIGRATIONS]
+    assert "ix_meeting_professor_slot" in index_names(engine, "meeting")
+    assert "ix_availability_open_starts_at" in index_names(engine, "availability")
+    assert "ix_notification_meeting_type" in index_names(engine, "notification")
+
+
+def test_upgrade_is_idempotent(tmp_path):
+    # given
+    engine = legacy_engine(tmp_path)
+    upgrade(engine)
+
+    # when
+    ran = upgrade(engine)
+
+    # then
+    assert ran == []
+    assert applied_versions(engine) == {version for version, _, _ in MIGRATIONS}
+
+
+def test_upgrade_backfills_starts_at(tmp_path):
+    # given
+    engine = legacy_engine(tmp_path)
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO meeting (id, date, time) VALUES (1, '2025-12-15', '10:00:00'), (2, '2025-12-15', 'soon')"
+        )
+
+    # when
+    upgrade(engine)
+
+    # then
+    with engine.connect() as connection:
+        rows = dict(connection.exec_driver_sql("SELECT id, starts_at FROM meeting").all())
+    assert rows[1].startswith("2025-12-15 15:00:00")
+    assert rows[2] is None
+    assert "ix_meeting_starts_at" in index_names(engine, "meeting")
+
+
+def test_upgrade_backfills_unread_counts(tmp_path):
+    # given
+    engine = legacy_engine(tmp_path)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("INSERT INTO user (id, email) VALUES (1, 'a@test.com'), (2, 'b@test.com')")
+        connection.exec_driver_sql(
+            "INSERT INTO notification (user_email, is_read) VALUES "
+            "('a@test.com', 0), ('a@test.com', NULL), ('a@test.com', 1), ('b@test.com', 1)"
+        )
+
+    # when
+    upgrade(engine)
+
+    # then
+    with engine.connect() as connection:
+        counts = dict(connection.exec_driver_sql("SELECT email, unread_count FROM user").all())
+    assert counts == {"a@test.com": 2, "b@test.com": 0}
+
+
+def test_upgrade_gives_existing_slots_an_hour(tmp_path):
+    # given
+    engine = legacy_engine(tmp_path)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("INSERT INTO availability (id, date, time) VALUES (1, '2025-12-15', '10:00:00')")
+
+    # when
+    upgrade(engine)
+
+    # then
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("SELECT duration_minutes FROM availability").scalar() == 60
+
+
+def test_index_left_invalid_by_a_failed_build_is_rebuilt(postgres_engine):
+    # given
+    with postgres_engine.connect() as connection:
+        connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+        connection.exec_driver_sql("DROP TABLE IF EXISTS half_indexed")
+        connection.exec_driver_sql("CREATE TABLE half_indexed (v INTEGER)")
+        connection.exec_driver_sql("INSERT INTO half_indexed VALUES (1), (1)")
+        with pytest.raises(IntegrityError):
+            connection.exec_driver_sql("CREATE UNIQUE INDEX CONCURRENTLY ix_half ON half_indexed (v)")
+        left_invalid = _invalid_index(connection, "ix_half")
+
+        # when
+        _create_index(connection, "ix_half", "half_indexed", "v")
+
+        # then
+        assert left_invalid
+        assert not _invalid_index(connection, "ix_half")
+        connection.exec_driver_sql("DROP TABLE half_indexed")
+
+
+def test_migrations_run_without_the_statement_timeout(postgres_engine, monkeypatch):
+    # given
+    engine = create_engine(postgres_engine.url, connect_args={"options": "-c statement_timeout=200"})
+    monkeypatch.setattr("app.migrations.MIGRATIONS", [
+        (9001, "slow step", lambda connection: connection.exec_driver_sql("SELECT pg_sleep(0.5)")),
+    ])
+
+    # when
+    ran = upgrade(engine)
+
+    # then
+    assert ran == [9001]
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("SHOW statement_timeout").scalar() == "200ms"
+    schema_migrations.drop(engine)
+    engine.dispose()
@@ -1,22 +1,23 @@
 import pytest
-from datetime import datetime
-from app.models import User, Availability, Meeting, Notification
+from datetime import datetime, timezone
+from app.models import User, Availability, Meeting, Notification, slot_start
 from app.extensions import db
+from app.migrations import init_schema
 
 
 @pytest.fixture
-def app():
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'test.db'}")
     from app import create_app
     app = create_app()
     app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
     app.config['WTF_CSRF_ENABLED'] = False
     
     with app.app_context():
-        db.create_all()
+        init_schema(db)
         yield app
         db.session.remove()
-        db.drop_all()
+        db.engine.dispose()
 
 
 @pytest.fixture
@@ -176,6 +177,54 @@ class TestMeeting:
         
         assert meeting.notified is True
 
+    def test_meeting_user_relationships(self, db_session):
+        student = User(name="Rel Student", email="rel-s@example.com", password="x", role="student")
+        prof = User(name="Rel Prof", email="rel-p@example.com", password="x", role="professor")
+        meeting = Meeting(
+            student=student.name,
+            student_email=student.email,
+            professor=prof.name,
+            professor_email=prof.email,
+            date="2025-12-18",
+            time="09:00:00"
+        )
+        slot = Availability(
+            professor_name=prof.name,
+            professor_email=prof.email,
+            date="2025-12-18",
+            time="10:00:00"
+        )
+        db_session.add_all([student, prof, meeting, slot])
+        db_session.commit()
+
+        assert meeting.student_user.id == student.id
+        assert meeting.professor_user.id == prof.id
+        assert slot.professor_user.id == prof.id
+
+
+    def test_meeting_starts_at_from_local_strings(self, db_session):
+        meeting = Meeting(
+            student="Time Student",
+            student_email="time-s@example.com",
+            professor="Time Prof",
+            professor_email="time-p@example.com",
+            date="2025-12-19",
+            time="10:00:00"
+        )
+        bad = Meeting(
+            student="Bad Student",
+            student_email="bad-s@example.com",
+            professor="Bad Prof",
+            professor_email="bad-p@example.com",
+            date="2025-12-19",
+            time="not-a-time"
+        )
+        db_session.add_all([meeting, bad])
+        db_session.commit()
+
+        assert meeting.starts_at.replace(tzinfo=timezone.utc) == slot_start("2025-12-19", "10:00")
+        assert bad.starts_at is None
+
 
 class TestNotification:
     def test_notification_creation(self, db_session):
@@ -1,32 +1,35 @@
 import os
 import pytest
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from unittest.mock import patch, Mock
 
-from app.models import User, Meeting, Notification
+from app.models import User, Meeting, Notification, ReminderClaim, EmailOutbox, LOCAL_TIMEZONE
 from app.extensions import db
+from app.migrations import init_schema
 from notifications_scheduler import (
     check_upcoming_meetings,
     notify_users,
-    send_email,
-    save_notification,
-    start_scheduler
+    reminder_notification,
+    save_notifications,
+    claim_reminders,
+    start_scheduler,
+    CLAIM_TTL
 )
 
 
 @pytest.fixture
-def app():
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'test.db'}")
     from app import create_app
     app = create_app()
     app.config["TESTING"] = True
-    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
     app.config["WTF_CSRF_ENABLED"] = False
 
     with app.app_context():
-        db.create_all()
+        init_schema(db)
         yield app
         db.session.remove()
-        db.drop_all()
+        db.engine.dispose()
 
 
 @pytest.fixture
@@ -77,6 +80,40 @@ class TestCheckUpcomingMeetings:
         with patch("notifications_scheduler.notify_users"):
             check_upcoming_meetings(app)
 
+    def test_selects_meetings_in_reminder_windows(self, app, users):
+        with app.app_context():
+            local_now = datetime.now(LOCAL_TIMEZONE)
+            tomorrow = (local_now + timedelta(days=1)).strftime("%Y-%m-%d")
+            m = Meeting(
+                student="Student",
+                student_email="student@test.com",
+                professor="Professor",
+                professor_email="prof@test.com",
+                date=tomorrow,
+                time="10:00:00"
+            )
+            past = Meeting(
+                student="Student",
+                student_email="student@test.com",
+                professor="Professor",
+                professor_email="prof@test.com",
+                date=(local_now - timedelta(days=1)).strftime("%Y-%m-%d"),
+                time="10:00:00"
+            )
+            db.session.add_all([m, past])
+            db.session.commit()
+            mid = m.id
+
+        windows = set()
+        with patch(
+            "notifications_scheduler.notify_users",
+            side_effect=lambda meetings, window: windows.update((m.id, window) for m in meetings) or []
+        ):
+            check_upcoming_meetings(app)
+
+        assert (mid, "24hr") in windows
+        assert all(meeting_id == mid for meeting_id, _ in windows)
+
     def test_invalid_time_format(self, app, users):
         """
         Invalid meeting time should be swallowed.
@@ -100,6 +137,86 @@ class TestCheckUpcomingMeetings:
             check_upcoming_meetings(app)
 
 
+    def test_reminders_are_sent_once(self, app, meeting_24hr):
+        with app.app_context():
+            meeting = Meeting.query.get(meeting_24hr)
+            meeting.date = (datetime.now(LOCAL_TIMEZONE) + timedelta(days=1)).strftime("%Y-%m-%d")
+            db.session.commit()
+
+        with patch("notifications_scheduler.deliver_committed") as mock_deliver:
+            check_upcoming_meetings(app)
+            check_upcoming_meetings(app)
+
+        with app.app_context():
+            reminders = Notification.query.filter_by(
+                meeting_id=meeting_24hr,
+                type="meeting_reminder_24hr"
+            ).count()
+        assert reminders == 2
+        assert sum(len(call.args[0]) for call in mock_deliver.call_args_list) == 2
+
+    def test_emails_are_sent_after_the_sweep_commits(self, app, meeting_24hr):
+        with app.app_context():
+            meeting = Meeting.query.get(meeting_24hr)
+            meeting.date = (datetime.now(LOCAL_TIMEZONE) + timedelta(days=1)).strftime("%Y-%m-%d")
+            db.session.commit()
+
+        seen_during_send = {}
+
+        def send_messages(app_, messages, threads):
+            # Another connection writes to a recipient while the sweep is
+            # sending, and sees everything the sweep saved.
+            with db.engine.connect() as connection:
+                connection.exec_driver_sql("UPDATE user SET name = name WHERE email = 'prof@test.com'")
+                connection.commit()
+                seen_during_send["reminders"] = connection.execute(
+                    db.select(db.func.count()).select_from(Notification)
+                    .where(Notification.meeting_id == meeting_24hr)
+                ).scalar()
+                seen_during_send["completed"] = connection.execute(
+                    db.select(ReminderClaim.completed_at).where(ReminderClaim.meeting_id == meeting_24hr)
+                ).scalar()
+            return {key: None for key, _ in messages}
+
+        with patch("app.outbox.send_messages", side_effect=send_messages):
+            check_upcoming_meetings(app)
+
+        assert seen_during_send["reminders"] == 2
+        assert seen_during_send["completed"] is not None
+        with app.app_context():
+            assert {e.status for e in EmailOutbox.query.all()} == {"sent"}
+
+
+    def test_reused_meeting_id_gets_its_own_reminders(self, app, users, meeting_24hr, client, force_login):
+        tomorrow = (datetime.now(LOCAL_TIMEZONE) + timedelta(days=1)).strftime("%Y-%m-%d")
+        with app.app_context():
+            meeting = Meeting.query.get(meeting_24hr)
+            meeting.date = tomorrow
+            db.session.commit()
+        with patch("notifications_scheduler.deliver_committed"):
+            check_upcoming_meetings(app)
+
+        # The student cancels, and SQLite gives the next meeting the same id.
+        force_login(client, users[0])
+        client.post(f"/request-cancellation/{meeting_24hr}", data={"reason": "ill"})
+        with app.app_context():
+            again = Meeting(student="Student", student_email="student@test.com", professor="Professor",
+                            professor_email="prof@test.com", date=tomorrow, time="11:00:00")
+            db.session.add(again)
+            db.session.commit()
+            again_id = again.id
+        with patch("notifications_scheduler.deliver_committed"):
+            check_upcoming_meetings(app)
+
+        assert again_id == meeting_24hr
+        with app.app_context():
+            reminders = Notification.query.filter_by(meeting_id=again_id, type="meeting_reminder_24hr")
+            assert {n.message.count("11:00") for n in reminders} == {1}
+            assert reminders.count() == 2
+            assert User.query.get(users[0]).unread_count == 1
+            assert EmailOutbox.query.filter_by(recipient="student@test.com").count() == 2
+
+
 class TestNotifyUsers:
     def test_notify_users_no_crash(self, app, meeting_24hr):
         """
@@ -108,35 +225,87 @@ class TestNotifyUsers:
         """
         with app.app_context():
             meeting = Meeting.query.get(meeting_24hr)
-            notify_users(meeting, "24hr")
+            with patch("app.outbox.mail.connect", side_effect=ConnectionRefusedError):
+                notify_users([meeting], "24hr")
+
+    def test_notify_users_bulk_inserts_for_known_users(self, app, meeting_24hr):
+        with app.app_context():
+            meeting = Meeting.query.get(meeting_24hr)
+            stranger = Meeting(
+                student="Ghost",
+                student_email="ghost@test.com",
+                professor=meeting.professor,
+                professor_email=meeting.professor_email,
+                date=meeting.date,
+                time="11:00:00"
+            )
+            db.session.add(stranger)
+            db.session.commit()
 
+            queued = notify_users([meeting, stranger], "24hr")
+            db.session.commit()
 
-class TestSendEmail:
-    @patch("notifications_scheduler.mail.send")
-    def test_send_email_success_or_silent_failure(self, mock_send):
-        """
-        send_email MUST NOT raise.
-        Whether mail backend exists is irrelevant.
-        """
-        send_email("x@test.com", "subj", "body")
+            assert len(queued) == 3
+            assert all(entry.status == "pending" for entry in queued)
+            assert Notification.query.filter_by(user_email="ghost@test.com").count() == 0
 
-    @patch("notifications_scheduler.mail.send")
-    def test_send_email_exception_swallowed(self, mock_send):
-        mock_send.side_effect = Exception("SMTP down")
-        send_email("x@test.com", "subj", "body")
+    def test_notify_users_empty(self, app):
+        with app.app_context():
+            assert notify_users([], "12hr") == []
 
 
 class TestSaveNotification:
     def test_save_notification_persists(self, app, meeting_24hr):
         with app.app_context():
             meeting = Meeting.query.get(meeting_24hr)
-            save_notification("x@test.com", meeting, "24hr")
+            save_notifications([reminder_notification("x@test.com", meeting, "24hr")])
             db.session.commit()
 
             notif = Notification.query.first()
             assert notif is not None
 
 
+class TestClaimReminders:
+    def test_only_one_holder_wins(self, app, meeting_24hr):
+        with app.app_context():
+            meeting = Meeting.query.get(meeting_24hr)
+            now = datetime.now(timezone.utc)
+
+            first = claim_reminders([meeting], "24hr", "node-a", now)
+            second = claim_reminders([meeting], "24hr", "node-b", now)
+
+            assert [m.id for m in first] == [meeting_24hr]
+            assert second == []
+
+    def test_expired_claim_is_taken_over(self, app, meeting_24hr):
+        with app.app_context():
+            meeting = Meeting.query.get(meeting_24hr)
+            now = datetime.now(timezone.utc)
+            claim_reminders([meeting], "24hr", "node-a", now)
+
+            later = now + CLAIM_TTL + timedelta(seconds=1)
+            taken = claim_reminders([meeting], "24hr", "node-b", later)
+
+            assert [m.id for m in taken] == [meeting_24hr]
+            assert ReminderClaim.query.one().holder == "node-b"
+
+    def test_two_nodes_send_each_reminder_once(self, app, meeting_24hr):
+        with app.app_context():
+            meeting = Meeting.query.get(meeting_24hr)
+            meeting.date = (datetime.now(LOCAL_TIMEZONE) + timedelta(days=1)).strftime("%Y-%m-%d")
+            db.session.commit()
+
+        with patch("notifications_scheduler.deliver_committed") as mock_deliver:
+            check_upcoming_meetings(app, holder="node-a")
+            check_upcoming_meetings(app, holder="node-b")
+
+        with app.app_context():
+            claim = ReminderClaim.query.one()
+            assert claim.holder == "node-a"
+            assert claim.completed_at is not None
+        assert sum(len(call.args[0]) for call in mock_deliver.call_args_list) == 2
+
+
 class TestStartScheduler:
     def test_start_scheduler_heroku(self):
         os.environ["DYNO"] = "web.1"
@@ -148,3 +317,10 @@ class TestStartScheduler:
         os.environ["WERKZEUG_RUN_MAIN"] = "true"
         start_scheduler(Mock())
         del os.environ["WERKZEUG_RUN_MAIN"]
+
+    @patch("notifications_scheduler.BackgroundScheduler")
+    def test_start_scheduler_cluster_mode_runs_on_dyno(self, mock_sched):
+        os.environ["DYNO"] = "web.1"
+        os.environ["SCHEDULER_MODE"] = "cluster"
+        start_scheduler(Mock())
+        mock_sched.return_value.start.assert_called_once()
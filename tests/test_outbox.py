@@ -0,0 +1,198 @@
+from datetime import datetime, timezone
+
+from app.extensions import db
+from app.models import EmailOutbox, Meeting
+from flask_mail import Message
+
+from app.outbox import MAX_ATTEMPTS, deliver_pending, queue_email, queue_emails, send_messages
+
+
+class FakeSMTP:
+    """Stands in for the connection returned by mail.connect()."""
+
+    def __init__(self, fail_for=()):
+        self.sent = []
+        self.fail_for = set(fail_for)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def send(self, msg):
+        if msg.recipients[0] in self.fail_for:
+            raise OSError("mailbox unavailable")
+        self.sent.append(msg)
+
+
+def make_due(app):
+    with app.app_context():
+        EmailOutbox.query.update({"next_attempt_at": datetime(2000, 1, 1, tzinfo=timezone.utc)})
+        db.session.commit()
+
+
+def test_queue_email_ignores_duplicate_keys(app):
+    # given
+    queue_email("a@test.com", "s", "b", idempotency_key="k1")
+    db.session.commit()
+
+    # when
+    again = queue_email("a@test.com", "s", "b", idempotency_key="k1")
+    db.session.commit()
+
+    # then
+    assert again is None
+    assert EmailOutbox.query.count() == 1
+
+
+def test_deliver_pending_sends_over_one_connection(app, monkeypatch):
+    # given
+    queue_email("a@test.com", "s", "b", idempotency_key="k1")
+    queue_email("b@test.com", "s", "b", idempotency_key="k2")
+    db.session.commit()
+    smtp = FakeSMTP()
+    connects = []
+    monkeypatch.setattr("app.outbox.mail.connect", lambda: connects.append(1) or smtp)
+
+    # when
+    processed = deliver_pending(app, threads=1)
+
+    # then
+    assert processed == 2
+    assert len(connects) == 1
+    db.session.expire_all()
+    assert {m.recipients[0] for m in smtp.sent} == {"a@test.com", "b@test.com"}
+    assert {e.status for e in EmailOutbox.query.all()} == {"sent"}
+    assert deliver_pending(app) == 0
+
+
+def test_queue_emails_checks_keys_in_one_batch(app):
+    # given
+    queue_email("a@test.com", "s", "b", idempotency_key="k1")
+    db.session.commit()
+
+    # when
+    added = queue_emails([
+        ("a@test.com", "s", "b", "k1"),
+        ("b@test.com", "s", "b", "k2"),
+        ("b@test.com", "s", "b", "k2"),
+    ])
+    db.session.commit()
+
+    # then
+    assert [e.idempotency_key for e in added] == ["k2"]
+    assert EmailOutbox.query.count() == 2
+
+
+def test_send_messages_uses_bounded_connections(app, monkeypatch):
+    # given
+    connections = []
+
+    def connect():
+        smtp = FakeSMTP(fail_for={"bad@test.com"})
+        connections.append(smtp)
+        return smtp
+
+    monkeypatch.setattr("app.outbox.mail.connect", connect)
+    messages = [
+        (f"k{i}", Message("s", recipients=[f"u{i}@test.com"], body="b"))
+        for i in range(10)
+    ] + [("bad", Message("s", recipients=["bad@test.com"], body="b"))]
+
+    # when
+    results = send_messages(app, messages, threads=3)
+
+    # then
+    assert len(connections) == 3
+    assert sum(len(c.sent) for c in connections) == 10
+    assert isinstance(results.pop("bad"), OSError)
+    assert set(results.values()) == {None}
+
+
+def test_deliver_pending_retries_with_backoff_then_gives_up(app, monkeypatch):
+    # given
+    queue_email("bad@test.com", "s", "b", idempotency_key="k1")
+    db.session.commit()
+    monkeypatch.setattr("app.outbox.mail.connect", lambda: FakeSMTP(fail_for={"bad@test.com"}))
+
+    # when
+    deliver_pending(app)
+    entry = EmailOutbox.query.first()
+    first_retry = entry.next_attempt_at
+    retried_immediately = deliver_pending(app)
+    for _ in range(MAX_ATTEMPTS - 1):
+        make_due(app)
+        deliver_pending(app)
+
+    # then
+    db.session.expire_all()
+    entry = EmailOutbox.query.first()
+    assert retried_immediately == 0
+    assert first_retry.replace(tzinfo=timezone.utc) > datetime.now(timezone.utc)
+    assert entry.status == "failed"
+    assert entry.attempts == MAX_ATTEMPTS
+    assert "mailbox unavailable" in entry.last_error
+
+
+def test_deliver_pending_connection_failure_keeps_rows_pending(app, monkeypatch):
+    # given
+    queue_email("a@test.com", "s", "b", idempotency_key="k1")
+    db.session.commit()
+
+    def refuse():
+        raise ConnectionRefusedError("no server")
+
+    monkeypatch.setattr("app.outbox.mail.connect", refuse)
+
+    # when
+    deliver_pending(app)
+
+    # then
+    db.session.expire_all()
+    entry = EmailOutbox.query.first()
+    assert entry.status == "pending"
+    assert entry.attempts == 1
+
+
+def test_cancel_meeting_queues_email_instead_of_sending(client, app, meeting_id, professor_user_id, monkeypatch):
+    # given
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(professor_user_id)
+        sess["_fresh"] = True
+
+    def no_smtp(*a, **k):
+        raise AssertionError("request path must not touch SMTP")
+
+    monkeypatch.setattr("app.outbox.mail.send", no_smtp)
+
+    # when
+    r = client.post(f"/cancel-meeting/{meeting_id}")
+
+    # then
+    assert r.status_code == 302
+    entry = EmailOutbox.query.one()
+    assert entry.recipient == "student@example.com"
+    assert entry.idempotency_key.startswith(f"meeting_cancelled:{meeting_id}@")
+    assert Meeting.query.get(meeting_id) is None
+
+
+def test_cancelling_a_meeting_with_a_reused_id_still_emails(client, app, meeting_id, professor_user_id,
+                                                            force_login):
+    # given
+    force_login(client, professor_user_id)
+    client.post(f"/cancel-meeting/{meeting_id}")
+    rebooked = Meeting(student="Student John", student_email="student@example.com", professor="Professor Smith",
+                       professor_email="prof@example.com", date="2025-12-16", time="10:00:00")
+    db.session.add(rebooked)
+    db.session.commit()
+    rebooked_id = rebooked.id
+
+    # when
+    client.post(f"/cancel-meeting/{rebooked_id}")
+
+    # then
+    assert rebooked_id == meeting_id
+    entries = EmailOutbox.query.filter_by(recipient="student@example.com").all()
+    assert len(entries) == 2
+    assert "2025-12-16" in entries[1].body
@@ -0,0 +1,132 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.extensions import db
+from app.models import Meeting, Notification, User, LOCAL_TIMEZONE
+from app.querycount import QueryBudgetExceeded, query_budget, record_queries, statement_shape
+from notifications_scheduler import check_upcoming_meetings
+
+
+def add_meetings(count, day, start=0):
+    for i in range(start, start + count):
+        student = User(name=f"Student {i}", email=f"student{i}@test.com", password="x", role="student")
+        db.session.add(student)
+        db.session.add(Meeting(
+            student=student.name, student_email=student.email,
+            professor="Professor Smith", professor_email="prof@example.com",
+            notes="Test", date=day, time=f"{8 + i:02d}:00:00"
+        ))
+    db.session.commit()
+
+
+def test_statement_shape_ignores_values_and_list_lengths():
+    # when
+    a = statement_shape("SELECT * FROM user WHERE id IN (?, ?) AND name = 'Ann'  LIMIT 5")
+    b = statement_shape("SELECT * FROM user\nWHERE id IN (?, ?, ?, ?) AND name = 'Bob' LIMIT 20")
+    rows = statement_shape("INSERT INTO t (a, b) VALUES (?, ?), (?, ?), (?, ?)")
+
+    # then
+    assert a == b == "SELECT * FROM user WHERE id IN (...) AND name = ? LIMIT ?"
+    assert rows == "INSERT INTO t (a, b) VALUES (...)"
+
+
+def test_repeated_shapes_are_flagged(app, student_user_id, professor_user_id):
+    # when
+    with record_queries() as outer:
+        with record_queries() as inner:
+            for user_id in (student_user_id, professor_user_id, student_user_id):
+                db.session.expire_all()
+                db.session.get(User, user_id)
+        db.session.scalar(db.select(db.func.count()).select_from(User))
+
+    # then
+    assert len(inner) == 3
+    assert len(outer) == 4
+    [(shape, count)] = inner.repeated()
+    assert count == 3
+    assert shape.startswith("SELECT user.id")
+    with pytest.raises(QueryBudgetExceeded, match="repeated 3x"):
+        inner.check_budget(2, "lookups")
+
+
+def test_view_over_its_budget_fails_the_request(app, client):
+    # given
+    @app.route("/chatty")
+    @query_budget(2)
+    def chatty():
+        for _ in range(3):
+            db.session.scalar(db.select(db.func.count()).select_from(User))
+        return "ok"
+
+    # when / then
+    with pytest.raises(QueryBudgetExceeded, match=r"GET /chatty \(chatty\): 3 statement\(s\), budget 2"):
+        client.get("/chatty")
+
+
+def test_responses_carry_the_query_count(app, client):
+    # when
+    counted = client.get("/")
+    app.config["QUERY_COUNT"] = False
+    uncounted = client.get("/")
+
+    # then
+    assert counted.headers["X-Query-Count"] == "0"
+    assert "X-Query-Count" not in uncounted.headers
+
+
+def test_notifications_page_does_not_reload_rows_one_by_one(app, client, student_user_id, force_login):
+    # given
+    db.session.add_all([
+        Notification(user_email="student@example.com", message=f"Message {i}", type="booking_confirmation")
+        for i in range(15)
+    ])
+    db.session.commit()
+    force_login(client, student_user_id)
+
+    # when
+    first = client.get("/notifications")
+    again = client.get("/notifications")
+
+    # then
+    assert first.status_code == 200
+    assert b"Message 14" in first.data
+    # Marking the page read costs a few statements more than viewing it.
+    assert int(first.headers["X-Query-Count"]) <= 8
+    assert int(again.headers["X-Query-Count"]) <= 3
+
+
+def test_professor_pages_stay_within_budget(app, client, professor_user_id, force_login):
+    # given
+    day = (datetime.now(LOCAL_TIMEZONE) + timedelta(days=3)).strftime("%Y-%m-%d")
+    add_meetings(6, day)
+    force_login(client, professor_user_id)
+
+    # when
+    home = client.get("/home")
+    manage = client.get("/manage-sessions")
+
+    # then
+    assert home.status_code == 200
+    assert manage.status_code == 200
+
+
+def test_sweep_statements_do_not_grow_with_meetings(app, query_log):
+    # given
+    db.session.add(User(name="Professor Smith", email="prof@example.com", password="x", role="professor"))
+    tomorrow = (datetime.now(LOCAL_TIMEZONE) + timedelta(days=1)).strftime("%Y-%m-%d")
+    app.extensions["mail"].suppress = True
+
+    # when
+    add_meetings(1, tomorrow)
+    with record_queries() as one:
+        check_upcoming_meetings(app)
+    add_meetings(8, tomorrow, start=1)
+    with record_queries() as eight:
+        check_upcoming_meetings(app)
+
+    # then
+    assert Notification.query.filter(Notification.meeting_id.isnot(None)).count() == 2 + 16
+    assert len(eight) == len(one)
+    assert not eight.repeated()
+    assert len(query_log) > len(one) + len(eight)
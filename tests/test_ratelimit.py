@@ -0,0 +1,205 @@
+import pytest
+
+from app.extensions import login_limiter
+from app.ratelimit import PREFIX, LoginLimiter, MemoryBuckets, RedisBuckets
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def login(client, email="student@example.com", password="wrong", ip="10.0.0.1"):
+    return client.post("/", data={"email": email, "password": password}, environ_base={"REMOTE_ADDR": ip})
+
+
+@pytest.fixture
+def hashes(monkeypatch):
+    """Passwords the login view hashed."""
+    checked = []
+
+    def check_password_hash(pwhash, password):
+        checked.append(password)
+        return False
+
+    monkeypatch.setattr("app.routes.check_password_hash", check_password_hash)
+    return checked
+
+
+def test_bucket_allows_a_burst_then_refills(monkeypatch):
+    # given
+    clock = Clock()
+    monkeypatch.setattr("app.ratelimit.time.monotonic", clock)
+    buckets = MemoryBuckets()
+
+    # when
+    burst = [buckets.take("k", 3, 0.5)[0] for _ in range(3)]
+    refused, retry_after = buckets.take("k", 3, 0.5)
+    clock.now += 2
+    after_wait = buckets.take("k", 3, 0.5)
+
+    # then
+    assert burst == [True, True, True]
+    assert refused is False
+    assert retry_after == pytest.approx(2)
+    assert after_wait == (True, 0)
+
+
+def test_redis_buckets_refill_and_refuse_across_processes(redis_url, monkeypatch):
+    # given: two processes' buckets on one Redis
+    clock = Clock()
+    monkeypatch.setattr("app.ratelimit.time.time", clock)
+    first, second = RedisBuckets(redis_url), RedisBuckets(redis_url)
+    key = f"{PREFIX}:ip:a"
+
+    # when
+    burst = [first.take(key, 3, 0.5)[0] for _ in range(2)] + [second.take(key, 3, 0.5)[0]]
+    refused, retry_after = first.take(key, 3, 0.5)
+    other_key = second.take(f"{PREFIX}:ip:b", 3, 0.5)
+    clock.now += 2
+    after_wait = second.take(key, 3, 0.5)
+
+    # then
+    assert burst == [True, True, True]
+    assert refused is False
+    assert retry_after == pytest.approx(2)
+    assert other_key == (True, 0)
+    assert after_wait == (True, 0)
+    assert 0 < first.client.ttl(key) <= 7
+
+
+def test_redis_buckets_clear_only_login_keys(redis_url):
+    # given
+    buckets = RedisBuckets(redis_url)
+    buckets.take(f"{PREFIX}:account:a", 1, 1)
+    buckets.client.set("collegia:v:catalogue", 3)
+
+    # when
+    buckets.clear()
+
+    # then
+    assert list(buckets.client.scan_iter(f"{PREFIX}:*")) == []
+    assert buckets.client.get("collegia:v:catalogue") == b"3"
+
+
+def test_bucket_drops_least_recent_keys():
+    # given
+    buckets = MemoryBuckets(max_entries=2)
+
+    # when
+    for key in ("a", "b", "c"):
+        buckets.take(key, 1, 1)
+
+    # then
+    assert list(buckets._buckets) == ["b", "c"]
+
+
+def test_account_is_throttled_before_hashing(app, client, student_user_id, hashes):
+    # given
+    app.config.update(LOGIN_LIMIT_ACCOUNT_BURST=3)
+    login_limiter.init_app(app)
+
+    # when
+    responses = [login(client) for _ in range(3)] + [login(client, email="Student@Example.com")]
+
+    # then
+    assert [r.status_code for r in responses] == [200, 200, 200, 429]
+    assert len(hashes) == 3
+    assert int(responses[-1].headers["Retry-After"]) >= 1
+    assert b"Too many login attempts" in responses[-1].data
+
+
+def test_throttled_ip_leaves_account_buckets_alone(app, client, student_user_id, hashes):
+    # given
+    app.config.update(LOGIN_LIMIT_IP_BURST=2, LOGIN_LIMIT_ACCOUNT_BURST=2)
+    login_limiter.init_app(app)
+
+    # when
+    from_one_ip = [login(client, email=f"guess{i}@example.com").status_code for i in range(3)]
+    victim = [login(client, ip="10.0.0.9").status_code for _ in range(2)]
+
+    # then
+    assert from_one_ip == [200, 200, 429]
+    assert victim == [200, 200]
+    assert len(hashes) == 2
+
+
+def test_store_outage_lets_logins_through(app, client, student_user_id):
+    # given
+    class Down:
+        def take(self, key, capacity, rate):
+            raise ConnectionError("store unreachable")
+
+    login_limiter.backend = Down()
+
+    # when
+    response = login(client, password="password123")
+
+    # then
+    assert response.status_code == 302
+
+
+def test_none_backend_turns_throttling_off(app, client, student_user_id, hashes):
+    # given
+    app.config.update(LOGIN_LIMIT_BACKEND="none", LOGIN_LIMIT_ACCOUNT_BURST=1)
+    login_limiter.init_app(app)
+
+    # when
+    statuses = [login(client).status_code for _ in range(3)]
+
+    # then
+    assert statuses == [200, 200, 200]
+    assert len(hashes) == 3
+
+
+def test_unknown_backend_is_rejected(app):
+    # given
+    app.config["LOGIN_LIMIT_BACKEND"] = "carrier-pigeon"
+
+    # when / then
+    with pytest.raises(ValueError, match="LOGIN_LIMIT_BACKEND"):
+        LoginLimiter().init_app(app)
+
+
+@pytest.fixture
+def behind_proxy(monkeypatch):
+    # Heroku sets DYNO, which makes the app trust its router.
+    monkeypatch.setenv("DYNO", "web.1")
+    monkeypatch.delenv("TRUSTED_PROXIES", raising=False)
+
+
+def test_ip_bucket_follows_forwarded_address_behind_a_proxy(behind_proxy, app, client, hashes):
+    # given
+    app.config.update(LOGIN_LIMIT_IP_BURST=1)
+    login_limiter.init_app(app)
+
+    def via_router(client_ip):
+        return client.post("/", data={"email": f"{client_ip}@example.com", "password": "x"},
+                           environ_base={"REMOTE_ADDR": "10.0.0.1"},
+                           headers={"X-Forwarded-For": client_ip})
+
+    # when
+    first = via_router("203.0.113.7")
+    other_client = via_router("198.51.100.2")
+    again = via_router("203.0.113.7")
+
+    # then
+    assert first.status_code == 200
+    assert other_client.status_code == 200
+    assert again.status_code == 429
+
+
+def test_proxies_are_not_trusted_off_heroku(monkeypatch):
+    # given
+    monkeypatch.delenv("DYNO", raising=False)
+    monkeypatch.delenv("TRUSTED_PROXIES", raising=False)
+    from app import create_app
+
+    # when
+    app = create_app()
+
+    # then
+    assert app.config["TRUSTED_PROXIES"] == 0
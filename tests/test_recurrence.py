@@ -0,0 +1,119 @@
+from datetime import date, datetime, time, timezone
+
+from app.extensions import db
+from app.models import Availability, LOCAL_TIMEZONE
+from app.recurrence import create_recurring_slots, expand, parse_dates
+
+
+def test_expand_lays_slots_end_to_end_on_chosen_days():
+    # given: Mon 2099-03-02 to Mon 2099-03-09, Mondays and Wednesdays, Wednesday skipped
+    exclusions = {date(2099, 3, 4)}
+
+    # when
+    starts = list(expand([0, 2], time(9, 0), time(10, 40), 30, date(2099, 3, 2), date(2099, 3, 9), exclusions))
+
+    # then
+    assert [s.strftime("%m-%d %H:%M") for s in starts] == [
+        "03-02 09:00", "03-02 09:30", "03-02 10:00",
+        "03-09 09:00", "03-09 09:30", "03-09 10:00",
+    ]
+
+
+def test_parse_dates_accepts_commas_and_newlines():
+    # when
+    dates = parse_dates("2099-03-04, 2099-03-05\n2099-03-06\n")
+
+    # then
+    assert dates == {date(2099, 3, 4), date(2099, 3, 5), date(2099, 3, 6)}
+
+
+def test_create_skips_duplicates_and_overlaps(app):
+    # given
+    db.session.add_all([
+        Availability(professor_name="P", professor_email="p@test.com", date="2099-03-02", time="09:00:00"),
+        Availability(professor_name="P", professor_email="p@test.com", date="2099-03-02", time="10:15:00"),
+    ])
+    db.session.commit()
+
+    # when
+    result = create_recurring_slots(
+        [("P", "p@test.com"), ("Q", "q@test.com")],
+        [0], time(9, 0), time(12, 0), 30, date(2099, 3, 2), date(2099, 3, 2)
+    )
+    db.session.commit()
+
+    # then
+    assert result == {"created": 7, "duplicates": 1, "overlaps": 4}
+    p_times = [a.time for a in Availability.query.filter_by(professor_email="p@test.com").order_by(Availability.time)]
+    assert p_times == ["09:00:00", "10:15:00", "11:30:00"]
+    q_slot = Availability.query.filter_by(professor_email="q@test.com", time="09:30:00").one()
+    assert q_slot.starts_at is not None and q_slot.duration_minutes == 30
+
+
+def test_create_semester_for_department(app):
+    # given: 8 professors, weekday office hours 9-17 in 30 minute slots, 15 weeks
+    # (the speed budget lives in benchmarks/recurrence.py)
+    professors = [(f"Prof {i}", f"prof{i}@test.com") for i in range(8)]
+
+    # when
+    result = create_recurring_slots(
+        professors, [0, 1, 2, 3, 4], time(9, 0), time(17, 0), 30, date(2099, 1, 5), date(2099, 4, 17)
+    )
+    db.session.commit()
+
+    # then
+    assert result["created"] == 8 * 75 * 16
+    assert Availability.query.count() == 8 * 75 * 16
+    slot = Availability.query.filter_by(professor_email="prof7@test.com", date="2099-01-05", time="09:00:00").one()
+    assert slot.booked is False and slot.created_at is not None
+    assert slot.starts_at.replace(tzinfo=None) == datetime(2099, 1, 5, 9, 0).replace(tzinfo=LOCAL_TIMEZONE).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def test_recurring_route_adds_slots(client, professor_user_id, force_login):
+    # given
+    force_login(client, professor_user_id)
+
+    # when
+    r = client.post(
+        "/manage-sessions/recurring",
+        data={
+            "weekdays": ["0", "2"],
+            "start_time": "09:00",
+            "end_time": "10:00",
+            "slot_minutes": "30",
+            "start_date": "2099-03-02",
+            "end_date": "2099-03-15",
+            "exclusions": "2099-03-04",
+        },
+        follow_redirects=True,
+    )
+
+    # then
+    assert r.status_code == 200
+    assert "Added 6 slot(s)." in r.get_data(as_text=True)
+    with client.application.app_context():
+        assert Availability.query.filter_by(professor_email="prof@example.com").count() == 6
+
+
+def test_recurring_route_rejects_inverted_times(client, professor_user_id, force_login):
+    # given
+    force_login(client, professor_user_id)
+
+    # when
+    r = client.post(
+        "/manage-sessions/recurring",
+        data={
+            "weekdays": ["0"],
+            "start_time": "10:00",
+            "end_time": "09:00",
+            "slot_minutes": "30",
+            "start_date": "2099-03-02",
+            "end_date": "2099-03-15",
+        },
+        follow_redirects=True,
+    )
+
+    # then
+    assert "End time must be after the start time" in r.get_data(as_text=True)
+    with client.application.app_context():
+        assert Availability.query.count() == 0
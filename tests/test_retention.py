@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta, timezone
+
+from app.extensions import db
+from app.models import ChangeVersion, Notification, NotificationArchive, User, user_scope
+from app.retention import retire_notifications
+
+
+def add_notifications(count, age_days, is_read=True, email="student@example.com"):
+    created_at = datetime.now(timezone.utc) - timedelta(days=age_days)
+    db.session.add_all([
+        Notification(user_email=email, message=f"{age_days}d #{i}", type="booking_confirmation",
+                     is_read=is_read, created_at=created_at)
+        for i in range(count)
+    ])
+    db.session.commit()
+
+
+def version(email):
+    row = db.session.get(ChangeVersion, user_scope(email))
+    return row.version if row else 0
+
+
+def test_old_read_notifications_move_to_the_archive(app, student_user_id):
+    # given
+    add_notifications(3, age_days=200)
+    add_notifications(2, age_days=200, is_read=False)
+    add_notifications(2, age_days=10)
+    add_notifications(1, age_days=200, is_read=False, email="all_students")
+    unread_before = db.session.get(User, student_user_id).unread_count
+    version_before = version("student@example.com")
+
+    # when
+    retired = retire_notifications(app, days=180)
+
+    # then
+    db.session.expire_all()
+    assert retired == 3
+    assert Notification.query.count() == 5
+    assert Notification.query.filter(Notification.message.like("200d%"), Notification.is_read.is_(True)).count() == 0
+    archived = NotificationArchive.query.order_by(NotificationArchive.id).all()
+    assert [a.message for a in archived] == ["200d #0", "200d #1", "200d #2"]
+    assert all(a.is_read and a.archived_at is not None for a in archived)
+    assert db.session.get(User, student_user_id).unread_count == unread_before == 2
+    assert version("student@example.com") == version_before + 1
+
+
+def test_runs_in_bounded_batches(app, student_user_id):
+    # given
+    add_notifications(5, age_days=365)
+
+    # when
+    first = retire_notifications(app, days=180, batch_size=2, max_batches=2)
+    second = retire_notifications(app, days=180, batch_size=2, max_batches=2)
+
+    # then
+    assert first == 4
+    assert second == 1
+    assert NotificationArchive.query.count() == 5
+    assert Notification.query.count() == 0
+
+
+def test_purge_deletes_without_archiving(app, student_user_id):
+    # given
+    add_notifications(2, age_days=365)
+
+    # when
+    retired = retire_notifications(app, days=180, archive=False)
+
+    # then
+    assert retired == 2
+    assert Notification.query.count() == 0
+    assert NotificationArchive.query.count() == 0
+
+
+def test_zero_days_keeps_everything(app, student_user_id):
+    # given
+    add_notifications(2, age_days=365)
+
+    # when
+    retired = retire_notifications(app, days=0)
+
+    # then
+    assert retired == 0
+    assert Notification.query.count() == 2
+
+
+def test_cli_command_uses_configured_retention(app, student_user_id):
+    # given
+    app.config["NOTIFICATION_RETENTION_DAYS"] = 30
+    add_notifications(2, age_days=45)
+    add_notifications(1, age_days=5)
+
+    # when
+    result = app.test_cli_runner().invoke(args=["retire-notifications", "--purge"])
+
+    # then
+    assert result.exit_code == 0
+    assert "2 notification(s) retired" in result.output
+    assert Notification.query.count() == 1
+    assert NotificationArchive.query.count() == 0
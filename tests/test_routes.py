@@ -1,22 +1,20 @@
 # tests/test_routes.py
 
+import io
+
 import pytest
+from PIL import Image
+from sqlalchemy import event, update
 from unittest.mock import patch
 
 from app.routes import (
     allowed_file,
-    send_email_notification,
-    create_google_calendar_event,
     on_load,
 )
-from app.models import User, Availability, Meeting
-from app.extensions import db
-
+from datetime import datetime, timedelta, timezone
 
-def force_login(client, user_id):
-    with client.session_transaction() as sess:
-        sess["_user_id"] = str(user_id)
-        sess["_fresh"] = True
+from app.models import User, Availability, Meeting, Notification, CalendarJob
+from app.extensions import db
 
 
 def test_on_load_executes(app):
@@ -47,66 +45,6 @@ def test_allowed_file_all_paths():
     assert bad_name is False
 
 
-def test_send_email_notification_success(monkeypatch):
-    # given
-    monkeypatch.setattr("app.routes.mail.send", lambda msg: True)
-    # when
-    send_email_notification("a@test.com", "s", "b")
-    # then
-    assert True
-
-
-def test_send_email_notification_exception(monkeypatch):
-    # given
-    def boom(*a, **k):
-        raise Exception("fail")
-
-    monkeypatch.setattr("app.routes.mail.send", boom)
-    # when
-    send_email_notification("a@test.com", "s", "b")
-    # then
-    assert True
-
-
-def test_create_google_calendar_event_all_paths(monkeypatch):
-    # given
-    class DummyMeeting:
-        date = "2025-01-01"
-        time = "10:00:00"
-        student = "S"
-        professor = "P"
-        notes = ""
-
-    class GoogleOK:
-        authorized = True
-
-        def post(self, *a, **k):
-            class R:
-                ok = True
-            return R()
-
-    class GoogleFail:
-        authorized = True
-
-        def post(self, *a, **k):
-            raise Exception("boom")
-
-    # when
-    monkeypatch.setattr("app.routes.google", GoogleOK())
-    ok = create_google_calendar_event(DummyMeeting())
-
-    monkeypatch.setattr("app.routes.google", GoogleFail())
-    fail = create_google_calendar_event(DummyMeeting())
-
-    monkeypatch.setattr("app.routes.google", type("G", (), {"authorized": False})())
-    unauth = create_google_calendar_event(DummyMeeting())
-
-    # then
-    assert ok is True
-    assert fail is False
-    assert unauth is False
-
-
 def test_login_page(client):
     # given
     # when
@@ -123,7 +61,7 @@ def test_logout(client):
     assert r.status_code in (302, 401)
 
 
-def test_dashboard_student(client, student_user_id):
+def test_dashboard_student(client, student_user_id, force_login):
     # given
     force_login(client, student_user_id)
     # when
@@ -132,7 +70,7 @@ def test_dashboard_student(client, student_user_id):
     assert r.status_code == 200
 
 
-def test_dashboard_professor_redirect(client, professor_user_id):
+def test_dashboard_professor_redirect(client, professor_user_id, force_login):
     # given
     force_login(client, professor_user_id)
     # when
@@ -141,7 +79,7 @@ def test_dashboard_professor_redirect(client, professor_user_id):
     assert r.status_code == 302
 
 
-def test_manage_sessions_get(client, professor_user_id):
+def test_manage_sessions_get(client, professor_user_id, force_login):
     # given
     force_login(client, professor_user_id)
     # when
@@ -150,7 +88,7 @@ def test_manage_sessions_get(client, professor_user_id):
     assert r.status_code == 200
 
 
-def test_manage_sessions_post(client, professor_user_id):
+def test_manage_sessions_post(client, professor_user_id, force_login):
     # given
     force_login(client, professor_user_id)
     # when
@@ -163,7 +101,7 @@ def test_manage_sessions_post(client, professor_user_id):
     assert r.status_code == 200
 
 
-def test_sessions_student(client, student_user_id):
+def test_sessions_student(client, student_user_id, force_login):
     # given
     force_login(client, student_user_id)
     # when
@@ -172,8 +110,43 @@ def test_sessions_student(client, student_user_id):
     assert r.status_code == 200
 
 
-@patch("app.routes.create_google_calendar_event", return_value=True)
-def test_book_get_and_post_success(_, client, professor_user_id, student_user_id):
+def test_sessions_keyset_pagination_and_filters(client, student_user_id, monkeypatch, force_login):
+    # given
+    monkeypatch.setattr("app.routes.SESSIONS_PAGE_SIZE", 2)
+    force_login(client, student_user_id)
+    with client.application.app_context():
+        for day, time, email in [
+            ("2099-01-01", "09:00:00", "a@test.com"),
+            ("2099-01-01", "15:00:00", "a@test.com"),
+            ("2099-01-02", "09:00:00", "b@test.com"),
+            ("2099-01-03", "09:00:00", "a@test.com"),
+        ]:
+            db.session.add(Availability(
+                professor_name="P", professor_email=email, date=day, time=time
+            ))
+        db.session.commit()
+
+    # when
+    first = client.get("/sessions").get_data(as_text=True)
+    cursor = first.split("cursor=")[1].split("&")[0].split('"')[0]
+    second = client.get(f"/sessions?cursor={cursor}").get_data(as_text=True)
+    filtered = client.get(
+        "/sessions?professor=a@test.com&date_from=2099-01-01&date_to=2099-01-02&time_to=12:00"
+    ).get_data(as_text=True)
+
+    # then
+    assert first.count("time-badge") == 2 and "2099-01-03" not in first
+    assert "2099-01-03" in second and "15:00:00" not in second
+    assert filtered.count("time-badge") == 1 and "2099-01-01" in filtered
+
+
+class GoogleAuthorized:
+    authorized = True
+    token = {"access_token": "a", "refresh_token": "r", "token_type": "Bearer"}
+
+
+@patch("app.routes.google", GoogleAuthorized())
+def test_book_get_and_post_success(client, professor_user_id, student_user_id, force_login):
     # given
     force_login(client, professor_user_id)
     with client.application.app_context():
@@ -200,10 +173,15 @@ def test_book_get_and_post_success(_, client, professor_user_id, student_user_id
     # then
     assert r_get.status_code in (200, 302)
     assert r_post.status_code == 200
+    with client.application.app_context():
+        job = CalendarJob.query.one()
+        assert job.status == "pending"
+        assert job.event["start"]["dateTime"] == "2025-01-01T10:00:00"
+        assert User.query.get(student_user_id).google_token["refresh_token"] == "r"
 
 
-@patch("app.routes.create_google_calendar_event", return_value=False)
-def test_book_calendar_failure(_, client, professor_user_id, student_user_id):
+@patch("app.routes.google", type("G", (), {"authorized": False})())
+def test_book_without_google_skips_calendar(client, professor_user_id, student_user_id, force_login):
     # given
     force_login(client, professor_user_id)
     with client.application.app_context():
@@ -228,9 +206,11 @@ def test_book_calendar_failure(_, client, professor_user_id, student_user_id):
 
     # then
     assert r.status_code == 200
+    with client.application.app_context():
+        assert CalendarJob.query.count() == 0
 
 
-def test_meeting_notes_authorized(client, professor_user_id):
+def test_meeting_notes_authorized(client, professor_user_id, force_login):
     # given
     force_login(client, professor_user_id)
     with client.application.app_context():
@@ -254,7 +234,7 @@ def test_meeting_notes_authorized(client, professor_user_id):
     assert r.status_code == 200
 
 
-def test_meeting_notes_unauthorized(client, student_user_id, meeting_id):
+def test_meeting_notes_unauthorized(client, student_user_id, meeting_id, force_login):
     # given
     force_login(client, student_user_id)
 
@@ -265,7 +245,7 @@ def test_meeting_notes_unauthorized(client, student_user_id, meeting_id):
     assert r.status_code == 302
 
 
-def test_delete_slot_all_branches(client, professor_user_id):
+def test_delete_slot_all_branches(client, professor_user_id, force_login):
     # given
     force_login(client, professor_user_id)
     with client.application.app_context():
@@ -287,7 +267,7 @@ def test_delete_slot_all_branches(client, professor_user_id):
     assert r.status_code == 200
 
 
-def test_cancel_meeting_all_branches(client, professor_user_id):
+def test_cancel_meeting_all_branches(client, professor_user_id, force_login):
     # given
     force_login(client, professor_user_id)
     with client.application.app_context():
@@ -311,7 +291,7 @@ def test_cancel_meeting_all_branches(client, professor_user_id):
     assert r.status_code == 200
 
 
-def test_notifications(client, student_user_id):
+def test_notifications(client, student_user_id, force_login):
     # given
     force_login(client, student_user_id)
 
@@ -322,7 +302,7 @@ def test_notifications(client, student_user_id):
     assert r.status_code == 200
 
 
-def test_settings_get_and_post(client, student_user_id):
+def test_settings_get_and_post(client, student_user_id, force_login):
     # given
     force_login(client, student_user_id)
 
@@ -337,3 +317,125 @@ def test_settings_get_and_post(client, student_user_id):
     # then
     assert r_get.status_code == 200
     assert r_post.status_code == 200
+
+
+def test_settings_upload_switches_to_thumbnail(client, student_user_id, tmp_path, monkeypatch, force_login):
+    # given
+    client.application.config["UPLOAD_FOLDER"] = str(tmp_path)
+    monkeypatch.setattr("app.avatars.executor", type("Inline", (), {"submit": lambda self, fn, *a: fn(*a)})())
+    force_login(client, student_user_id)
+    image = io.BytesIO()
+    Image.new("RGB", (800, 600), "green").save(image, "JPEG")
+    image.seek(0)
+
+    # when
+    r = client.post(
+        "/settings",
+        data={"profile_picture": (image, "me.jpg")},
+        content_type="multipart/form-data",
+        follow_redirects=True,
+    )
+
+    # then
+    assert r.status_code == 200
+    with client.application.app_context():
+        digest = User.query.get(student_user_id).profile_picture
+    assert len(digest) == 64
+    assert f"/avatars/{digest}-300.webp".encode() in r.data
+
+
+def test_notifications_paginated_and_marks_page_read(client, student_user_id, monkeypatch, force_login):
+    # given
+    monkeypatch.setattr("app.routes.NOTIFICATIONS_PAGE_SIZE", 2)
+    force_login(client, student_user_id)
+    with client.application.app_context():
+        base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        for i in range(3):
+            db.session.add(Notification(
+                user_email="student@example.com",
+                message=f"note-{i}",
+                type="booking_confirmation",
+                created_at=base + timedelta(minutes=i)
+            ))
+        db.session.add(Notification(
+            user_email="all_students",
+            message="broadcast",
+            type="announcement",
+            created_at=base - timedelta(minutes=1)
+        ))
+        db.session.commit()
+
+    # when
+    first = client.get("/notifications").get_data(as_text=True)
+    with client.application.app_context():
+        read_after_first = {n.message for n in Notification.query.filter_by(is_read=True)}
+    cursor = first.split("cursor=")[1].split('"')[0]
+    second = client.get(f"/notifications?cursor={cursor}").get_data(as_text=True)
+
+    # then
+    assert "note-2" in first and "note-1" in first and "note-0" not in first
+    assert read_after_first == {"note-2", "note-1"}
+    assert "note-0" in second and "broadcast" in second
+    with client.application.app_context():
+        assert Notification.query.filter_by(message="broadcast").one().is_read is False
+
+
+def test_unread_count_tracks_inserts_reads_and_deletes(client, student_user_id, professor_user_id, meeting_id, force_login):
+    # given
+    force_login(client, student_user_id)
+    with client.application.app_context():
+        db.session.add_all([
+            Notification(user_email="student@example.com", message="a", type="booking_confirmation"),
+            Notification(user_email="student@example.com", message="b", type="meeting_reminder_24hr",
+                         meeting_id=meeting_id),
+        ])
+        db.session.commit()
+
+    # when
+    before = client.get("/notifications/unread-count").get_json()
+    force_login(client, professor_user_id)
+    client.post(f"/cancel-meeting/{meeting_id}")
+    force_login(client, student_user_id)
+    after_cancel = client.get("/notifications/unread-count").get_json()
+    client.get("/notifications")
+    after_read = client.get("/notifications/unread-count").get_json()
+
+    # then
+    assert before == {"unread": 2}
+    assert after_cancel == {"unread": 2}  # reminder removed, cancellation added
+    assert after_read == {"unread": 0}
+
+
+def test_overlapping_inbox_loads_count_each_read_once(client, student_user_id, force_login):
+    # given
+    force_login(client, student_user_id)
+    with client.application.app_context():
+        db.session.add_all([
+            Notification(user_email="student@example.com", message=m, type="booking_confirmation") for m in "ab"
+        ])
+        db.session.commit()
+        engine = db.engine
+    other_tab = []
+
+    def other_tab_marks_read_first(conn, cursor, statement, *args):
+        # A second load of the page commits its UPDATE after this one has
+        # selected the rows but before its own UPDATE runs.
+        if statement.startswith("UPDATE notification") and not other_tab:
+            other_tab.append(True)
+            with engine.begin() as other:
+                other.execute(update(Notification).values(is_read=True))
+                other.execute(update(User).values(unread_count=User.unread_count - 2))
+
+    event.listen(engine, "before_cursor_execute", other_tab_marks_read_first)
+
+    # when
+    try:
+        r = client.get("/notifications")
+    finally:
+        event.remove(engine, "before_cursor_execute", other_tab_marks_read_first)
+
+    # then
+    assert r.status_code == 200 and other_tab
+    with client.application.app_context():
+        db.session.expire_all()
+        assert db.session.get(User, student_user_id).unread_count == 0
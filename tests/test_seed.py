@@ -0,0 +1,98 @@
+from sqlalchemy import func, select
+
+from app.extensions import db
+from app.models import Availability, Meeting, Notification, User
+from app.seed import seed_campus
+from benchmarks.run import main as run_benchmarks, percentile
+from benchmarks.recurrence import main as run_recurrence
+from benchmarks.startup import main as run_startup
+
+
+def test_seed_campus_writes_requested_volumes(app):
+    # when
+    counts = seed_campus(students=30, professors=3, slots=120, notifications=200, log=lambda _: None)
+
+    # then
+    seeded = User.query.filter(User.email.like("%@campus.test"))
+    assert counts["students"] == seeded.filter_by(role="student").count() == 30
+    assert counts["professors"] == seeded.filter_by(role="professor").count() == 3
+    assert Availability.query.count() == 120
+    assert Meeting.query.count() == Availability.query.filter_by(booked=True).count() == counts["meetings"]
+    assert Notification.query.count() == 200
+    assert Availability.query.filter(Availability.starts_at.is_(None)).count() == 0
+
+
+def test_seed_campus_recounts_unread(app):
+    # when
+    seed_campus(students=10, professors=2, slots=10, notifications=100, log=lambda _: None)
+
+    # then
+    unread = dict(db.session.execute(
+        select(Notification.user_email, func.count())
+        .where(Notification.is_read.is_(False))
+        .group_by(Notification.user_email)
+    ).all())
+    assert {u.email: u.unread_count for u in User.query if u.unread_count} == unread
+
+
+def test_seed_campus_is_repeatable(app):
+    # given
+    seed_campus(students=10, professors=2, slots=20, notifications=0, seed=7, log=lambda _: None)
+    first = [(m.student_email, m.date, m.time) for m in Meeting.query.order_by(Meeting.id)]
+    for model in (Meeting, Availability, Notification, User):
+        model.query.delete()
+    db.session.commit()
+
+    # when
+    seed_campus(students=10, professors=2, slots=20, notifications=0, seed=7, log=lambda _: None)
+
+    # then
+    assert [(m.student_email, m.date, m.time) for m in Meeting.query.order_by(Meeting.id)] == first
+
+
+def test_percentile_nearest_rank():
+    # given
+    values = list(range(1, 101))
+
+    # then
+    assert (percentile(values, 50), percentile(values, 95), percentile(values, 99)) == (50, 95, 99)
+    assert percentile([7], 99) == 7
+
+
+def test_benchmark_smoke(tmp_path, capsys):
+    # when
+    results = run_benchmarks([
+        "--database-url", f"sqlite:///{tmp_path / 'bench.db'}",
+        "--scale", "0.0005",
+        "--iterations", "2",
+        "--warmup", "0",
+        "--only", "home",
+        "--only", "check_upcoming_meetings",
+    ])
+
+    # then
+    assert [r["name"] for r in results] == [
+        "home (student)", "home (professor)", "check_upcoming_meetings", "check_upcoming_meetings (idle)"
+    ]
+    assert all(r["queries_mean"] > 0 for r in results)
+    assert "p95 ms" in capsys.readouterr().out
+
+
+def test_startup_benchmark_smoke(capsys):
+    # when
+    status = run_startup(["--runs", "1", "--budget-ms", "60000"])
+
+    # then
+    out = capsys.readouterr().out
+    assert status == 0
+    assert "first_request" in out
+    assert "budget 60000 ms: ok" in out
+
+
+def test_recurrence_benchmark_smoke(capsys):
+    # when
+    status = run_recurrence(["--professors", "2", "--runs", "1", "--budget-ms", "60000"])
+
+    # then
+    assert status == 0
+    assert "2400 slots for 2 professors" in capsys.readouterr().out
@@ -0,0 +1,36 @@
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+import worker
+
+
+class Stop(Exception):
+    pass
+
+
+def test_worker_survives_a_failed_pass():
+    # given: the first pass loses its database connection
+    passes = []
+
+    def deliver_pending(app):
+        passes.append(len(passes))
+        if len(passes) == 1:
+            raise OperationalError("SELECT 1", {}, Exception("server closed the connection"))
+        return 0
+
+    def sleep(seconds):
+        if len(passes) == 2:
+            raise Stop
+
+    # when
+    with patch("worker.deliver_pending", side_effect=deliver_pending), \
+            patch("worker.sync_pending", return_value=0), \
+            patch("worker.retire_if_due", side_effect=lambda next_run: (0, next_run)), \
+            patch("worker.time.sleep", side_effect=sleep):
+        with pytest.raises(Stop):
+            worker.run_worker()
+
+    # then
+    assert passes == [0, 1]
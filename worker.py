@@ -0,0 +1,55 @@
+import time
+
+from app import create_app
+from app.extensions import db
+from app.outbox import deliver_pending
+from app.calendar_sync import sync_pending
+from app.retention import retire_notifications
+
+POLL_INTERVAL_SECONDS = 5
+
+app = create_app()
+
+
+def retire_if_due(next_run):
+    """Run one bounded retention pass once `next_run` has passed.
+
+    Returns the notifications retired and when to run next: straight
+    away if the pass stopped with rows left, else after the interval.
+    """
+    if time.monotonic() < next_run:
+        return 0, next_run
+
+    max_batches = app.config["NOTIFICATION_RETENTION_MAX_BATCHES"]
+    try:
+        retired = retire_notifications(app, max_batches=max_batches)
+    except Exception as e:
+        # Keep the worker sending email; try again after the interval.
+        print(f"[RETENTION] Pass failed: {e}")
+        retired = 0
+    if retired >= max_batches * app.config["NOTIFICATION_RETENTION_BATCH_SIZE"]:
+        return retired, time.monotonic()
+    return retired, time.monotonic() + app.config["NOTIFICATION_RETENTION_INTERVAL"]
+
+
+def run_worker():
+    print("[WORKER] Started (email outbox, calendar sync, notification retention)")
+    next_retention = time.monotonic()
+    while True:
+        try:
+            processed = deliver_pending(app) + sync_pending(app)
+        except Exception as e:
+            # A dropped connection or a locked database must not stop the
+            # worker; the rows stay pending and the next pass retries them.
+            print(f"[WORKER] Delivery pass failed: {e}")
+            with app.app_context():
+                db.session.rollback()
+            time.sleep(POLL_INTERVAL_SECONDS)
+            continue
+        retired, next_retention = retire_if_due(next_retention)
+        if not processed and not retired:
+            time.sleep(POLL_INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+    run_worker()